@@ -0,0 +1,9 @@
+"""
+Offline benchmarks of the agents.
+
+The end-to-end harness (benchmarks.run) drives controller.src.main.main
+against local fakes: a chat completions server that stands in for Azure
+OpenAI (benchmarks.fake_openai), a GitHub API server (benchmarks.fake_github)
+and synthetic repositories with merge conflicts and lint findings
+(benchmarks.synthetic_repo). No network access or credentials are needed.
+"""
@@ -0,0 +1,146 @@
+"""
+This module provides a local server that stands in for the GitHub Enterprise
+API of a synthetic repository.
+
+It serves the endpoints the agents call: the pull request, its changed files
+and the issue comments. The agents build https URLs, so the server uses TLS
+with a self-signed certificate for 127.0.0.1 (see make_certificate), which the
+clients trust through REQUESTS_CA_BUNDLE.
+"""
+import os
+import re
+import ssl
+import json
+import threading
+import itertools
+import subprocess
+from collections import Counter
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from benchmarks.synthetic_repo import SyntheticRepo
+
+_PULL = re.compile(r"^/api/v3/repos/[^/]+/[^/]+/pulls/[^/]+$")
+_PULL_FILES = re.compile(r"^/api/v3/repos/[^/]+/[^/]+/pulls/[^/]+/files$")
+_COMMENTS = re.compile(r"^/api/v3/repos/[^/]+/[^/]+/issues/[^/]+/comments$")
+_COMMENT = re.compile(r"^/api/v3/repos/[^/]+/[^/]+/issues/comments/(\d+)$")
+
+
+def make_certificate(directory: str):
+    """
+    Creates a self-signed certificate for 127.0.0.1 with openssl.
+
+    Returns:
+        tuple: The paths of the certificate and the key.
+    """
+    certificate = os.path.join(directory, "fake_github.crt")
+    key = os.path.join(directory, "fake_github.key")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", key, "-out", certificate, "-days", "1",
+            "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1"
+        ],
+        check=True,
+        capture_output=True
+        )
+    return certificate, key
+
+
+class FakeGitHub:
+    """
+    A GitHub API server on localhost for one pull request.
+
+    Args:
+        repo (SyntheticRepo): The repository of the pull request.
+        certificate (str): The path of the TLS certificate.
+        key (str): The path of the TLS key.
+
+    requests counts the requests by endpoint, comments holds the comment
+    bodies by id.
+    """
+    def __init__(self, repo: SyntheticRepo, certificate: str, key: str) -> None:
+        self.repo = repo
+        self.requests = Counter()
+        self.comments = {}
+        self._ids = itertools.count(1)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certificate, key)
+        self._server.socket = context.wrap_socket(self._server.socket, server_side=True)
+        self._thread = None
+
+    @property
+    def host(self) -> str:
+        """
+        The host and port, the value of GIT_BASE_URL.
+        """
+        return "127.0.0.1:{}".format(self._server.server_address[1])
+
+    def start(self) -> "FakeGitHub":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _route(self, method: str, path: str, query: dict, body: dict):
+        """
+        Returns the endpoint name, the status and the body of the response.
+        """
+        if method == "GET" and _PULL.match(path):
+            return "pull", 200, {
+                "head": {"ref": self.repo.source_branch},
+                "base": {"ref": self.repo.target_branch}
+            }
+        if method == "GET" and _PULL_FILES.match(path):
+            per_page = int(query.get("per_page", ["30"])[0])
+            page = int(query.get("page", ["1"])[0])
+            return "pull_files", 200, self.repo.pr_files[(page - 1) * per_page:page * per_page]
+        if method == "POST" and _COMMENTS.match(path):
+            comment_id = next(self._ids)
+            self.comments[comment_id] = body.get("body", "")
+            return "comment_create", 201, {"id": comment_id}
+        match = _COMMENT.match(path)
+        if method == "PATCH" and match and int(match.group(1)) in self.comments:
+            self.comments[int(match.group(1))] = body.get("body", "")
+            return "comment_update", 200, {"id": int(match.group(1))}
+        return "not_found", 404, {"message": "Not Found"}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self):
+                url = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length) if length else b""
+                body = json.loads(raw) if raw else {}
+                endpoint, status, data = server._route(
+                    self.command,
+                    url.path,
+                    parse_qs(url.query),
+                    body
+                    )
+                server.requests[endpoint] += 1
+                payload = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PATCH = _respond
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
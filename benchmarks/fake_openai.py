@@ -0,0 +1,223 @@
+"""
+This module provides a local server that stands in for the Azure OpenAI chat
+completions API.
+
+The latency of a response is a fixed delay plus the time to generate its
+tokens at a configured throughput, and a share of the requests can be answered
+with "429 Too Many Requests" to exercise the retries of the client. The
+responses echo the code of the prompt, so the agents write valid files:
+merge conflicts are resolved by keeping the current side, code quality prompts
+get the unchanged code back.
+
+The server also accepts requests in the absolute form a forward proxy gets, so
+it can be set as HTTPS_PROXY of the agents' HTTP clients.
+"""
+import re
+import json
+import time
+import random
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+_DEPLOYMENT_PATH = re.compile(r"/openai/deployments/([^/]+)/chat/completions")
+_CONFLICT = re.compile(
+    r"^<<<<<<< [^\n]*\n(.*?)^=======\n.*?^>>>>>>> [^\n]*\n",
+    re.DOTALL | re.MULTILINE
+    )
+
+
+def count_tokens(text: str) -> int:
+    """
+    Approximates the number of tokens of a text, about 4 characters per token.
+    """
+    return max(1, len(text) // 4)
+
+
+def _section(prompt: str, start: str, end: Optional[str] = None) -> Optional[str]:
+    index = prompt.find(start)
+    if index < 0:
+        return None
+    text = prompt[index + len(start):]
+    if end and end in text:
+        text = text[:text.index(end)]
+    return text
+
+
+def resolve_conflicts(content: str) -> str:
+    """
+    Resolves the merge conflicts of a file content by keeping the current side.
+
+    >>> resolve_conflicts("a\\n<<<<<<< HEAD\\nb\\n=======\\nc\\n>>>>>>> main\\nd\\n")
+    'a\\nb\\nd\\n'
+    """
+    return _CONFLICT.sub(lambda match: match.group(1), content)
+
+
+def default_responder(prompt: str, response_format: str) -> str:
+    """
+    Returns the content of a response that the agents can process.
+    """
+    if response_format != "json_object":
+        return "Resolved the merge conflicts and improved the code quality."
+    explanation = "Kept the current version."
+    merge_content = _section(prompt, "Merge conflicted file content:\n")
+    if merge_content is not None:
+        merge_content = merge_content[:-1] if merge_content.endswith("\n\n") else merge_content
+        if "'edits'" in prompt:
+            edits = [
+                {
+                    "search": match.group(0),
+                    "replace": match.group(1),
+                    "line": merge_content.count("\n", 0, match.start()) + 1
+                }
+                for match in _CONFLICT.finditer(merge_content)
+                ]
+            return json.dumps({"edits": edits, "explanation": explanation})
+        return json.dumps({"code": resolve_conflicts(merge_content), "explanation": explanation})
+    if '"edits"' in prompt:
+        return json.dumps({"edits": [], "explanation": explanation})
+    source_code = _section(prompt, "source code:\n", "\n####")
+    if source_code is not None:
+        return json.dumps({"improved_source_code": source_code, "explanation": explanation})
+    code = _section(prompt, "## Undocumented or Poorly Documented Code:\n")
+    if code is not None and "documented_source_code" in prompt:
+        code = code.split("above:\n", 1)[-1]
+        return json.dumps({"documented_source_code": code, "explanation": explanation})
+    return json.dumps({"docstrings": [], "explanation": explanation})
+
+
+class FakeOpenAI:
+    """
+    A chat completions server on localhost.
+
+    Args:
+        latency (float, optional): The delay before every response in seconds.
+        tokens_per_second (float, optional): The generation throughput. The
+            completion tokens add to the latency. 0 disables the delay.
+        rate_limit (float, optional): The share of requests that are answered
+            with 429, between 0 and 1.
+        retry_after (float, optional): The delay the 429 responses ask for.
+        seed (int, optional): The seed of the 429 injection.
+        responder (callable, optional): Returns the content of a response for a
+            prompt and a response format. Defaults to default_responder.
+
+    The counters requests, rate_limited, prompt_tokens and completion_tokens
+    are Counters by deployment.
+    """
+    def __init__(
+            self,
+            latency: float = 0.0,
+            tokens_per_second: float = 0.0,
+            rate_limit: float = 0.0,
+            retry_after: float = 0.1,
+            seed: int = 0,
+            responder: Callable[[str, str], str] = default_responder
+            ) -> None:
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.responder = responder
+        self.requests = Counter()
+        self.rate_limited = Counter()
+        self.prompt_tokens = Counter()
+        self.completion_tokens = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return "http://127.0.0.1:{}".format(self._server.server_address[1])
+
+    def start(self) -> "FakeOpenAI":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _complete(self, deployment: str, body: dict):
+        """
+        Returns the status, headers and body of the response to a request.
+        """
+        with self._lock:
+            self.requests[deployment] += 1
+            limited = self._random.random() < self.rate_limit
+            if limited:
+                self.rate_limited[deployment] += 1
+        if limited:
+            headers = {
+                "retry-after-ms": str(int(self.retry_after * 1000)),
+                "retry-after": str(self.retry_after)
+            }
+            error = {"error": {"code": "429", "message": "Rate limit exceeded (fake)."}}
+            return 429, headers, error
+
+        prompt = "\n".join(message.get("content") or "" for message in body.get("messages", []))
+        response_format = (body.get("response_format") or {}).get("type", "text")
+        content = self.responder(prompt, response_format)
+        prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(content)
+        with self._lock:
+            self.prompt_tokens[deployment] += prompt_tokens
+            self.completion_tokens[deployment] += completion_tokens
+        delay = self.latency
+        if self.tokens_per_second:
+            delay += completion_tokens / self.tokens_per_second
+        time.sleep(delay)
+        return 200, {}, {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": deployment,
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content}
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                # Proxied requests carry the absolute URL
+                match = _DEPLOYMENT_PATH.search(urlsplit(self.path).path)
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if match is None:
+                    status, headers, data = 404, {}, {"error": {"message": "Not found"}}
+                else:
+                    status, headers, data = server._complete(match.group(1), body)
+                payload = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
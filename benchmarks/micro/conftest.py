@@ -0,0 +1,41 @@
+"""
+Shared inputs of the micro-benchmarks.
+
+The inputs are generated from fixed seeds, so every run measures the same data.
+The suite needs the pytest-benchmark plugin and isn't collected without it.
+"""
+import os
+import random
+import string
+import pytest
+
+try:
+    import pytest_benchmark  # noqa: F401
+except ImportError:
+    collect_ignore_glob = ["test_*.py"]
+
+SEED = 1234
+
+
+@pytest.fixture
+def rng():
+    return random.Random(SEED)
+
+
+def random_text(rng: random.Random, length: int) -> str:
+    return "".join(rng.choices(string.ascii_letters + string.digits, k=length))
+
+
+def make_tree(root: str, files: int, rng: random.Random) -> None:
+    """
+    Creates a source tree with the given number of empty files, 100 files per
+    directory, a mix of extensions and some ignored directories.
+    """
+    extensions = ["py", "java", "md", "json", "txt", "xml"]
+    for index in range(files):
+        directory = os.path.join(root, "src", f"package_{index // 100}")
+        if index % 1000 == 999:
+            directory = os.path.join(root, "node_modules", f"dependency_{index // 1000}")
+        os.makedirs(directory, exist_ok=True)
+        name = f"file_{index}.{rng.choice(extensions)}"
+        open(os.path.join(directory, name), "w").close()
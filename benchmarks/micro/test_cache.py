@@ -0,0 +1,66 @@
+"""
+Cache.lookup and Cache.update with 10k to 100k cached prompts.
+"""
+import os
+import shutil
+import base64
+import pandas as pd
+import pytest
+from merge_agent.src.cache import Cache
+from benchmarks.micro.conftest import random_text
+
+SIZES = [10_000, 30_000, 100_000]
+PROMPT_SIZE = 256
+
+
+@pytest.fixture(params=SIZES, ids=lambda size: f"{size}_entries")
+def cache(request, tmp_path, rng):
+    """
+    A cache with the given number of base64 encoded prompts, written at once
+    instead of with update, which would take quadratic time.
+    """
+    prompts = [
+        base64.b64encode(random_text(rng, PROMPT_SIZE).encode()).decode()
+        for _ in range(request.param)
+        ]
+    folder = tmp_path / "cache"
+    folder.mkdir()
+    pd.DataFrame({"prompt": prompts}).to_csv(folder / "prompts.csv", index=False)
+    # Answer of the last prompt, read when it's updated again
+    pd.DataFrame({"answer": ["answer"]}).to_csv(folder / f"{len(prompts) - 1}.csv", index=False)
+    shutil.copy(folder / "prompts.csv", tmp_path / "pristine.csv")
+    cache = Cache(cache_folder=str(folder))
+    cache.prompts = prompts
+    cache.pristine = str(tmp_path / "pristine.csv")
+    return cache
+
+
+def test_lookup_hit(benchmark, cache):
+    benchmark.group = "Cache.lookup hit"
+    benchmark.extra_info["entries"] = len(cache.prompts)
+    assert benchmark(cache.lookup, cache.prompts[-1])
+
+
+def test_lookup_miss(benchmark, cache, rng):
+    benchmark.group = "Cache.lookup miss"
+    benchmark.extra_info["entries"] = len(cache.prompts)
+    assert not benchmark(cache.lookup, random_text(rng, PROMPT_SIZE))
+
+
+def test_update_existing(benchmark, cache):
+    benchmark.group = "Cache.update existing prompt"
+    benchmark.extra_info["entries"] = len(cache.prompts)
+    assert benchmark(cache.update, cache.prompts[-1], "answer") == 1
+
+
+def test_update_new(benchmark, cache, rng):
+    benchmark.group = "Cache.update new prompt"
+    benchmark.extra_info["entries"] = len(cache.prompts)
+    prompt = random_text(rng, PROMPT_SIZE)
+
+    def reset():
+        # Every round starts from the same number of entries
+        shutil.copy(cache.pristine, cache.cache_file)
+
+    benchmark.pedantic(cache.update, args=(prompt, "answer"), setup=reset, rounds=10)
+    assert os.path.exists(os.path.join(cache.cache_folder, f"{len(cache.prompts)}.csv"))
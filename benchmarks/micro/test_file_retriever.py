@@ -0,0 +1,61 @@
+"""
+FileRetriever on trees with 1k to 100k files, with git ls-files and with the
+os.walk fallback.
+"""
+import random
+import subprocess
+import pytest
+from code_quality_agent.src.file_retriever import FileRetriever
+from benchmarks.micro.conftest import SEED, make_tree
+
+SIZES = [1_000, 10_000, 100_000]
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda size: f"{size}_files")
+def size(request):
+    return request.param
+
+
+@pytest.fixture(scope="module")
+def plain_tree(size, tmp_path_factory):
+    root = str(tmp_path_factory.mktemp(f"plain_{size}"))
+    make_tree(root, size, random.Random(SEED))
+    return root
+
+
+@pytest.fixture(scope="module")
+def git_tree(size, tmp_path_factory):
+    root = str(tmp_path_factory.mktemp(f"git_{size}"))
+    make_tree(root, size, random.Random(SEED))
+    subprocess.run(["git", "init", "-q", root], check=True)
+    subprocess.run(["git", "-C", root, "add", "-A"], check=True)
+    subprocess.run(
+        ["git", "-C", root, "-c", "user.name=a", "-c", "user.email=a@b",
+         "commit", "-q", "-m", "Tree"],
+        check=True
+        )
+    return root
+
+
+def scan(root):
+    return FileRetriever(root).get_mapping()
+
+
+def test_walk(benchmark, plain_tree, size):
+    benchmark.group = "FileRetriever os.walk"
+    benchmark.extra_info["files"] = size
+    mapping = benchmark(scan, plain_tree)
+    assert sum(len(files) for files in mapping.values()) > 0
+
+
+def test_git_cold(benchmark, git_tree, size):
+    benchmark.group = "FileRetriever git ls-files, cold"
+    benchmark.extra_info["files"] = size
+    benchmark.pedantic(scan, args=(git_tree,), setup=FileRetriever.clear_cache, rounds=5)
+
+
+def test_git_cached(benchmark, git_tree, size):
+    benchmark.group = "FileRetriever git ls-files, cached"
+    benchmark.extra_info["files"] = size
+    scan(git_tree)
+    benchmark(scan, git_tree)
@@ -0,0 +1,78 @@
+"""
+LintAgent.create_tasks on PMD reports with 1k to 100k violations.
+"""
+import json
+import pytest
+from code_quality_agent.src.lint_agent import LintAgent
+from code_quality_agent.src.findings import FindingIndex, parse_pmd_report
+
+SIZES = [1_000, 10_000, 100_000]
+VIOLATIONS_PER_FILE = 20
+RULES = ["UnusedLocalVariable", "EmptyCatchBlock", "UnusedPrivateField", "ShortVariable"]
+
+
+def pmd_report(directory, violations, rng):
+    files = []
+    for index in range(0, violations, VIOLATIONS_PER_FILE):
+        lines = sorted(rng.randint(1, 500) for _ in range(VIOLATIONS_PER_FILE))
+        files.append({
+            "filename": f"{directory}/src/main/java/com/example/Class{index}.java",
+            "violations": [
+                {
+                    "beginline": line,
+                    "endline": line + rng.randint(0, 3),
+                    "rule": rng.choice(RULES),
+                    "description": "Avoid this pattern."
+                }
+                for line in lines
+            ]
+        })
+    return json.dumps({"formatVersion": 0, "files": files})
+
+
+@pytest.fixture(params=SIZES, ids=lambda size: f"{size}_violations")
+def report(request, rng):
+    directory = "/tmp/repo"
+    raw = pmd_report(directory, request.param, rng)
+    file_list = [file["filename"] for file in json.loads(raw)["files"]]
+    # Half of every file is changed by the pull request
+    changed_ranges = {
+        path[len(directory) + 1:]: [(1, 100), (200, 300)]
+        for path in file_list
+        }
+    return directory, raw, file_list, changed_ranges, request.param
+
+
+def lint_agent(directory, raw, file_list, changed_ranges):
+    # The agent is built without __init__, which would run PMD
+    agent = LintAgent.__new__(LintAgent)
+    agent.directory = directory
+    agent.file_list = file_list
+    agent.language = "java"
+    agent.highlighted_languages = ["python", "java", "java-local"]
+    agent.changed_ranges = changed_ranges
+    agent.raw_stats = raw
+    agent.findings = FindingIndex()
+    agent.tasks = []
+    return agent
+
+
+def test_parse_pmd_report(benchmark, report):
+    directory, raw, _, _, violations = report
+    benchmark.group = "parse_pmd_report"
+    benchmark.extra_info["violations"] = violations
+    assert len(benchmark(parse_pmd_report, raw, directory)) == violations
+
+
+def test_create_tasks(benchmark, report):
+    directory, raw, file_list, changed_ranges, violations = report
+    benchmark.group = "LintAgent.create_tasks"
+    benchmark.extra_info["violations"] = violations
+    findings = parse_pmd_report(raw, directory)
+
+    def setup():
+        agent = lint_agent(directory, raw, file_list, changed_ranges)
+        agent.findings = findings
+        return (agent,), {}
+
+    benchmark.pedantic(LintAgent.create_tasks, setup=setup, rounds=10)
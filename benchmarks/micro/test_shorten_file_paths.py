@@ -0,0 +1,33 @@
+"""
+PRGitHandler.shorten_file_paths on summaries with 10 to 10k file paths.
+"""
+import uuid
+import pytest
+from pull_request_agent.src.pr_git_handler import PRGitHandler
+from benchmarks.micro.conftest import random_text
+
+SIZES = [10, 100, 1_000, 10_000]
+
+
+@pytest.fixture(params=SIZES, ids=lambda size: f"{size}_paths")
+def summary(request, rng):
+    unique_id = uuid.UUID(int=rng.getrandbits(128))
+    lines = [
+        "- /app/bmw_code_agent/.tmp/repository_{}/src/{}/{}.py: {}".format(
+            unique_id,
+            random_text(rng, 8),
+            random_text(rng, 12),
+            random_text(rng, 60)
+            )
+        for _ in range(request.param)
+        ]
+    return "Changed files:\n" + "\n".join(lines), request.param
+
+
+def test_shorten_file_paths(benchmark, summary):
+    text, paths = summary
+    benchmark.group = "PRGitHandler.shorten_file_paths"
+    benchmark.extra_info["paths"] = paths
+    handler = PRGitHandler(pr_number=1)
+    result = benchmark(handler.shorten_file_paths, text)
+    assert ".tmp" not in result
@@ -0,0 +1,295 @@
+"""
+End-to-end benchmark of a webhook run.
+
+Every repetition generates a synthetic repository (see
+benchmarks.synthetic_repo), starts the fake chat completions and GitHub
+servers and runs controller.src.main.main in a fresh Python process against
+them:
+- the agents' OpenAI clients are pointed at the fake server, as endpoint and
+  as proxy,
+- the GitHub API calls go to the fake GitHub server, whose certificate is
+  trusted through REQUESTS_CA_BUNDLE, and
+- the clone and push URLs are rewritten to the bare repository with a
+  url.<base>.insteadOf setting passed in GIT_CONFIG_COUNT/KEY/VALUE, and
+- HOME, the global git config and all caches point into the temporary
+  directory, so a run neither changes the developer's git identity nor fills
+  the real caches with fake responses.
+
+The report contains the wall time, CPU time and peak RSS of the run process and
+the duration and calls of every pipeline stage, taken from the trace the run
+writes to TRACE_FILE (see controller.src.tracing).
+
+Usage:
+    python -m benchmarks.run --conflicts 5 --findings 20 --latency 0.5 \\
+        --tokens-per-second 200 --rate-limit 0.1 --repeat 3 --output report.json
+
+Every repetition uses its own seed (--seed plus the repetition number), so the
+merge agent's response cache doesn't turn later repetitions into cache hits.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+import time
+from collections import defaultdict
+from typing import Dict, List
+from benchmarks.fake_openai import FakeOpenAI
+from benchmarks.fake_github import FakeGitHub, make_certificate
+from benchmarks.synthetic_repo import create_repo
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# controller.src.main always uses this owner
+OWNER = "GCDM"
+REPO_NAME = "synthetic"
+PR_NUMBER = "1"
+GIT_USERNAME = "benchmark"
+GIT_ACCESS_TOKEN = "benchmark-token"
+JSON_DEPLOYMENT = "fake-json"
+TEXT_DEPLOYMENT = "fake-text"
+
+_RUN_MAIN = """
+import sys
+from controller.src.main import main
+from controller.src.git_handler import GitHandler
+try:
+    main(*sys.argv[1:])
+finally:
+    if getattr(GitHandler, "_tmp_path", None):
+        GitHandler.clean_up()
+"""
+
+
+def run_environment(directory: str, openai: FakeOpenAI, github: FakeGitHub, certificate: str) -> dict:
+    """
+    Returns the environment of a run process against the fake servers.
+    """
+    remotes = os.path.join(directory, "remotes")
+    return {
+        **os.environ,
+        "PYTHONPATH": PROJECT_ROOT,
+        "OPENAI_API_KEY": "benchmark",
+        "AZURE_OPENAI_ENDPOINT": openai.url,
+        "HTTPS_PROXY": openai.url,
+        "NO_PROXY": "127.0.0.1,localhost",
+        "REQUESTS_CA_BUNDLE": certificate,
+        "GIT_BASE_URL": github.host,
+        "GIT_USERNAME": GIT_USERNAME,
+        "GIT_ACCESS_TOKEN": GIT_ACCESS_TOKEN,
+        "JSON-DEPLOYMENT": JSON_DEPLOYMENT,
+        "TEXT-DEPLOYMENT": TEXT_DEPLOYMENT,
+        "GIT_CONFIG_COUNT": "1",
+        "GIT_CONFIG_KEY_0": f"url.file://{remotes}/.insteadOf",
+        "GIT_CONFIG_VALUE_0": f"https://{GIT_USERNAME}:{GIT_ACCESS_TOKEN}@{github.host}/",
+        "HOME": directory,
+        "GIT_CONFIG_GLOBAL": os.path.join(directory, "gitconfig"),
+        "TRACE_FILE": os.path.join(directory, "trace.jsonl"),
+        "DOCSTRING_INDEX_DIR": os.path.join(directory, "docstring_index"),
+        "PMD_CACHE_DIR": os.path.join(directory, "pmd_cache"),
+        "MERGE_CACHE_DIR": os.path.join(directory, "merge_cache"),
+        "PR_SUMMARY_CACHE_DIR": os.path.join(directory, "pr_summary_cache"),
+        "RESULT_STORE_DIR": os.path.join(directory, "results"),
+    }
+
+
+def stage_report(records: List[dict]) -> Dict[str, dict]:
+    """
+    Aggregates the spans of a trace by pipeline stage.
+
+    Every span is attributed to its closest "stage.<name>" ancestor. Spans
+    outside of the pipeline, e.g. the pull request summary, are attributed to
+    "webhook".
+
+    Returns:
+        dict: By stage the wall time in seconds, the number of OpenAI calls,
+        their tokens, the number of GitHub API requests and git commands.
+    """
+    by_id = {record["span_id"]: record for record in records}
+
+    def stage_of(record):
+        while record is not None:
+            if record["name"].startswith("stage."):
+                return record["name"][len("stage."):]
+            record = by_id.get(record["parent_id"])
+        return "webhook"
+
+    stages = defaultdict(lambda: {
+        "wall_s": 0.0,
+        "llm_calls": 0,
+        "llm_errors": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "github_requests": 0,
+        "git_commands": 0,
+    })
+    for record in records:
+        stage = stages[stage_of(record)]
+        name, attributes = record["name"], record["attributes"]
+        if name.startswith("stage.") or name == "webhook":
+            stage["wall_s"] = round(record["duration_ms"] / 1000, 3)
+        elif name == "llm.completion":
+            stage["llm_calls"] += 1
+            stage["llm_errors"] += record["status"] == "error"
+            stage["prompt_tokens"] += attributes.get("prompt_tokens", 0)
+            stage["completion_tokens"] += attributes.get("completion_tokens", 0)
+        elif name.startswith("github."):
+            stage["github_requests"] += attributes.get("requests", 1)
+        elif name.startswith("git."):
+            stage["git_commands"] += 1
+    return dict(stages)
+
+
+def _read_trace(path: str) -> List[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def run_once(args, seed: int) -> dict:
+    """
+    Runs one repetition in a temporary directory and returns its measurements.
+    """
+    directory = tempfile.mkdtemp(prefix="optima-benchmark-")
+    try:
+        repo = create_repo(
+            directory,
+            conflicts=args.conflicts,
+            findings=args.findings,
+            seed=seed,
+            owner=OWNER,
+            name=REPO_NAME
+            )
+        certificate, key = make_certificate(directory)
+        openai = FakeOpenAI(
+            latency=args.latency,
+            tokens_per_second=args.tokens_per_second,
+            rate_limit=args.rate_limit,
+            seed=seed
+            )
+        github = FakeGitHub(repo, certificate, key)
+        with openai, github:
+            env = run_environment(directory, openai, github, certificate)
+            with open(os.path.join(directory, "run.log"), "w") as log:
+                start = time.perf_counter()
+                process = subprocess.Popen(
+                    [sys.executable, "-c", _RUN_MAIN, JSON_DEPLOYMENT, TEXT_DEPLOYMENT, REPO_NAME, PR_NUMBER],
+                    cwd=PROJECT_ROOT,
+                    env=env,
+                    stdout=log,
+                    stderr=subprocess.STDOUT
+                    )
+                # wait4 returns the resource usage of this process and the
+                # processes it waited for (git, PMD, ...)
+                _, status, usage = os.wait4(process.pid, 0)
+                wall = time.perf_counter() - start
+            process.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        max_rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        if process.returncode != 0 and args.verbose:
+            with open(os.path.join(directory, "run.log")) as log:
+                print(log.read()[-4000:], file=sys.stderr)
+        return {
+            "seed": seed,
+            "exit_code": process.returncode,
+            "wall_s": round(wall, 3),
+            "cpu_user_s": round(usage.ru_utime, 3),
+            "cpu_system_s": round(usage.ru_stime, 3),
+            "max_rss_mb": round(max_rss_mb, 1),
+            "openai": {
+                "requests": sum(openai.requests.values()),
+                "rate_limited": sum(openai.rate_limited.values()),
+                "prompt_tokens": sum(openai.prompt_tokens.values()),
+                "completion_tokens": sum(openai.completion_tokens.values()),
+            },
+            "github": dict(github.requests),
+            "stages": stage_report(_read_trace(env["TRACE_FILE"])),
+        }
+    finally:
+        if args.keep:
+            print("Kept " + directory, file=sys.stderr)
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def summarize(runs: List[dict]) -> dict:
+    """
+    Returns the medians of the measurements of several repetitions.
+    """
+    def median(values):
+        return round(statistics.median(values), 3) if values else 0
+
+    stages = {}
+    for name in sorted({name for run in runs for name in run["stages"]}):
+        values = [run["stages"][name] for run in runs if name in run["stages"]]
+        stages[name] = {key: median([value[key] for value in values]) for key in values[0]}
+    return {
+        "repetitions": len(runs),
+        "failed": sum(1 for run in runs if run["exit_code"] != 0),
+        **{
+            key: median([run[key] for run in runs])
+            for key in ("wall_s", "cpu_user_s", "cpu_system_s", "max_rss_mb")
+        },
+        "openai_requests": median([run["openai"]["requests"] for run in runs]),
+        "openai_rate_limited": median([run["openai"]["rate_limited"] for run in runs]),
+        "stages": stages,
+    }
+
+
+def format_summary(summary: dict) -> str:
+    lines = [
+        "repetitions: {repetitions} (failed: {failed})".format(**summary),
+        "wall: {wall_s:.2f} s, cpu: {cpu_user_s:.2f} s user / {cpu_system_s:.2f} s system, "
+        "max RSS: {max_rss_mb:.0f} MB".format(**summary),
+        "OpenAI requests: {openai_requests:.0f} ({openai_rate_limited:.0f} rate limited)".format(**summary),
+        "",
+        "{:<22}{:>9}{:>7}{:>12}{:>12}{:>8}{:>6}".format(
+            "stage", "wall s", "llm", "prompt tok", "compl tok", "github", "git"
+        ),
+    ]
+    for name, stage in summary["stages"].items():
+        lines.append("{:<22}{:>9.2f}{:>7.0f}{:>12.0f}{:>12.0f}{:>8.0f}{:>6.0f}".format(
+            name,
+            stage["wall_s"],
+            stage["llm_calls"],
+            stage["prompt_tokens"],
+            stage["completion_tokens"],
+            stage["github_requests"],
+            stage["git_commands"]
+            ))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of a webhook run.")
+    parser.add_argument("--conflicts", type=int, default=5, help="Files with merge conflicts.")
+    parser.add_argument("--findings", type=int, default=20, help="Lint findings in Java files.")
+    parser.add_argument("--latency", type=float, default=0.5, help="Fixed response delay in seconds.")
+    parser.add_argument(
+        "--tokens-per-second",
+        type=float,
+        default=200.0,
+        help="Completion token throughput, 0 for no generation delay."
+        )
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Share of requests answered with 429.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of repetitions.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first repetition.")
+    parser.add_argument("--output", help="Write the measurements as JSON to this file.")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary directories.")
+    parser.add_argument("--verbose", action="store_true", help="Print the log of failed runs.")
+    args = parser.parse_args(argv)
+
+    runs = [run_once(args, args.seed + repetition) for repetition in range(args.repeat)]
+    summary = summarize(runs)
+    print(format_summary(summary))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"arguments": vars(args), "summary": summary, "runs": runs}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+This module generates git repositories for the benchmarks.
+
+A synthetic repository is a bare repository with a target branch ("main") and
+a pull request branch ("feature"):
+- conflicting Python files are changed on both branches in the same lines, so
+  merging main into feature conflicts, and
+- Java files with lint findings (unused local variables, empty catch blocks,
+  ...) are added on the feature branch.
+
+The content is generated from a seed, so a seed always gives the same
+repository. The pull request files, as the GitHub API reports them, are
+computed from the branches.
+"""
+import os
+import random
+import subprocess
+from typing import List, NamedTuple
+
+TARGET_BRANCH = "main"
+SOURCE_BRANCH = "feature"
+FINDINGS_PER_FILE = 5
+
+_WORDS = [
+    "account", "amount", "balance", "customer", "order", "invoice", "item",
+    "price", "quantity", "discount", "total", "vehicle", "dealer", "contract"
+]
+
+
+class SyntheticRepo(NamedTuple):
+    """
+    A generated repository.
+
+    remote is the path of the bare repository, pr_files the changed files of
+    the pull request in the format of the GitHub pull request files API.
+    """
+    remote: str
+    owner: str
+    name: str
+    source_branch: str
+    target_branch: str
+    pr_files: List[dict]
+
+
+def _git(cwd, *args):
+    return subprocess.run(
+        ["git", "-C", cwd, *args],
+        check=True,
+        capture_output=True,
+        env={
+            **os.environ,
+            "GIT_AUTHOR_NAME": "Benchmark",
+            "GIT_AUTHOR_EMAIL": "benchmark@example.com",
+            "GIT_COMMITTER_NAME": "Benchmark",
+            "GIT_COMMITTER_EMAIL": "benchmark@example.com",
+        }
+        ).stdout.decode("utf-8")
+
+
+def _write(directory, path, content):
+    full_path = os.path.join(directory, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "w", encoding="utf-8") as file:
+        file.write(content)
+
+
+def python_module(rng: random.Random, functions: int = 8) -> str:
+    """
+    Generates a Python module with documented functions.
+    """
+    parts = ['"""Generated module."""\n']
+    for _ in range(functions):
+        name = "_".join(rng.sample(_WORDS, 2))
+        factor = rng.randint(2, 9)
+        parts.append(
+            f"\n\ndef compute_{name}(value):\n"
+            f'    """Computes the {name.replace("_", " ")}."""\n'
+            f"    result = value * {factor}\n"
+            f"    return result\n"
+        )
+    return "".join(parts)
+
+
+def java_class(rng: random.Random, name: str, findings: int) -> str:
+    """
+    Generates a Java class with the given number of lint findings.
+    """
+    methods = []
+    for index in range(findings):
+        word = rng.choice(_WORDS)
+        if index % 2 == 0:
+            # Unused local variable
+            body = f"        int unused{word.title()} = {rng.randint(1, 99)};\n" \
+                f"        return value + {rng.randint(1, 99)};\n"
+        else:
+            # Empty catch block
+            body = "        try {\n" \
+                "            return Integer.parseInt(String.valueOf(value));\n" \
+                "        } catch (NumberFormatException e) {\n" \
+                "        }\n" \
+                "        return value;\n"
+        methods.append(f"    public int {word}{index}(int value) {{\n{body}    }}\n")
+    return f"public class {name} {{\n\n" + "\n".join(methods) + "}\n"
+
+
+def create_repo(
+        directory: str,
+        conflicts: int,
+        findings: int,
+        seed: int = 0,
+        owner: str = "benchmark",
+        name: str = "synthetic"
+        ) -> SyntheticRepo:
+    """
+    Creates a synthetic repository.
+
+    Args:
+        directory (str): An empty directory for the working copy and the bare
+            repository.
+        conflicts (int): The number of files with merge conflicts.
+        findings (int): The number of lint findings, spread over Java files
+            with up to FINDINGS_PER_FILE findings each.
+        seed (int, optional): The seed of the content.
+        owner (str, optional): The owner of the repository.
+        name (str, optional): The name of the repository.
+
+    Returns:
+        SyntheticRepo: The bare repository at <directory>/remotes/<owner>/<name>.git.
+    """
+    rng = random.Random(seed)
+    work = os.path.join(directory, "work")
+    remote = os.path.join(directory, "remotes", owner, name + ".git")
+    os.makedirs(work)
+    _git(work, "init", "-q", "-b", TARGET_BRANCH)
+
+    conflict_files = [f"src/module_{index}.py" for index in range(conflicts)]
+    _write(work, "README.md", "# Synthetic repository\n")
+    for path in conflict_files:
+        _write(work, path, python_module(rng))
+    _git(work, "add", "-A")
+    _git(work, "commit", "-q", "-m", "Initial commit")
+
+    # The same line is changed differently on both branches
+    def change_conflict_files(branch):
+        for path in conflict_files:
+            with open(os.path.join(work, path), encoding="utf-8") as file:
+                lines = file.read().splitlines(keepends=True)
+            for index, line in enumerate(lines):
+                if line.lstrip().startswith("result = "):
+                    lines[index] = f"    result = value * {rng.randint(10, 99)}  # {branch}\n"
+            _write(work, path, "".join(lines))
+
+    _git(work, "checkout", "-q", "-b", SOURCE_BRANCH)
+    change_conflict_files(SOURCE_BRANCH)
+    remaining = findings
+    index = 0
+    while remaining > 0:
+        count = min(FINDINGS_PER_FILE, remaining)
+        class_name = f"Finding{index}"
+        _write(
+            work,
+            f"src/main/java/com/example/{class_name}.java",
+            java_class(rng, class_name, count)
+            )
+        remaining -= count
+        index += 1
+    _git(work, "add", "-A")
+    _git(work, "commit", "-q", "-m", "Change the modules and add the services")
+
+    _git(work, "checkout", "-q", TARGET_BRANCH)
+    change_conflict_files(TARGET_BRANCH)
+    _git(work, "commit", "-q", "-am", "Change the modules on main")
+
+    os.makedirs(os.path.dirname(remote), exist_ok=True)
+    _git(directory, "clone", "-q", "--bare", work, remote)
+    return SyntheticRepo(
+        remote=remote,
+        owner=owner,
+        name=name,
+        source_branch=SOURCE_BRANCH,
+        target_branch=TARGET_BRANCH,
+        pr_files=pr_files(remote, TARGET_BRANCH, SOURCE_BRANCH)
+    )
+
+
+def pr_files(remote: str, target_branch: str, source_branch: str) -> List[dict]:
+    """
+    Computes the changed files of a pull request like the GitHub API does,
+    from the merge base of the branches to the source branch.
+    """
+    revisions = f"{target_branch}...{source_branch}"
+    files = []
+    for line in _git(remote, "diff", "--numstat", revisions).splitlines():
+        additions, deletions, path = line.split("\t")
+        patch = _git(remote, "diff", revisions, "--", path)
+        # The API sends the hunks without the file header
+        patch = patch[patch.index("@@"):] if "@@" in patch else None
+        status = "added" if "new file mode" in _git(
+            remote, "diff", "--summary", revisions, "--", path
+            ) else "modified"
+        files.append({
+            "filename": path,
+            "status": status,
+            "additions": int(additions),
+            "deletions": int(deletions),
+            "changes": int(additions) + int(deletions),
+            "sha": _git(remote, "rev-parse", f"{source_branch}:{path}").strip(),
+            "patch": patch
+        })
+    return files
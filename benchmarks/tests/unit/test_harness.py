@@ -0,0 +1,98 @@
+import json
+import subprocess
+import requests
+from benchmarks.fake_openai import FakeOpenAI
+from benchmarks.fake_github import FakeGitHub, make_certificate
+from benchmarks.synthetic_repo import create_repo
+from benchmarks.run import stage_report
+
+def completion(url, prompt, response_format="json_object"):
+    return requests.post(
+        url + "/openai/deployments/fake-json/chat/completions?api-version=2024-02-01",
+        json={
+            "messages": [{"role": "user", "content": prompt}],
+            "response_format": {"type": response_format}
+        }
+    )
+
+def test_synthetic_repo_conflicts(tmp_path):
+    repo = create_repo(str(tmp_path), conflicts=3, findings=7, seed=1)
+    assert sorted(file["filename"] for file in repo.pr_files) == [
+        "src/main/java/com/example/Finding0.java",
+        "src/main/java/com/example/Finding1.java",
+        "src/module_0.py",
+        "src/module_1.py",
+        "src/module_2.py",
+    ]
+    assert all(file["patch"].startswith("@@") for file in repo.pr_files)
+    clone = str(tmp_path / "clone")
+    subprocess.run(["git", "clone", "-q", "-b", "feature", repo.remote, clone], check=True)
+    merge = subprocess.run(
+        ["git", "-C", clone, "-c", "user.name=a", "-c", "user.email=a@b", "merge", "origin/main"],
+        capture_output=True
+    )
+    assert merge.returncode != 0
+    unmerged = subprocess.run(
+        ["git", "-C", clone, "diff", "--name-only", "--diff-filter=U"],
+        capture_output=True, text=True
+    ).stdout.split()
+    assert unmerged == ["src/module_0.py", "src/module_1.py", "src/module_2.py"]
+
+def test_synthetic_repo_is_reproducible(tmp_path):
+    first = create_repo(str(tmp_path / "a"), conflicts=2, findings=3, seed=5)
+    second = create_repo(str(tmp_path / "b"), conflicts=2, findings=3, seed=5)
+    assert [file["sha"] for file in first.pr_files] == [file["sha"] for file in second.pr_files]
+
+def test_fake_openai_resolves_merge_conflicts():
+    content = "a\n<<<<<<< HEAD\nb\n=======\nc\n>>>>>>> main\nd\n"
+    with FakeOpenAI() as server:
+        response = completion(server.url, "Merge conflicted file content:\n" + content + "\n")
+        data = response.json()
+    assert response.status_code == 200
+    assert json.loads(data["choices"][0]["message"]["content"])["code"] == "a\nb\nd\n"
+    assert data["usage"]["completion_tokens"] > 0
+    assert server.requests["fake-json"] == 1
+
+def test_fake_openai_rate_limits():
+    with FakeOpenAI(rate_limit=1.0, retry_after=0.05) as server:
+        response = completion(server.url, "source code:\nx = 1\n####\n")
+    assert response.status_code == 429
+    assert response.headers["retry-after-ms"] == "50"
+    assert server.rate_limited["fake-json"] == 1
+
+def test_fake_github_serves_the_pull_request(tmp_path):
+    repo = create_repo(str(tmp_path / "repo"), conflicts=2, findings=0, seed=0)
+    certificate, key = make_certificate(str(tmp_path))
+    with FakeGitHub(repo, certificate, key) as server:
+        base = f"https://{server.host}/api/v3/repos/GCDM/synthetic"
+        pull = requests.get(base + "/pulls/1", verify=certificate).json()
+        files = requests.get(base + "/pulls/1/files", params={"per_page": 1, "page": 2}, verify=certificate).json()
+        created = requests.post(base + "/issues/1/comments", json={"body": "a"}, verify=certificate)
+        updated = requests.patch(
+            base + "/issues/comments/{}".format(created.json()["id"]),
+            json={"body": "b"},
+            verify=certificate
+        )
+    assert pull["head"]["ref"] == "feature" and pull["base"]["ref"] == "main"
+    assert [file["filename"] for file in files] == ["src/module_1.py"]
+    assert (created.status_code, updated.status_code) == (201, 200)
+    assert server.comments == {1: "b"}
+
+def test_stage_report_attributes_spans_to_stages():
+    def record(span_id, parent_id, name, duration_ms=1.0, **attributes):
+        return {
+            "span_id": span_id, "parent_id": parent_id, "name": name, "status": "ok",
+            "duration_ms": duration_ms, "attributes": attributes
+        }
+    report = stage_report([
+        record("w", None, "webhook", 5000),
+        record("s", "w", "stage.merge", 2000),
+        record("g", "s", "git.merge"),
+        record("l", "g", "llm.completion", prompt_tokens=10, completion_tokens=2),
+        record("p", "w", "llm.completion", prompt_tokens=4, completion_tokens=1),
+        record("c", "w", "github.changed_files", requests=2),
+    ])
+    assert report["merge"]["wall_s"] == 2.0
+    assert report["merge"]["llm_calls"] == 1 and report["merge"]["git_commands"] == 1
+    assert report["merge"]["prompt_tokens"] == 10
+    assert report["webhook"]["llm_calls"] == 1 and report["webhook"]["github_requests"] == 2
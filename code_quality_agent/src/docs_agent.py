@@ -1,15 +1,32 @@
 import code_quality_agent.src.prompts as prompts
 import os
 import ast
-import re
+import json
 import httpx
 import logging
 from openai import AzureOpenAI
+from controller.src.llm import complete
+from controller.src import metrics
+from controller.src import routing
 from . import CodeQualityAgent
 from code_quality_agent.src.file_retriever import FileRetriever
+from code_quality_agent.src.docstring_index import (
+    EXTENSIONS,
+    DocstringIndex,
+    extract_files,
+    lacks_module_docstring
+)
+from code_quality_agent.src.symbols import find_symbols, insert_docstrings
+from controller.src.edits import PATCH_RESPONSES, EditApplyError, apply_patch_response
 
 LOGGER = logging.getLogger(__name__)
 
+# Symbol mode: only the docstrings of undocumented symbols are requested and
+# inserted locally
+DOCS_PER_SYMBOL = os.environ.get("DOCS_PER_SYMBOL", "0") == "1"
+# Number of symbols per request in symbol mode
+DOCS_SYMBOLS_PER_REQUEST = int(os.environ.get("DOCS_SYMBOLS_PER_REQUEST", 8))
+
 client = AzureOpenAI(
     api_key=os.getenv("OPENAI_API_KEY"),
     api_version="2024-02-01",
@@ -24,23 +41,14 @@ def get_completion(prompt, model=os.environ["JSON-DEPLOYMENT"], type="json_objec
     """
     Sends a prompt to the OpenAI API and returns the AI"s response.
     """
-    messages = [
-        {
-            "role": "system",
-            "content": "You are a system designed to improve code quality."
-        },
-        {
-            "role": "user",
-            "content": prompt
-        }
-    ]
-    response = client.chat.completions.create(
+    return complete(
+        client,
+        prompt,
         model=model,
-        messages=messages,
-        temperature=0, # this is the degree of randomness of the model"s output,
-        response_format={"type": type}
-    )
-    return response.choices[0].message.content
+        type=type,
+        agent="docs_agent",
+        task=routing.DOCSTRINGS
+        )
 
 class DocsAgent(CodeQualityAgent):
     """
@@ -50,119 +58,230 @@ class DocsAgent(CodeQualityAgent):
         oder im PR vorschlagen.
     """
     LOGGER.debug("~~~~~~ DocsAgent ~~~~~~")
-    def __init__(self, file_list, directory, language):
+    def __init__(self, file_list, directory, language, cache_name=None, per_symbol=None):
+        """
+        Args:
+            cache_name (str, optional): The name of the persistent docstring 
+                index, usually the repository name. Defaults to the directory name.
+            per_symbol (bool, optional): If True, docstrings are generated for 
+                every undocumented class, function and method and inserted 
+                locally. Otherwise Python files without a module docstring and 
+                Java files without Javadoc are rewritten as a whole (see 
+                _check_files). Defaults to DOCS_PER_SYMBOL.
+        """
         super().__init__(file_list)
         self.directory = directory
         self.language = language
         self._existing_docstrings = []
         self._responses = []
+        self.per_symbol = DOCS_PER_SYMBOL if per_symbol is None else per_symbol
+        self._index = DocstringIndex(
+            language,
+            cache_name or os.path.basename(os.path.abspath(directory))
+            )
 
         self._extract_docstrings()
 
     def make_docstrings(self):
-        for file_path in self.file_list:
-            full_file_path = os.path.join(self.directory, file_path)
-            if self._can_add_docstrings(full_file_path):
+        if self.per_symbol:
+            self._make_symbol_docstrings()
+            return
+        full_file_paths = [os.path.join(self.directory, file_path) for file_path in self.file_list]
+        can_add_docstrings = self._check_files(full_file_paths)
+        for file_path, full_file_path in zip(self.file_list, full_file_paths):
+            if can_add_docstrings[full_file_path]:
                 with open(full_file_path, "r") as file:
                     file_content = file.read()
-                response = get_completion(
-                    prompts.docs_prompt.format(
-                        language=self.language,
-                        docstrings=self._existing_docstrings,
-                        code=file_content
-                    )
-                )
+                response = self._document(file_path, file_content)
                 LOGGER.debug("Respne:\n" + str(response))
                 self._responses.append(response)
                 self._write_changes(full_file_path, response["documented_source_code"])
-    
-    def _write_changes(self, file_path, code):
-        with open(file_path, "w") as file:
-            file.write(code)
-    
-    def _can_add_docstrings(self, file_path):
-        """
-        Checks if docstrings can be added to a file.
 
-        Args:
-            file_path (str): The file path.
+    def _make_symbol_docstrings(self):
+        """
+        Adds docstrings to the undocumented symbols of every file.
 
-        Returns:
-            bool: True if docstrings can be added, False otherwise.
+        The symbols of a file are sent in batches of DOCS_SYMBOLS_PER_REQUEST, 
+        the AI model only returns the text of the docstrings, which is inserted 
+        at the right lines locally. Python files that don't parse with the 
+        docstrings are left unchanged.
         """
-        _, extension = os.path.splitext(file_path)
-        LOGGER.debug("long file path = " + file_path)
+        extension = "." + EXTENSIONS.get(self.language, "")
+        for file_path in self.file_list:
+            if self.language not in EXTENSIONS or not file_path.endswith(extension):
+                continue
+            full_file_path = os.path.join(self.directory, file_path)
+            with open(full_file_path, "r", encoding="utf-8") as file:
+                file_content = file.read()
+            symbols = find_symbols(self.language, file_content)
+            if not symbols:
+                continue
 
-        if self.language == "python" and extension == ".py":
-            docstrings = self._extract_pydoc(file_path)
-        elif self.language == "java" and extension == ".java":
-            docstrings = self._extract_javadoc(file_path)
-        else:
-            return False
+            docstrings, explanations = {}, []
+            for start in range(0, len(symbols), DOCS_SYMBOLS_PER_REQUEST):
+                batch = symbols[start:start + DOCS_SYMBOLS_PER_REQUEST]
+                response = self._document_symbols(file_content, batch)
+                explanations.append(response.get("explanation", ""))
+                for item in response.get("docstrings", []):
+                    try:
+                        docstrings[batch[int(item["id"])]] = item["docstring"]
+                    except (IndexError, KeyError, TypeError, ValueError):
+                        LOGGER.debug("Invalid docstring in response: %s", item)
+            if not docstrings:
+                continue
 
-        return len(docstrings) == 0
+            documented = insert_docstrings(self.language, file_content, docstrings)
+            if self.language == "python":
+                # A file that no longer parses is never written
+                try:
+                    ast.parse(documented)
+                except (SyntaxError, ValueError):
+                    LOGGER.debug("The docstrings break %s, it is left alone.", file_path)
+                    continue
+            response = {
+                "documented_source_code": documented,
+                "explanation": "\n".join(explanations)
+            }
+            self._responses.append(response)
+            self._write_changes(full_file_path, response["documented_source_code"])
 
-    def _extract_docstrings(self):
+    def _document_symbols(self, file_content, symbols):
         """
-        Extracts the docstrings from a file.
+        Asks the AI model for the docstrings of a batch of symbols.
 
-        Args:
-            file_path (str): The file path.
+        Returns:
+            dict: The response with the keys "docstrings" and "explanation". The 
+            ids of the docstrings are the indexes of the symbols in the batch.
+        """
+        described = ""
+        for i, symbol in enumerate(symbols):
+            described += "### Symbol {id}: {kind} {name} (line {line})\n{source}\n".format(
+                id=i,
+                kind=symbol.kind,
+                name=symbol.name,
+                line=symbol.line,
+                source=symbol.source
+                )
+        prompt = prompts.docs_symbols_prompt.format(
+            language=self.language,
+            docstrings="\n\n".join(self._index.sample(file_content)),
+            symbols=described
+            )
+        try:
+            return json.loads(get_completion(prompt))
+        except ValueError:
+            LOGGER.debug("The AI model did not return JSON.")
+            return {}
+
+    def _document(self, file_path, file_content):
+        """
+        Asks the AI model for the documented version of a file.
+
+        In patch mode (PATCH_RESPONSES) only the inserted docstrings are requested 
+        as edits. If they can't be applied, the whole documented file is requested.
 
         Returns:
-            list of str: The docstrings.
+            dict: The response with the keys "documented_source_code" and "explanation".
         """
-        # Get the mapping of file extensions to file paths
-        file_retriever = FileRetriever(self.directory)
-        file_mapping = file_retriever.get_mapping()
+        arguments = {
+            "language": self.language,
+            "docstrings": "\n\n".join(self._index.sample(file_content)),
+            "code": file_content
+        }
+        if PATCH_RESPONSES:
+            try:
+                response = json.loads(get_completion(
+                    prompts.docs_prompt.format(output_format=prompts.edits_output, **arguments)
+                ))
+                return {
+                    "documented_source_code": apply_patch_response(file_content, response),
+                    "explanation": response.get("explanation", "")
+                }
+            except (EditApplyError, KeyError, TypeError, ValueError) as e:
+                LOGGER.debug("Edits failed for %s, requesting the whole file: %s", file_path, e)
+        return json.loads(get_completion(
+            prompts.docs_prompt.format(output_format=prompts.docs_output, **arguments)
+        ))
 
-        # Currently only Java and Python are supported
-        if self.language == "python":
-            python_files = file_mapping.get("py", [])
-            for file_path in python_files:
-                docstrings = self._extract_pydoc(file_path)
-                self._existing_docstrings.extend(docstrings)
-        elif self.language == "java":
-            java_files = file_mapping.get("java", [])
-            for file_path in java_files:
-                docstrings = self._extract_javadoc(file_path)
-                self._existing_docstrings.extend(docstrings)
+    def _write_changes(self, file_path, code):
+        with open(file_path, "w") as file:
+            file.write(code)
     
-    def _extract_pydoc(self, file_path):
+    def _can_add_docstrings(self, file_path):
         """
-        Extracts the Python docstrings from a file.
+        Checks if docstrings can be added to a file.
 
         Args:
             file_path (str): The file path.
 
         Returns:
-            list of str: The docstrings. Returns an empty list if no docstrings are found.
+            bool: True if docstrings can be added, False otherwise.
         """
-        with open(file_path, "r", encoding="utf-8") as file:
-            module = ast.parse(file.read())
+        return self._check_files([file_path])[file_path]
 
-        docstrings = ast.get_docstring(module, clean=True)
-        return docstrings if docstrings else []
-    
-    def _extract_javadoc(self, file_path):
+    def _check_files(self, file_paths):
         """
-        Extracts the Java docstrings from a file.
+        Checks for several files if docstrings can be added, i.e. if they have 
+        the extension of the language and, for Python, no module docstring or,
+        for Java, no Javadoc.
+
+        The Javadoc is taken from the index. Java files that aren't indexed are
+        parsed in parallel.
 
         Args:
-            file_path (str): The file path.
+            file_paths (list of str): The file paths.
 
         Returns:
-            list of str: The docstrings. Returns an empty list if no docstrings are found.
+            dict: True or False by file path.
         """
-        with open(file_path, "r", encoding="utf-8") as file:
-            content = file.read()
+        extension = "." + EXTENSIONS.get(self.language, "")
+        supported = [
+            file_path for file_path in file_paths
+            if self.language in EXTENSIONS and file_path.endswith(extension)
+            ]
+        result = dict.fromkeys(file_paths, False)
+        if self.language == "python":
+            # The index doesn't tell which docstring belongs to the module
+            for file_path in supported:
+                try:
+                    with open(file_path, "r", encoding="utf-8") as file:
+                        # Files that can't be parsed are left alone
+                        result[file_path] = lacks_module_docstring(file.read()) is True
+                except (OSError, UnicodeDecodeError):
+                    LOGGER.debug("Can't read %s", file_path)
+            return result
 
-        pattern = r"/\*\*(.*?)\*/"
-        matches = re.findall(pattern, content, re.DOTALL)
+        unknown = [
+            file_path for file_path in supported
+            if os.path.abspath(file_path) not in self._index
+            ]
+        docstrings = dict(zip(unknown, extract_files(self.language, unknown)))
+        for file_path in supported:
+            if file_path not in docstrings:
+                docstrings[file_path] = self._index.get(os.path.abspath(file_path))
+            # Files that can't be parsed are left alone
+            result[file_path] = docstrings[file_path] is not None \
+                and len(docstrings[file_path]) == 0
+        return result
 
-        docstrings = []
-        for match in matches:
-            docstring = match.strip()
-            docstrings.append(docstring)
+    def _extract_docstrings(self):
+        """
+        Updates the docstring index with the files of the repository.
 
-        return docstrings
\ No newline at end of file
+        Only files whose content isn't indexed yet are parsed. The index is 
+        stored, so later runs on the same repository are incremental.
+        """
+        if self.language not in EXTENSIONS:
+            return
+        # The files of one extension are listed lazily
+        file_retriever = FileRetriever(self.directory)
+        parsed = self._index.update(
+            self.directory,
+            file_retriever.iter_files(EXTENSIONS[self.language]),
+            lambda file_paths: extract_files(self.language, file_paths)
+            )
+        self._index.save()
+        # Every indexed file is a lookup, the parsed ones are misses
+        metrics.CACHE_LOOKUPS.inc(len(self._index) - parsed, agent="docs_agent", result="hit")
+        metrics.CACHE_LOOKUPS.inc(parsed, agent="docs_agent", result="miss")
+        self._existing_docstrings = self._index.docstrings()
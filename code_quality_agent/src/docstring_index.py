@@ -0,0 +1,352 @@
+"""
+This module provides a persistent index of the docstrings of a repository.
+
+The docstrings are stored per file content, keyed by the git blob SHA of the
+file. When the index is updated, only files whose blob SHA is not in the index
+yet are parsed, so unchanged files are never read again, not even in a fresh
+clone. The index is stored as a JSON file outside the temporary clones.
+
+Files are parsed by a pool of processes (see extract_files), since parsing is
+CPU-bound. Instead of every docstring of the repository, prompts get a sample
+of the docstrings that share the most identifiers with the code to document,
+bounded by a number of characters.
+"""
+import os
+import re
+import ast
+import json
+import hashlib
+import logging
+import tempfile
+import subprocess
+import multiprocessing
+from itertools import repeat
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+# The docstring indexes live outside the temporary clones
+DOCSTRING_INDEX_DIR = os.environ.get(
+    "DOCSTRING_INDEX_DIR",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        ".docstring_index"
+        )
+    )
+
+# Maximum number of characters of the docstring sample in a prompt
+DOCSTRING_SAMPLE_SIZE = int(os.environ.get("DOCSTRING_SAMPLE_SIZE", 4000))
+
+# Number of processes that parse files, defaults to the number of CPUs
+DOCSTRING_WORKERS = int(os.environ.get("DOCSTRING_WORKERS", os.cpu_count() or 1))
+# Number of files a process parses per task. Smaller lists are parsed in-process.
+DOCSTRING_CHUNK_SIZE = int(os.environ.get("DOCSTRING_CHUNK_SIZE", 64))
+
+_JAVADOC = re.compile(r"/\*\*(.*?)\*/", re.DOTALL)
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+
+
+def extract_pydoc(source: str) -> Optional[List[str]]:
+    """
+    Extracts the docstrings of the module, classes and functions of Python code.
+
+    Returns:
+        list of str: The docstrings or None if the code can't be parsed.
+
+    >>> extract_pydoc("'''Module.'''\\ndef f():\\n    '''Function.'''\\n")
+    ['Module.', 'Function.']
+    """
+    try:
+        module = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    docstrings = []
+    for node in ast.walk(module):
+        if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            docstring = ast.get_docstring(node, clean=True)
+            if docstring:
+                docstrings.append(docstring)
+    return docstrings
+
+
+def lacks_module_docstring(source: str) -> Optional[bool]:
+    """
+    Checks whether Python code has no module docstring.
+
+    Returns:
+        bool: True if the module docstring is missing or empty, None if the
+        code can't be parsed.
+
+    >>> lacks_module_docstring("def f():\\n    '''Function.'''\\n")
+    True
+    >>> lacks_module_docstring("'''Module.'''\\n")
+    False
+    """
+    try:
+        return not ast.get_docstring(ast.parse(source))
+    except (SyntaxError, ValueError):
+        return None
+
+
+def extract_javadoc(source: str) -> List[str]:
+    """
+    Extracts the Javadoc comments of Java code.
+
+    >>> extract_javadoc("/** Adds. */\\nint add(int a, int b) {}")
+    ['Adds.']
+    """
+    return [match.strip() for match in _JAVADOC.findall(source)]
+
+
+EXTRACTORS = {"python": extract_pydoc, "java": extract_javadoc}
+EXTENSIONS = {"python": "py", "java": "java"}
+
+
+def _extract_chunk(language: str, file_paths: List[str]) -> List[Optional[List[str]]]:
+    extract = EXTRACTORS[language]
+    results = []
+    for file_path in file_paths:
+        try:
+            with open(file_path, "r", encoding="utf-8") as file:
+                results.append(extract(file.read()))
+        except (OSError, UnicodeDecodeError):
+            results.append(None)
+    return results
+
+
+def extract_files(
+        language: str,
+        file_paths: List[str],
+        max_workers: int = None,
+        chunk_size: int = None
+        ) -> List[Optional[List[str]]]:
+    """
+    Extracts the docstrings of many files with a pool of processes.
+
+    The file list is split into chunks, every process reads and parses a chunk
+    and only sends back the docstrings. The processes are spawned rather than
+    forked, since the caller may run in a thread of the pipeline.
+
+    Args:
+        language (str): "python" or "java".
+        file_paths (list of str): The file paths.
+        max_workers (int, optional): The number of processes. Defaults to
+            DOCSTRING_WORKERS.
+        chunk_size (int, optional): The number of files per task. Defaults to
+            DOCSTRING_CHUNK_SIZE.
+
+    Returns:
+        list: The docstrings of every file in the order of file_paths, None for
+        files that can't be read or parsed.
+    """
+    max_workers = max_workers or DOCSTRING_WORKERS
+    chunk_size = chunk_size or DOCSTRING_CHUNK_SIZE
+    if max_workers <= 1 or len(file_paths) <= chunk_size:
+        return _extract_chunk(language, file_paths)
+
+    chunks = [file_paths[i:i + chunk_size] for i in range(0, len(file_paths), chunk_size)]
+    with ProcessPoolExecutor(
+            max_workers=min(max_workers, len(chunks)),
+            mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+        results = []
+        for chunk_results in executor.map(_extract_chunk, repeat(language), chunks):
+            results += chunk_results
+    return results
+
+
+def blob_sha(data: bytes) -> str:
+    """
+    Computes the git blob SHA of a file content, like "git hash-object".
+
+    >>> blob_sha(b"")
+    'e69de29bb2d1d6434b8b29ae775ad8c2e48c5391'
+    """
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def get_blob_shas(directory: str) -> Dict[str, str]:
+    """
+    Returns the blob SHAs of the files in git's index.
+
+    Files that were modified in the working tree are left out, since their
+    content doesn't match the SHA in the index.
+
+    Returns:
+        dict: The blob SHA by absolute file path. Empty if the directory is not
+        a git repository.
+    """
+    directory = os.path.abspath(directory)
+    staged = subprocess.run(
+        ["git", "-C", directory, "ls-files", "-s", "-z"],
+        capture_output=True
+        )
+    modified = subprocess.run(
+        ["git", "-C", directory, "ls-files", "-m", "-z"],
+        capture_output=True
+        )
+    if staged.returncode != 0 or modified.returncode != 0:
+        return {}
+    modified_paths = set(modified.stdout.decode("utf-8").split("\0"))
+    shas = {}
+    for entry in staged.stdout.decode("utf-8").split("\0"):
+        if not entry:
+            continue
+        # "<mode> <sha> <stage>\t<path>"
+        info, _, path = entry.partition("\t")
+        if path in modified_paths:
+            continue
+        shas[os.path.join(directory, *path.split("/"))] = info.split()[1]
+    return shas
+
+
+def _identifiers(text: str) -> Counter:
+    return Counter(word.lower() for word in _IDENTIFIER.findall(text))
+
+
+class DocstringIndex:
+    """
+    The docstrings of a repository by blob SHA.
+
+    Args:
+        language (str): "python" or "java".
+        cache_name (str): The name of the index file, usually the repository name.
+        index_dir (str, optional): The directory of the index files. Defaults to
+            DOCSTRING_INDEX_DIR.
+    """
+    def __init__(self, language: str, cache_name: str, index_dir: str = None) -> None:
+        self.language = language
+        self.path = os.path.join(
+            index_dir or DOCSTRING_INDEX_DIR,
+            f"{cache_name}-{language}.json"
+            )
+        self._docstrings: Dict[str, List[str]] = self._load()
+        self._files: Dict[str, str] = {}
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def update(
+            self,
+            directory: str,
+            file_paths: Iterable[str],
+            extract_files: Callable[[List[str]], List[List[str]]]
+            ) -> int:
+        """
+        Brings the index up to date with the files of a directory.
+
+        Args:
+            directory (str): The repository root.
+            file_paths (iterable of str): The absolute paths of the files to index.
+            extract_files (callable): Returns the docstrings (or None if the file
+                can't be parsed) of each file of a list of file paths. Only called
+                for files that aren't indexed yet.
+
+        Returns:
+            int: The number of files that were parsed.
+        """
+        index_shas = get_blob_shas(directory)
+        self._files = {}
+        for file_path in file_paths:
+            sha = index_shas.get(file_path)
+            if sha is None:
+                # Untracked file or no git repository
+                try:
+                    with open(file_path, "rb") as file:
+                        sha = blob_sha(file.read())
+                except OSError:
+                    continue
+            self._files[file_path] = sha
+
+        missing = {}
+        for file_path, sha in self._files.items():
+            if sha not in self._docstrings:
+                missing.setdefault(sha, file_path)
+        if missing:
+            for sha, docstrings in zip(missing, extract_files(list(missing.values()))):
+                self._docstrings[sha] = docstrings
+        LOGGER.debug(
+            "Docstring index: %d files, %d parsed",
+            len(self._files),
+            len(missing)
+            )
+        return len(missing)
+
+    def save(self) -> None:
+        """
+        Writes the index, dropping the entries of contents that are no longer in
+        the tree.
+        """
+        shas = set(self._files.values())
+        docstrings = {sha: self._docstrings[sha] for sha in shas if sha in self._docstrings}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Write and rename, so concurrent runs never read a partial file
+        with tempfile.NamedTemporaryFile(
+                "w",
+                dir=os.path.dirname(self.path),
+                suffix=".tmp",
+                delete=False,
+                encoding="utf-8"
+                ) as file:
+            json.dump(docstrings, file)
+        os.replace(file.name, self.path)
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def __contains__(self, file_path: str) -> bool:
+        return self._files.get(file_path) in self._docstrings
+
+    def get(self, file_path: str) -> Optional[List[str]]:
+        """
+        Returns the indexed docstrings of a file, None if the file couldn't be
+        parsed or isn't indexed.
+        """
+        return self._docstrings.get(self._files.get(file_path))
+
+    def docstrings(self) -> List[str]:
+        """
+        Returns all docstrings of the indexed files without duplicates.
+        """
+        seen = {}
+        for sha in self._files.values():
+            for docstring in self._docstrings.get(sha) or []:
+                seen.setdefault(docstring, None)
+        return list(seen)
+
+    def sample(self, code: str, max_chars: int = None) -> List[str]:
+        """
+        Selects the docstrings that are most relevant for documenting code.
+
+        The docstrings are ranked by the number of identifiers they share with
+        the code, shorter docstrings first on ties, and added until max_chars
+        is reached.
+
+        Args:
+            code (str): The code to document.
+            max_chars (int, optional): The size limit of the sample. Defaults
+                to DOCSTRING_SAMPLE_SIZE.
+
+        Returns:
+            list of str: The selected docstrings.
+        """
+        max_chars = DOCSTRING_SAMPLE_SIZE if max_chars is None else max_chars
+        identifiers = _identifiers(code)
+
+        def score(docstring):
+            shared = sum(1 for word in _identifiers(docstring) if word in identifiers)
+            return (-shared, len(docstring))
+
+        sample, size = [], 0
+        for docstring in sorted(self.docstrings(), key=score):
+            if size + len(docstring) > max_chars:
+                continue
+            sample.append(docstring)
+            size += len(docstring)
+        return sample
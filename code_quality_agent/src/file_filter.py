@@ -0,0 +1,174 @@
+"""
+This module filters out the files that should never be sent to the AI model.
+
+Before a file is read or linted, the filter drops
+- files in the ignored directories of the FileRetriever and lockfiles or
+  minified assets (by name),
+- files matched by .gitignore or by the repository's .optimaignore file (both
+  in gitignore syntax, checked with "git check-ignore"),
+- files marked as linguist-generated, linguist-vendored, -diff or binary in
+  .gitattributes (checked with "git check-attr"),
+- files larger than MAX_FILE_SIZE and binary or minified files (by content).
+
+All git checks are a single call for the whole file list.
+"""
+import os
+import fnmatch
+import logging
+import subprocess
+from typing import Dict, List, Tuple
+from code_quality_agent.src.file_retriever import IGNORED_DIRS
+
+LOGGER = logging.getLogger(__name__)
+
+# Repository-level ignore file in gitignore syntax
+IGNORE_FILE = ".optimaignore"
+
+# Files larger than this (in bytes) are skipped
+MAX_FILE_SIZE = int(os.environ.get("LINT_MAX_FILE_SIZE", 200_000))
+
+# Files that are generated by tools, matched against the file name
+GENERATED_FILES = [
+    "*.min.js",
+    "*.min.css",
+    "*.map",
+    "package-lock.json",
+    "npm-shrinkwrap.json",
+    "yarn.lock",
+    "pnpm-lock.yaml",
+    "poetry.lock",
+    "Pipfile.lock",
+    "Cargo.lock",
+    "composer.lock",
+    "Gemfile.lock",
+    "go.sum",
+]
+
+# Number of bytes inspected by the binary and minified detection
+SNIFF_SIZE = 8000
+# Files whose lines are longer than this on average are considered minified
+MAX_AVERAGE_LINE_LENGTH = 300
+
+
+def filter_files(directory: str, file_list: List[str]) -> Tuple[List[str], Dict[str, str]]:
+    """
+    Drops the files that should not be analysed.
+
+    Args:
+        directory (str): The repository root.
+        file_list (list of str): The file paths relative to the repository root.
+
+    Returns:
+        tuple: The remaining files in their original order and a dict that maps
+        every skipped file to the reason.
+    """
+    skipped = {}
+    for file in file_list:
+        reason = _skip_by_name(file)
+        if reason:
+            skipped[file] = reason
+
+    remaining = [file for file in file_list if file not in skipped]
+    for file in _ignored_files(directory, remaining):
+        skipped[file] = "ignored"
+
+    remaining = [file for file in remaining if file not in skipped]
+    for file, reason in _attribute_reasons(directory, remaining).items():
+        skipped[file] = reason
+
+    for file in file_list:
+        if file in skipped:
+            continue
+        reason = _skip_by_content(os.path.join(directory, file))
+        if reason:
+            skipped[file] = reason
+
+    if skipped:
+        LOGGER.debug("Skipped files:\n" + "\n".join(
+            f"{file}: {reason}" for file, reason in skipped.items()
+            ))
+    return [file for file in file_list if file not in skipped], skipped
+
+
+def _skip_by_name(file):
+    directories = file.replace("\\", "/").split("/")[:-1]
+    if any(directory in IGNORED_DIRS for directory in directories):
+        return "ignored directory"
+    name = os.path.basename(file)
+    if any(fnmatch.fnmatch(name, pattern) for pattern in GENERATED_FILES):
+        return "generated"
+    return None
+
+
+def _git(directory, arguments, file_list):
+    """
+    Runs a git command that reads NUL separated paths from stdin.
+
+    Returns:
+        list of str: The NUL separated fields of the output. Empty if git failed.
+    """
+    result = subprocess.run(
+        ["git", "-C", directory] + arguments,
+        input="\0".join(file_list).encode("utf-8"),
+        capture_output=True
+        )
+    # check-ignore exits with 1 if no file is ignored
+    if result.returncode not in (0, 1):
+        LOGGER.debug("git %s failed:\n%s", arguments[0], result.stderr.decode("utf-8", "replace"))
+        return []
+    return [field for field in result.stdout.decode("utf-8").split("\0") if field]
+
+
+def _ignored_files(directory, file_list):
+    """
+    Returns the files matched by .gitignore or the repository's ignore file.
+
+    --no-index also matches tracked files, which git itself would never
+    report as ignored.
+    """
+    if not file_list:
+        return []
+    config = []
+    ignore_file = os.path.join(os.path.abspath(directory), IGNORE_FILE)
+    if os.path.isfile(ignore_file):
+        config = ["-c", "core.excludesFile=" + ignore_file]
+    return _git(directory, config + ["check-ignore", "--no-index", "--stdin", "-z"], file_list)
+
+
+def _attribute_reasons(directory, file_list):
+    """
+    Returns the files marked as generated, vendored or binary in .gitattributes.
+    """
+    if not file_list:
+        return {}
+    fields = _git(
+        directory,
+        ["check-attr", "--stdin", "-z", "linguist-generated", "linguist-vendored", "diff"],
+        file_list
+        )
+    reasons = {}
+    # The output consists of path, attribute and value triples
+    for file, attribute, value in zip(fields[0::3], fields[1::3], fields[2::3]):
+        if attribute == "diff" and value == "unset":
+            reasons[file] = "binary"
+        elif attribute.startswith("linguist-") and value in ("set", "true"):
+            reasons[file] = attribute[len("linguist-"):]
+    return reasons
+
+
+def _skip_by_content(file_path):
+    try:
+        size = os.path.getsize(file_path)
+        if size > MAX_FILE_SIZE:
+            return "too large"
+        with open(file_path, "rb") as file:
+            head = file.read(SNIFF_SIZE)
+    except OSError:
+        return "not readable"
+    # The same heuristic as git: a NUL byte means binary
+    if b"\0" in head:
+        return "binary"
+    lines = head.splitlines()
+    if lines and len(head) / len(lines) > MAX_AVERAGE_LINE_LENGTH:
+        return "minified"
+    return None
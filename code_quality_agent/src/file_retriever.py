@@ -1,34 +1,121 @@
+"""
+This module lists the files of a repository, grouped by file extension.
+
+The files are listed with "git ls-files", which uses git's index for tracked
+files and honours .gitignore for untracked ones. The result is cached per
+directory and commit SHA, so repeated scans of the same tree (e.g. by several
+DocsAgents) cost a single "git rev-parse". Every run clones into a new
+directory, so only the FILE_LIST_CACHE_SIZE most recently used lists are kept.
+Untracked files that are created after the first scan of a commit are not
+listed. Directories that are not a git repository are scanned with os.walk.
+"""
 import os
+import logging
+import threading
+import subprocess
+from collections import OrderedDict, defaultdict
+from typing import Iterator, List, Optional, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+# Number of cached file lists
+FILE_LIST_CACHE_SIZE = int(os.environ.get("FILE_LIST_CACHE_SIZE", 8))
+
+# Directories and files that are never analysed, also used by file_filter
+IGNORED_DIRS = [
+    "__pycache__",
+    "venv",
+    "node_modules",
+    "dist",
+    "build",
+    "out",
+    "target",
+    "bin",
+    "obj",
+    "lib",
+    "include",
+    "logs"
+]
+IGNORED_FILES = [
+    "__init__.py",
+    "Thumbs.db",
+    "desktop.ini"
+]
 
 class FileRetriever:
+    # The file lists of git repositories by (directory, commit SHA), least
+    # recently used first
+    _cache: "OrderedDict[Tuple[str, str], List[str]]" = OrderedDict()
+    _cache_lock = threading.Lock()
+
     def __init__(self, directory):
         self.directory = directory
-        self.ignored_dirs = [
-            "__pycache__",
-            "venv",
-            "node_modules",
-            "dist",
-            "build",
-            "out",
-            "target",
-            "bin",
-            "obj",
-            "lib",
-            "include",
-            "logs"
-        ] #TODO files ignorieren, ggf. Einträge aus .gitignore verwenden, falls vorhanden
-        self.ignored_files = [
-            "__init__.py",
-            "Thumbs.db",
-            "desktop.ini"
-        ]
+        self.ignored_dirs = list(IGNORED_DIRS)
+        self.ignored_files = list(IGNORED_FILES)
         self.file_list = []
-        self.file_mapping = {} # Keys: File extensions, Values: List of file paths
+        self._file_mapping = None # Keys: File extensions, Values: List of file paths
 
         self._find_files()
-        self._file_mapping()
 
     def _find_files(self):
+        file_list = self._git_files()
+        if file_list is None:
+            file_list = self._walk_files()
+        self.file_list = file_list
+
+    def _git_files(self) -> Optional[List[str]]:
+        """
+        Lists the tracked and the untracked, not ignored files with git.
+
+        Returns:
+            list of str: The absolute file paths or None if the directory is not
+            a git repository.
+        """
+        directory = os.path.abspath(self.directory)
+        try:
+            sha = subprocess.run(
+                ["git", "-C", directory, "rev-parse", "HEAD"],
+                capture_output=True,
+                check=True,
+                text=True
+                ).stdout.strip()
+            key = (directory, sha)
+            with self._cache_lock:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    return list(self._cache[key])
+            output = subprocess.run(
+                [
+                    "git", "-C", directory, "ls-files", "-z",
+                    "--cached", "--others", "--exclude-standard"
+                ],
+                capture_output=True,
+                check=True
+                ).stdout
+        except (OSError, subprocess.CalledProcessError):
+            LOGGER.debug("%s is not a git repository, walking the directory.", directory)
+            return None
+
+        file_list = []
+        ignored_dirs = set(self.ignored_dirs)
+        ignored_files = set(self.ignored_files)
+        for path in output.decode("utf-8").split("\0"):
+            if not path:
+                continue
+            *dirs, name = path.split("/")
+            # Hidden and ignored directories and files, like the directory walk
+            if name[0] == "." or name in ignored_files:
+                continue
+            if any(d[0] == "." or d in ignored_dirs for d in dirs):
+                continue
+            file_list.append(os.path.join(directory, *dirs, name))
+        with self._cache_lock:
+            self._cache[key] = file_list
+            while len(self._cache) > FILE_LIST_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return list(file_list)
+
+    def _walk_files(self) -> List[str]:
         # Liste zum Speichern der gefundenen Dateien
         file_list = []
 
@@ -43,36 +130,47 @@ class FileRetriever:
                     file_list.append(os.path.abspath(os.path.join(root, file)))
 
         # Zurückgeben der Liste mit den gefundenen Dateien
-        self.file_list = file_list
+        return file_list
 
-    def _file_mapping(self):
-        # Dictionary zum Speichern des Mappings
-        mapping = {}
+    @staticmethod
+    def _extension(file_path):
+        # Like os.path.splitext, the extension of the file name without the dot
+        name = file_path.rpartition(os.sep)[2]
+        stem, dot, extension = name.rpartition(".")
+        return extension if dot and stem.strip(".") else ""
 
-        # Durchlaufen der Liste mit Dateinamen
+    def iter_files(self, extension: str) -> Iterator[str]:
+        """
+        Yields the files with an extension (without the dot) lazily, without
+        building the whole mapping.
+        """
+        if self._file_mapping is not None:
+            yield from self._file_mapping.get(extension, [])
+            return
         for file in self.file_list:
-            # Extrahieren der Dateiendung
-            _, extension = os.path.splitext(file)
+            if self._extension(file) == extension:
+                yield file
 
-            # Entfernen des Punkts von der Dateiendung
-            extension = extension[1:]
+    def get_mapping(self):
+        """
+        Returns the files by extension, the mapping is built on first use.
+        """
+        if self._file_mapping is None:
+            mapping = defaultdict(list)
+            for file in self.file_list:
+                mapping[self._extension(file)].append(file)
+            self._file_mapping = dict(mapping)
+        return self._file_mapping
 
-            # Hinzufügen der Datei zum entsprechenden Eintrag im Dictionary
-            if extension in mapping:
-                mapping[extension].append(file)
-            else:
-                mapping[extension] = [file]
+    @classmethod
+    def clear_cache(cls):
+        with cls._cache_lock:
+            cls._cache.clear()
 
-        # Zurückgeben des Mappings
-        self.file_mapping = mapping
-    
-    def get_mapping(self):
-        return self.file_mapping
-    
     def __str__(self):
         ret = "Directory: " + self.directory + "\n"
-        for key, value in self.file_mapping.items():
+        for key, value in self.get_mapping().items():
             ret += key + ":\n"
             for file in value:
                 ret += "  " + file + "\n"
-        return ret
\ No newline at end of file
+        return ret
@@ -0,0 +1,208 @@
+"""
+This module provides a structured representation of linter findings.
+
+Linter reports are parsed into Finding tuples with the file path, the affected
+line range, the rule id and the message. A FindingIndex groups the findings by
+file, so the LintAgent can look up the findings of a file directly instead of
+parsing text reports.
+"""
+import os
+import json
+import difflib
+import logging
+from collections import defaultdict
+from typing import Dict, Iterator, List, NamedTuple
+import black
+
+LOGGER = logging.getLogger(__name__)
+
+
+def normalise_path(path: str, root: str) -> str:
+    """
+    Converts a path to the form used as key in the indexes: relative to the
+    repository root, with forward slashes and without "./" segments.
+
+    >>> normalise_path("/repo/./src/../src/Foo.java", "/repo")
+    'src/Foo.java'
+    >>> normalise_path("src\\Foo.java", "/repo")
+    'src/Foo.java'
+    """
+    path = path.replace("\\", "/")
+    if os.path.isabs(path):
+        path = os.path.relpath(path, root)
+    return os.path.normpath(path).replace("\\", "/")
+
+
+class Finding(NamedTuple):
+    """
+    A single linter finding. The line numbers are 1-based and inclusive.
+    """
+    path: str
+    begin_line: int
+    end_line: int
+    rule: str
+    message: str
+
+    def describe(self) -> str:
+        """
+        Formats the finding for a prompt.
+
+        >>> Finding("A.java", 3, 4, "UnusedLocalVariable", "Avoid unused x").describe()
+        'Lines 3-4 [UnusedLocalVariable]: Avoid unused x'
+        """
+        if self.begin_line == self.end_line:
+            lines = f"Line {self.begin_line}"
+        else:
+            lines = f"Lines {self.begin_line}-{self.end_line}"
+        return f"{lines} [{self.rule}]: {self.message}"
+
+
+class FindingIndex:
+    """
+    The findings of a linter run, indexed by file path.
+
+    If a root is given, the paths are normalised relative to it (see 
+    normalise_path), so lookups are exact dictionary accesses.
+    """
+    def __init__(self, findings=None, root=None) -> None:
+        self.root = root
+        self._findings: Dict[str, List[Finding]] = defaultdict(list)
+        for finding in findings or []:
+            self.add(finding)
+
+    def _key(self, path: str) -> str:
+        return normalise_path(path, self.root) if self.root else path
+
+    def add(self, finding: Finding) -> None:
+        key = self._key(finding.path)
+        self._findings[key].append(finding._replace(path=key))
+
+    def get(self, path: str) -> List[Finding]:
+        """
+        Returns the findings of a file, sorted by line.
+        """
+        return sorted(self._findings.get(self._key(path), []))
+
+    def files(self) -> List[str]:
+        return list(self._findings.keys())
+
+    def __iter__(self) -> Iterator[Finding]:
+        for findings in self._findings.values():
+            yield from findings
+
+    def __len__(self) -> int:
+        return sum(len(findings) for findings in self._findings.values())
+
+    def describe(self, path: str) -> str:
+        """
+        Returns the findings of a file as linter suggestions for a prompt.
+        """
+        return "\n".join(finding.describe() for finding in self.get(path))
+
+
+def parse_pmd_report(report: str, root: str = None) -> FindingIndex:
+    """
+    Parses a report of PMD's JSON renderer.
+
+    Args:
+        report (str): The report as printed by "pmd check -f json".
+        root (str, optional): The repository root. If given, the file names are
+            normalised relative to it.
+
+    Returns:
+        FindingIndex: The violations of the report, indexed by file.
+    """
+    index = FindingIndex(root=root)
+    if not report.strip():
+        return index
+    try:
+        data = json.loads(report)
+    except json.JSONDecodeError:
+        LOGGER.debug("PMD did not return a JSON report.")
+        return index
+
+    for file in data.get("files", []):
+        for violation in file.get("violations", []):
+            begin_line = violation.get("beginline", 1)
+            index.add(
+                Finding(
+                    path=file["filename"],
+                    begin_line=begin_line,
+                    end_line=violation.get("endline", begin_line),
+                    rule=violation.get("rule", ""),
+                    message=violation.get("description", "")
+                )
+            )
+    return index
+
+
+# The rules of the findings that only concern the formatting
+FORMATTING_RULES = {"black"}
+
+
+def black_findings(path: str, source: str) -> List[Finding]:
+    """
+    Formats a Python file with black's API and returns a finding per changed block.
+
+    Every block that black would reformat becomes a finding with the rule id
+    "black" and the suggested replacement as message.
+
+    Args:
+        path (str): The path of the file, stored in the findings.
+        source (str): The content of the file.
+
+    Returns:
+        list of Finding: The blocks black would reformat. Empty if the file is
+        already formatted or can't be parsed.
+    """
+    try:
+        formatted = black.format_str(source, mode=black.Mode())
+    except black.InvalidInput:
+        LOGGER.debug("black can't parse %s", path)
+        return []
+    if formatted == source:
+        return []
+
+    old_lines = source.splitlines()
+    new_lines = formatted.splitlines()
+    findings = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        message = "would reformat to:\n" + "\n".join(new_lines[j1:j2])
+        findings.append(
+            Finding(
+                path=path,
+                begin_line=i1 + 1,
+                end_line=max(i2, i1 + 1),
+                rule="black",
+                message=message
+            )
+        )
+    return findings
+
+
+def check_python_files(directory: str, file_list: List[str]) -> FindingIndex:
+    """
+    Runs black on the Python files of file_list, one file at a time.
+
+    Args:
+        directory (str): The repository root.
+        file_list (list of str): The file paths relative to the repository root.
+
+    Returns:
+        FindingIndex: The findings, indexed by the relative file paths.
+    """
+    index = FindingIndex(root=directory)
+    for file in file_list:
+        if not file.endswith(".py"):
+            continue
+        full_path = os.path.join(directory, file)
+        if not os.path.isfile(full_path):
+            continue
+        with open(full_path, "r", encoding="utf-8") as f:
+            source = f.read()
+        for finding in black_findings(file, source):
+            index.add(finding)
+    return index
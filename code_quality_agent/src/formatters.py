@@ -0,0 +1,113 @@
+"""
+This module provides deterministic fix-ups that run before the AI model is asked.
+
+Formatting findings can be fixed by the formatters themselves, which is fast,
+free and exact. Python files are formatted with black's API, Java files with
+google-java-format if it is installed. If the changed line ranges of a file are
+known, only these lines are formatted.
+"""
+import os
+import shlex
+import shutil
+import logging
+import subprocess
+from typing import Dict, List, Optional, Tuple
+import black
+
+LOGGER = logging.getLogger(__name__)
+
+# Command to run google-java-format, e.g. "java -jar google-java-format.jar"
+GOOGLE_JAVA_FORMAT = os.environ.get("GOOGLE_JAVA_FORMAT", "google-java-format")
+
+
+def format_python_file(file_path: str, ranges: Optional[List[Tuple[int, int]]] = None) -> bool:
+    """
+    Formats a Python file in place with black.
+
+    Args:
+        file_path (str): The full path of the file.
+        ranges (list of tuple, optional): The line ranges to format. Formats the
+            whole file if None.
+
+    Returns:
+        bool: True if the file was changed.
+    """
+    with open(file_path, "r", encoding="utf-8") as file:
+        source = file.read()
+    try:
+        formatted = black.format_str(source, mode=black.Mode(), lines=ranges or ())
+    except black.InvalidInput:
+        LOGGER.debug("black can't parse %s", file_path)
+        return False
+    if formatted == source:
+        return False
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.write(formatted)
+    return True
+
+
+def google_java_format_available() -> bool:
+    command = shlex.split(GOOGLE_JAVA_FORMAT)
+    return bool(command) and shutil.which(command[0]) is not None
+
+
+def format_java_files(
+        directory: str,
+        file_list: List[str],
+        changed_ranges: Optional[Dict[str, List[Tuple[int, int]]]] = None
+        ) -> List[str]:
+    """
+    Formats Java files in place with google-java-format.
+
+    Files with known changed line ranges are formatted one by one with --lines,
+    all other files with a single call.
+
+    Args:
+        directory (str): The repository root.
+        file_list (list of str): The file paths relative to the repository root.
+        changed_ranges (dict, optional): The changed line ranges by file path.
+
+    Returns:
+        list of str: The files that were changed. Empty if google-java-format
+        is not installed.
+    """
+    java_files = [file for file in file_list if file.endswith(".java")]
+    if not java_files or not google_java_format_available():
+        return []
+    changed_ranges = changed_ranges or {}
+
+    before = {file: _read(os.path.join(directory, file)) for file in java_files}
+    whole_files = []
+    for file in java_files:
+        ranges = changed_ranges.get(file)
+        if ranges:
+            lines = []
+            for start, end in ranges:
+                lines += ["--lines", f"{start}:{end}"]
+            _run_google_java_format(directory, lines + [file])
+        else:
+            whole_files.append(file)
+    if whole_files:
+        _run_google_java_format(directory, whole_files)
+
+    return [
+        file for file in java_files
+        if _read(os.path.join(directory, file)) != before[file]
+        ]
+
+
+def _run_google_java_format(directory, arguments):
+    result = subprocess.run(
+        shlex.split(GOOGLE_JAVA_FORMAT) + ["--replace"] + arguments,
+        cwd=directory,
+        capture_output=True,
+        text=True
+        )
+    if result.returncode != 0:
+        # Usually a syntax error, the file is left unchanged
+        LOGGER.debug("google-java-format failed:\n" + result.stderr)
+
+
+def _read(file_path):
+    with open(file_path, "rb") as file:
+        return file.read()
@@ -1,17 +1,57 @@
 import subprocess
-import re
 import os
 import json
 import logging
-from collections import defaultdict
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import code_quality_agent.src.prompts as prompts
 import httpx
 from openai import AzureOpenAI
+from controller.src.llm import complete
 from . import CodeQualityAgent
+from code_quality_agent.src.findings import (
+    FORMATTING_RULES,
+    FindingIndex,
+    check_python_files,
+    normalise_path,
+    parse_pmd_report
+)
+from code_quality_agent.src.file_filter import filter_files
+from code_quality_agent.src.formatters import format_java_files, format_python_file
+from controller.src.helper import format_ranges
+from controller.src import tracing
+from controller.src import routing
+from controller.src.result_store import ResultStore, COMMIT_EXPLANATION_CHARS
+from controller.src.edits import (
+    PATCH_RESPONSES,
+    EditApplyError,
+    apply_edits,
+    apply_patch_response,
+    extract_hunks
+)
 
 LOGGER = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG)
 
+# PMD's incremental analysis cache lives outside the temporary clones
+PMD_CACHE_DIR = os.environ.get(
+    "PMD_CACHE_DIR",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        ".pmd_cache"
+        )
+    )
+
+# Number of concurrent OpenAI requests in LintAgent.improve_code
+LINT_AGENT_WORKERS = int(os.environ.get("LINT_AGENT_WORKERS", 8))
+
+# Diff-scoped mode: only send the changed hunks and apply the returned edits
+LINT_DIFF_SCOPED = os.environ.get("LINT_DIFF_SCOPED", "0") == "1"
+# Number of context lines around each changed hunk in diff-scoped mode
+LINT_HUNK_CONTEXT = int(os.environ.get("LINT_HUNK_CONTEXT", 5))
+
 client = AzureOpenAI(
     api_key=os.getenv("OPENAI_API_KEY"),
     api_version="2024-02-01",
@@ -22,27 +62,48 @@ client = AzureOpenAI(
     )
 )
 
-def get_completion(prompt, model="GCDM-EMEA-GPT4-1106", type="json_object"):
+def get_completion(prompt, model="GCDM-EMEA-GPT4-1106", type="json_object", task=None):
     """
     Sends a prompt to the OpenAI API and returns the AI"s response.
     """
-    messages = [
-        {
-            "role": "system",
-            "content": "You are a system designed to improve code quality."
-        },
-        {
-            "role": "user",
-            "content": prompt
-        }
-    ]
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=0, # this is the degree of randomness of the model"s output,
-        response_format={"type": type}
-    )
-    return response.choices[0].message.content
+    return complete(client, prompt, model=model, type=type, agent="lint_agent", task=task)
+
+class ProgressReporter:
+    """
+    Aggregates the progress of concurrent tasks for the pull request progress bar.
+
+    The comment is only updated when the progress bar gains a block, instead of 
+    once per finished task.
+    """
+    def __init__(self, pr_git_handler, index, increment, total, blocks=20):
+        self._pr_git_handler = pr_git_handler
+        self._index = index
+        self._increment = increment
+        self._total = total
+        self._block_size = 100.0 / blocks
+        self._done = 0
+        self._reported_block = None
+        self._lock = threading.Lock()
+        self._report()
+
+    def advance(self):
+        with self._lock:
+            self._done += 1
+            self._report()
+
+    def _report(self):
+        percentage = self._index + self._done * self._increment
+        block = int(percentage / self._block_size)
+        if block == self._reported_block and self._done < self._total:
+            return
+        self._reported_block = block
+        self._pr_git_handler.create_progress_bar(
+            percentage=percentage,
+            status="Improving code quality ({done}/{total} files).".format(
+                done=self._done,
+                total=self._total
+                )
+            )
 
 class LintAgent(CodeQualityAgent):
     def __init__(
@@ -51,18 +112,53 @@ class LintAgent(CodeQualityAgent):
             directory,
             language,
             json_model="GCDM-EMEA-GPT4-1106",
-            text_model="GCDM-EMEA-GPT4"
+            text_model="GCDM-EMEA-GPT4",
+            changed_ranges=None,
+            cache_name=None,
+            diff_scoped=None,
+            result_store=None,
+            commit_model=None
             ):
+        """
+        Args:
+            changed_ranges (dict, optional): Maps file paths (relative to the 
+                directory) to the line ranges changed by the pull request. If 
+                given, linter findings outside these ranges are dropped and the 
+                prompts point the AI model to the changed lines.
+            cache_name (str, optional): The name of the persistent PMD cache, 
+                usually the repository name. Defaults to the directory name.
+            diff_scoped (bool, optional): If True, only the changed hunks of 
+                each file are sent to the AI model, which returns edits for 
+                them. Defaults to LINT_DIFF_SCOPED.
+            result_store (ResultStore, optional): Stores the improved files, 
+                improved_source_code only keeps their handles. Defaults to a 
+                new store.
+            commit_model (str, optional): The deployment for the commit 
+                message, usually a cheaper one. Defaults to text_model.
+        """
+        # Generated, vendored, ignored, binary and huge files are never read
+        file_list, self.skipped_files = filter_files(directory, file_list)
         super().__init__(file_list)
         self.highlighted_languages = ["python", "java", "java-local"]
+        # The AI model reviews every file of these languages, not only the 
+        # files with linter findings
+        self.reviewed_languages = ["python"]
         self.directory = directory
         self.raw_stats = ""
+        self.findings = FindingIndex()
         self.tasks = []
+        self.formatting_tasks = set()
         self.improved_source_code = []
+        self.fixed_files = []
         self.language = language
         self.commit_msg = ""
         self.json_model = json_model
         self.text_model = text_model
+        self.commit_model = commit_model or text_model
+        self.changed_ranges = changed_ranges
+        self.cache_name = cache_name or os.path.basename(os.path.normpath(directory))
+        self.diff_scoped = LINT_DIFF_SCOPED if diff_scoped is None else diff_scoped
+        self._results = result_store or ResultStore()
 
         self.check_code()
         self.create_tasks()
@@ -82,6 +178,15 @@ class LintAgent(CodeQualityAgent):
     def get_file_paths(self):
         return self.file_list
 
+    def get_results(self):
+        """
+        Returns the handles of the improved files.
+
+        Returns:
+            list of StoredResult: The handles in the order of the tasks.
+        """
+        return [result for _, result in self.improved_source_code]
+
     def get_responses(self):
         """
         Returns the file paths of the files with merge conflicts.
@@ -96,142 +201,407 @@ class LintAgent(CodeQualityAgent):
 
     def check_code(self):
         """
-        Runs the appropriate linter on the directory and stores the output in raw_stats.
+        Runs the appropriate linter on the changed files. The findings are 
+        stored in findings and the raw linter output in raw_stats.
         """
         if self.language == "python":
-            result = subprocess.run(
-                ["black", "--diff", self.directory],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT
+            self.findings = check_python_files(self.directory, self.file_list)
+            self.raw_stats = "\n".join(
+                finding.describe() for finding in self.findings
                 )
-            self.raw_stats = result.stdout.decode("utf-8")
             LOGGER.debug("Python raw stats:\n" + self.raw_stats)
         elif self.language == "java":
             current_dir = os.path.dirname(os.path.realpath(__file__))
             pmd_path = os.path.join(current_dir, "../../pmd-bin-7.0.0-rc4/bin/pmd")
-            result = subprocess.run(
-                [os.path.join(
-                    current_dir,
-                    pmd_path
-                    ),
-                 "check",
-                 "-d", self.directory,
-                 "-R", "rulesets/java/quickstart.xml"],  #TODO env erstellen
-                capture_output=True,
-                text=True
-                )
-            self.raw_stats = result.stdout
+            self.raw_stats = self._run_pmd(pmd_path)
+            self.findings = parse_pmd_report(self.raw_stats, self.directory)
             LOGGER.debug("Java raw stats:\n" + self.raw_stats)
         elif self.language == "java-local":
-            result = subprocess.run(
-                ["C:\\pmd-bin-7.0.0-rc4\\bin\\pmd.bat",
-                 "check",
-                 "-d", self.directory,
-                 "-R", "rulesets/java/quickstart.xml"],  #TODO env erstellen
-                capture_output=True,
-                text=True
-                )
-            self.raw_stats = result.stdout
+            self.raw_stats = self._run_pmd("C:\\pmd-bin-7.0.0-rc4\\bin\\pmd.bat")
+            self.findings = parse_pmd_report(self.raw_stats, self.directory)
             LOGGER.debug("Java raw stats:\n" + self.raw_stats)
         else:
             pass
 
+    def _run_pmd(self, pmd_executable):
+        """
+        Runs PMD on the changed Java files and returns its JSON report.
+
+        Only the files of file_list are analyzed. They are passed to PMD with 
+        --file-list, relative to the repository root, and PMD runs with the 
+        repository root as working directory. The analysis cache is stored 
+        outside of the clone, so it survives across runs of the same repository.
+        Every run works on its own copy of the cache, which replaces the stored 
+        cache afterwards, so concurrent runs never write the same file.
+
+        Args:
+            pmd_executable (str): The path of the PMD start script.
+
+        Returns:
+            str: The PMD report in JSON format or an empty string if there are 
+            no Java files to check.
+        """
+        java_files = [
+            file for file in self.file_list if file.endswith(".java")
+            ]
+        if not java_files:
+            return ""
+
+        os.makedirs(PMD_CACHE_DIR, exist_ok=True)
+        shared_cache_file = os.path.join(PMD_CACHE_DIR, self.cache_name + ".cache")
+        # The copy is in the same directory, so it can be renamed atomically
+        with tempfile.NamedTemporaryFile(
+                dir=PMD_CACHE_DIR, prefix=self.cache_name + "-", suffix=".tmp", delete=False
+                ) as cache:
+            cache_file = cache.name
+        try:
+            shutil.copyfile(shared_cache_file, cache_file)
+        except OSError:
+            # No cache yet, PMD starts with an empty one
+            os.remove(cache_file)
+        with tempfile.NamedTemporaryFile(
+                "w", suffix=".txt", delete=False
+                ) as file_list:
+            file_list.write("\n".join(java_files))
+        completed = False
+        try:
+            with tracing.span("pmd", files=len(java_files)) as span:
+                result = subprocess.run(
+                    [pmd_executable,
+                     "check",
+                     "--file-list", file_list.name,
+                     "-R", "rulesets/java/quickstart.xml",  #TODO env erstellen
+                     "--cache", cache_file,
+                     "-f", "json",
+                     "--no-progress"],
+                    cwd=self.directory,
+                    capture_output=True,
+                    text=True
+                    )
+                span.set("report_bytes", len(result.stdout))
+            # Exit code 4: violations were found
+            completed = result.returncode in (0, 4)
+        finally:
+            os.remove(file_list.name)
+            if os.path.exists(cache_file):
+                if completed:
+                    # The last run to finish keeps its cache
+                    os.replace(cache_file, shared_cache_file)
+                else:
+                    os.remove(cache_file)
+        LOGGER.debug("PMD stderr:\n" + result.stderr)
+        return result.stdout
+
     def create_tasks(self):
         """
         Extracts tasks from the raw output and stores them in the tasks list.
         Each task is a tuple where the first element is a file path and the 
         second element is the task description.
         """
-        if self.language == "python":
-            pattern = r"--- (.*?)\s.*?@@.*?\n(.*?)would reformat"
-            matches = re.findall(pattern, self.raw_stats, re.DOTALL)
-            self.tasks = matches
-        elif self.language == "java" or self.language == "java-local":
-            lines = self.raw_stats.split("\n")
-            # Dictionary verwenden, damit kein Dateipfad mehrfach vorkommt.
-            tmp_dict = defaultdict(list)
-            for line in lines:
-                match = re.match(r"(.*\.java):\d+:\s+(.*)", line)
-                if match:
-                    directory, task = match.groups()
-                    tmp_dict[directory].append(task)
-            # Dictionary in Liste von Tupeln umwandeln
-            tasks = [(k, "\n".join(v)) for k, v in tmp_dict.items()]
-            # Only add those tasks, where the file is in the changed files list
-            for task in tasks:
-                long_file_path = task[0]
-                for file_path in self.file_list:
-                    if file_path in long_file_path:
-                        self.tasks.append(task)
+        if self.language in self.highlighted_languages:
+            # Only files in the changed files list get tasks. The index is 
+            # keyed by the normalised path, so every file gets one task at most.
+            changed_files = set(
+                normalise_path(file_path, self.directory)
+                for file_path in self.file_list
+                )
+            for path in self.findings.files():
+                if path not in changed_files:
+                    continue
+                full_path = os.path.join(self.directory, path)
+                findings = [
+                    finding for finding in self.findings.get(path)
+                    if self._in_changed_ranges(full_path, finding.begin_line)
+                    ]
+                if findings:
+                    self.tasks.append(
+                        (full_path, "\n".join(f.describe() for f in findings))
+                        )
+                    if all(f.rule in FORMATTING_RULES for f in findings):
+                        self.formatting_tasks.add(full_path)
         else:
             pass
 
-    def improve_code(self, pr_git_handler, index, increment):
+    def _get_changed_ranges(self, file_path):
         """
-        Given a task, returns the improved code using the OpenAI API.
+        Returns the changed line ranges of a file or None if they are unknown.
         """
-        if self.language in self.highlighted_languages:
-            for n, task in enumerate(self.tasks):
-                pr_git_handler.create_progress_bar(
-                    percentage=index + n * increment,
-                    status="Improving code quality."
-                    )
-                file_path, task_description = task
-                LOGGER.debug("Improving " + file_path + "...")
-                with open(file_path, "r") as file:
-                    code = file.read()
-                linter_suggestions = task_description
-                prompt = prompts.lint_prompt.format(source_code=code, linter_suggestions=linter_suggestions)
-                print("Calling OpenAI API for " + file_path + "...")
-                print(prompt)
-                print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
-                improved_source_code = get_completion(prompt, model=self.json_model)
-                self.improved_source_code.append((file_path, improved_source_code))
-        else:
-            for n, file in enumerate(self.file_list):
-                pr_git_handler.create_progress_bar(
-                    percentage=index + n * increment,
-                    status="Improving code quality."
-                    )
+        if self.changed_ranges is None:
+            return None
+        return self.changed_ranges.get(normalise_path(file_path, self.directory))
+
+    def _in_changed_ranges(self, file_path, line_no):
+        """
+        Checks whether a linter finding lies in a region changed by the pull request.
+        """
+        ranges = self._get_changed_ranges(file_path)
+        if ranges is None:
+            return True
+        return any(start <= line_no <= end for start, end in ranges)
+
+    def _changed_lines_hint(self, file_path):
+        ranges = self._get_changed_ranges(file_path)
+        if not ranges:
+            return "unknown, consider the whole file"
+        return format_ranges(ranges)
+
+    def apply_local_fixes(self):
+        """
+        Applies the deterministic formatter fixes before the AI model is asked.
+
+        Python files are formatted with black, Java files with 
+        google-java-format if it is installed. Only the changed line ranges are 
+        formatted if they are known. Afterwards the code is linted again, so 
+        only the remaining findings become tasks. Java files without remaining 
+        findings need no call to the AI model, Python files are still reviewed 
+        (see improve_code).
+
+        Returns:
+            list of str: The files changed by the formatters.
+        """
+        fixed_files = []
+        if self.language == "python":
+            for file in self.file_list:
+                if not file.endswith(".py"):
+                    continue
                 file_path = os.path.join(self.directory, file)
-                with open(file_path, "r") as file:
-                    code = file.read()
-                prompt = prompts.lint_prompt_not_highlighted.format(source_code=code)
-                print("Calling OpenAI API for " + file_path + "...")
-                print(prompt)
-                print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
-                improved_source_code = get_completion(prompt, model=self.json_model)
-                self.improved_source_code.append((file_path, improved_source_code))
+                if format_python_file(file_path, self._get_changed_ranges(file_path)):
+                    fixed_files.append(file)
+        elif self.language in ["java", "java-local"]:
+            fixed_files = format_java_files(
+                self.directory,
+                self.file_list,
+                self.changed_ranges
+                )
+        LOGGER.debug("Formatters fixed:\n" + str(fixed_files))
+        self.fixed_files += fixed_files
+
+        if fixed_files and self.language in self.highlighted_languages:
+            self.tasks = []
+            self.check_code()
+            self.create_tasks()
+        return fixed_files
+
+    def improve_code(self, pr_git_handler, index, increment, max_workers=None):
+        """
+        Improves the code of every task (or every file for languages without 
+        linter support and the languages of reviewed_languages) using the 
+        OpenAI API. The files of reviewed_languages come with their linter 
+        findings if they have any.
+
+        The requests are sent concurrently by up to max_workers threads. The 
+        improved files are put into the result store, improved_source_code 
+        holds their paths and handles in the order of the tasks, 
+        independent of the order in which the requests finish. A file whose 
+        request fails is logged and left unchanged, the other files are still 
+        improved. The progress bar is only updated when it advances by at least 
+        one block.
+
+        Args:
+            pr_git_handler (PRGitHandler): Used to update the progress bar.
+            index (float): The progress in percent when this method starts.
+            increment (float): The progress in percent per improved file.
+            max_workers (int, optional): The number of concurrent requests. 
+                Defaults to LINT_AGENT_WORKERS.
+        """
+        if self.language in self.reviewed_languages:
+            descriptions = dict(self.tasks)
+            jobs = []
+            for file in self.file_list:
+                file_path = os.path.join(self.directory, normalise_path(file, self.directory))
+                jobs.append((file_path, descriptions.get(file_path)))
+        elif self.language in self.highlighted_languages:
+            jobs = list(self.tasks)
+        else:
+            jobs = [
+                (os.path.join(self.directory, file), None)
+                for file in self.file_list
+                ]
+        if not jobs:
+            return
+
+        max_workers = max_workers or LINT_AGENT_WORKERS
+        progress = ProgressReporter(pr_git_handler, index, increment, len(jobs))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(tracing.wrap(self._improve_file), file_path, task_description)
+                for file_path, task_description in jobs
+                ]
+            for _ in as_completed(futures):
+                progress.advance()
+            # Keep the order of the tasks, not the order of completion
+            for (file_path, _), future in zip(jobs, futures):
+                try:
+                    self.improved_source_code.append(future.result())
+                except Exception:
+                    LOGGER.exception("Improving %s failed.", file_path)
+
+    def _improve_file(self, file_path, task_description=None):
+        """
+        Improves one file and puts the improved code into the result store.
+
+        Returns:
+            tuple: The file path and the handle of the improved code.
+        """
+        with open(file_path, "r") as file:
+            code = file.read()
+        response = json.loads(self._request_improvement(file_path, code, task_description))
+        # The repository-relative path keeps the handle independent of the clone
+        return file_path, self._results.put(
+            os.path.relpath(file_path, self.directory),
+            response["improved_source_code"],
+            original=code,
+            explanation=response.get("explanation", "")
+            )
+
+    def _request_improvement(self, file_path, code, task_description=None):
+        """
+        Sends the prompt for one file to the OpenAI API.
 
+        In diff-scoped mode only the changed hunks are sent, in patch mode 
+        (PATCH_RESPONSES) the whole file is sent but only edits are requested. 
+        If the edits can't be applied, the whole improved file is requested.
+
+        Args:
+            file_path (str): The full path of the file.
+            code (str): The content of the file.
+            task_description (str, optional): The linter suggestions. If None, 
+                the prompt without linter suggestions is used.
+
+        Returns:
+            str: The response of the AI model, a JSON object with the keys 
+            "improved_source_code" and "explanation".
+        """
+        ranges = self._get_changed_ranges(file_path)
+        if self.diff_scoped and ranges:
+            try:
+                return self._improve_hunks(file_path, code, ranges, task_description)
+            except (EditApplyError, KeyError, TypeError, ValueError) as e:
+                LOGGER.debug("Diff-scoped edits failed for %s, using the whole file: %s", file_path, e)
+        if task_description is None:
+            template = prompts.lint_prompt_not_highlighted
+        else:
+            template = prompts.lint_prompt
+        arguments = {
+            "source_code": code,
+            "linter_suggestions": task_description,
+            "changed_lines": self._changed_lines_hint(file_path)
+        }
+        if PATCH_RESPONSES:
+            try:
+                LOGGER.debug("Calling OpenAI API for the edits of " + file_path + "...")
+                response = json.loads(get_completion(
+                    template.format(output_format=prompts.edits_output, **arguments),
+                    model=self.json_model,
+                    task=self._task(file_path, routing.EDIT)
+                    ))
+                return json.dumps({
+                    "improved_source_code": apply_patch_response(code, response),
+                    "explanation": response.get("explanation", "")
+                })
+            except (EditApplyError, KeyError, TypeError, ValueError) as e:
+                LOGGER.debug("Edits failed for %s, requesting the whole file: %s", file_path, e)
+        prompt = template.format(output_format=prompts.lint_output, **arguments)
+        LOGGER.debug("Calling OpenAI API for " + file_path + "...")
+        return get_completion(
+            prompt,
+            model=self.json_model,
+            task=self._task(file_path, routing.REWRITE)
+            )
+
+    def _task(self, file_path, task):
+        """
+        Returns the routing task of a request for a file (see 
+        controller.src.routing): formatting fix if all its findings only 
+        concern the formatting, the given task otherwise.
+        """
+        return routing.FORMATTING_FIX if file_path in self.formatting_tasks else task
+
+    def _improve_hunks(self, file_path, code, ranges, task_description=None):
+        """
+        Sends only the changed hunks of a file to the OpenAI API and applies 
+        the returned search/replace edits to the code.
+
+        Returns:
+            str: A JSON response in the format of the whole-file prompts, so 
+            _improve_file handles both modes the same way.
+
+        Raises:
+            EditApplyError: If an edit doesn't match the hunks or is ambiguous.
+        """
+        excerpts = ""
+        hunks = extract_hunks(code, ranges, LINT_HUNK_CONTEXT)
+        for start, end, text in hunks:
+            excerpts += "####\nLines {start}-{end}:\n{text}".format(
+                start=start,
+                end=end,
+                text=text
+                )
+        if task_description:
+            linter_section = "A linter has already been used for this code, " \
+                "consider its suggestions:\n" + task_description
+        else:
+            linter_section = ""
+        prompt = prompts.lint_prompt_scoped.format(
+            linter_section=linter_section,
+            excerpts=excerpts
+            )
+        LOGGER.debug("Calling OpenAI API for the hunks of " + file_path + "...")
+        response = json.loads(get_completion(
+            prompt,
+            model=self.json_model,
+            task=self._task(file_path, routing.EDIT)
+            ))
+        # Only the hunks the AI model has seen may be changed
+        improved_code = apply_edits(
+            code,
+            response["edits"],
+            regions=[(start, end) for start, end, _ in hunks]
+            )
+        return json.dumps({
+            "improved_source_code": improved_code,
+            "explanation": response.get("explanation", "")
+        })
 
     def write_changes(self):
         """
         Writes the improved code back to the files.
         """
-        for path, improved_source_code in self.improved_source_code:
-            improved_source_code = json.loads(improved_source_code)["improved_source_code"]
-            with open(path, "w") as file:
-                file.write(improved_source_code)
+        with tracing.span("write", files=len(self.improved_source_code)) as span:
+            for path, result in self.improved_source_code:
+                improved_source_code = result.read()
+                with open(path, "w") as file:
+                    file.write(improved_source_code)
+                span.add("bytes", len(improved_source_code.encode("utf-8")))
 
     def make_commit_msg(self):
         """
         Generates a commit message based on the explanations provided by the AI model.
 
-        This method constructs a commit prompt by appending each explanation from the explanations list 
-        to the commit_prompt string. It then sends the commit_prompt to the OpenAI API and stores the 
-        response as the commit message.
+        The prompt only has one line per improved file, with its diff statistics 
+        and the start of the explanation that came with the improved code (see 
+        StoredResult.summary), and is sent to commit_model.
 
-        The commit message is stored in the instance variable commit_msg.
+        The commit message is stored in the instance variable commit_msg. If only 
+        the local formatters changed files, or the AI model only changed 
+        whitespace, a fixed message is used instead of asking the AI model.
         """
-        tasks = ""
-        for path, improved_source_code in self.improved_source_code:
-            tasks += path + ":\n"
-            tasks += str(improved_source_code) + "\n"
-        print("Commit Prompt: " + prompts.commit_prompt.format(tasks=tasks))
+        results = [result for _, result in self.improved_source_code]
+        if all(result.formatting_only() for result in results):
+            files = set(self.fixed_files) | set(result.path for result in results)
+            if files:
+                self.commit_msg = "Apply formatter fixes to {n} file(s)".format(n=len(files))
+            return
+        tasks = "\n".join(
+            result.summary(COMMIT_EXPLANATION_CHARS)
+            for result in results if not result.formatting_only()
+            )
+        LOGGER.debug("Commit Prompt: " + prompts.commit_prompt.format(tasks=tasks))
         self.commit_msg = get_completion(
             prompts.commit_prompt.format(tasks=tasks),
-            model=self.text_model,
-            type="text"
+            model=self.commit_model,
+            type="text",
+            task=routing.COMMIT_MESSAGE
             )
 
     def __str__(self):
@@ -246,8 +616,6 @@ class LintAgent(CodeQualityAgent):
             s += f"{tup[0]}\n"
             s += f"{tup[1]}\n".encode("utf-8").decode("unicode-escape")
         s += "\nImproved Code:\n"
-        for tup in self.improved_source_code:
-            s += f"{tup[0]}\n"
-            s += str(type(tup[1]))
-            s += f"{tup[1]}\n".encode("utf-8").decode("unicode-escape")
+        for _, result in self.improved_source_code:
+            s += result.summary() + "\n"
         return s
\ No newline at end of file
@@ -1,3 +1,15 @@
+# Output formats of lint_prompt, lint_prompt_not_highlighted and docs_prompt
+lint_output = 'Return a json object with 2 keys, "improved_source_code" and "explanation".'
+
+docs_output = 'Return a json object with 2 keys, "documented_source_code" and "explanation".'
+
+edits_output = """Return a json object with 2 keys, "edits" and "explanation". \
+"edits" is a list of objects with the keys "search", "replace" and "line". \
+"search" is a block of consecutive lines copied verbatim from the source code, \
+"replace" is the new version of that block and "line" is the line number where \
+the block starts. Keep the blocks as small as possible and do not return the \
+whole source code. Return an empty list if nothing should be changed."""
+
 lint_prompt = """
 You will get two sections of code separated by ####. The first section \
 contains source code that can be improved. A linter has already been used for \
@@ -11,6 +23,9 @@ While improving the code, please adhere to the following constraints:
 - Do not modify any HTML and/or XML code
 - Only make changes to local code (code inside functions and methods)
 - Do not modify code that might be accessed in other files
+- Focus on the changed lines listed in the third section, they were changed \
+in the pull request. Only touch other lines if it is necessary for the changed \
+lines
 
 Proceed as follows:
 1. Analyze the source code and identify traditional coding \
@@ -24,7 +39,7 @@ interpretable. Avoid creating a package structure that would require placeholder
 Make sure to use the insights from points 2. and 3..
 5. Ensure that the solution you found is compilable or interpretable, and does not \
 contain placeholders or incomplete package structures.
-6. Return a json object with 2 keys, "improved_source_code" and "explanation". \
+6. {output_format} \
 7. Make sure that the previously mentioned constrains are met. If not, please \
 revise the result so that the constraints are met.
 
@@ -35,6 +50,9 @@ source code:
 linter suggestions:
 {linter_suggestions}
 ####
+changed lines:
+{changed_lines}
+####
 """
 
 lint_prompt_not_highlighted = """
@@ -47,6 +65,9 @@ While improving the code, please adhere to the following constraints:
 - Do not modify any HTML and/or XML code
 - Only make changes to local code (code inside functions and methods)
 - Do not modify code that might be accessed in other files
+- Focus on the changed lines listed after the source code, they were changed \
+in the pull request. Only touch other lines if it is necessary for the changed \
+lines
 
 Proceed as follows:
 1. Analyze the source code and identify the language.
@@ -58,13 +79,38 @@ code must be compilable or interpretable. Avoid creating a package structure \
 that would require placeholders. \
 5. Ensure that the solution you found is compilable or interpretable, and does not \
 contain placeholders or incomplete package structures.
-6. Return a json object with 2 keys, "improved_source_code" and "explanation". \
+6. {output_format} \
 7. Make sure that the previously mentioned constrains are met. If not, please \
 revise the result so that the constraints are met.
 
 ####
 source code:
 {source_code}
+####
+changed lines:
+{changed_lines}
+"""
+
+lint_prompt_scoped = """
+You will get excerpts of a source file separated by ####. The excerpts contain \
+the lines that were changed in a pull request and some context lines. Improve \
+the code quality of these excerpts. {linter_section}
+
+While improving the code, please adhere to the following constraints:
+- Do not change any names
+- Do not modify any HTML and/or XML code
+- Only make changes to local code (code inside functions and methods)
+- Do not modify code that might be accessed in other files
+- Only change code inside the excerpts, the rest of the file is not shown
+
+Return a json object with 2 keys, "edits" and "explanation". "edits" is a list \
+of objects with the keys "search", "replace" and "line". "search" is a block of \
+consecutive lines copied verbatim from one excerpt, "replace" is the improved \
+version of that block and "line" is the line number where the block starts. \
+Keep the blocks as small as possible. Return an empty list if nothing should \
+be changed.
+
+{excerpts}
 """
 
 docs_prompt = """
@@ -74,7 +120,7 @@ not adequately documented. Our goal is to improve the documentation of these \
 codebases to enhance the maintainability and understandability of the code. We \
 would like you to assist us in generating docstrings for the undocumented or \
 poorly documented code.
-Return a json object with 2 keys, "documented_source_code" and "explanation".
+{output_format}
 
 ## Programming Languages:
 The codebases are written in {language}.
@@ -91,8 +137,26 @@ above:
 {code}
 """
 
+docs_symbols_prompt = """
+We have a codebase written in {language} with undocumented classes, functions \
+and methods. Please write a docstring for each of the symbols below in the \
+same format and style as the examples of existing docstrings.
+Return a json object with 2 keys, "docstrings" and "explanation". "docstrings" \
+is a list of objects with the keys "id" and "docstring". "id" is the id of the \
+symbol, "docstring" is only the text of the docstring, without comment \
+delimiters, quotes or indentation.
+
+## Examples of Existing Docstrings:
+{docstrings}
+
+## Undocumented Symbols:
+{symbols}
+"""
+
 commit_prompt = """
 I want you to act as a GitHub commit message generator.
+Every line below describes the change of one file: its path, the number of \
+added and removed lines and an explanation.
 Summarize the following explanations in 3-10 words. 
 The summary should contain the most important information from each individual \
 declaration.
@@ -0,0 +1,279 @@
+"""
+This module finds undocumented symbols in source code and inserts docstrings.
+
+Python code is parsed with ast. Java code is scanned line by line by a
+lightweight parser that recognises class, interface, enum and record
+declarations and method or constructor declarations, which is enough to decide
+where a Javadoc comment belongs without a full Java grammar.
+
+The AI model only writes the text of the docstrings, the delimiters and the
+indentation are added here, so the rest of the file is never rewritten.
+"""
+import re
+import ast
+from typing import Dict, List, NamedTuple
+
+# Number of source lines of a symbol that are shown to the AI model
+SYMBOL_CONTEXT_LINES = 40
+
+
+class Symbol(NamedTuple):
+    """
+    An undocumented class, function or method.
+
+    insert_line is the 0-based index of the line before which the docstring is
+    inserted, indent the indentation of the docstring.
+    """
+    name: str
+    kind: str
+    line: int
+    insert_line: int
+    indent: str
+    source: str
+
+
+def find_python_symbols(source: str) -> List[Symbol]:
+    """
+    Finds the classes, functions and methods without docstring in Python code.
+
+    Symbols whose body doesn't start on a line of its own (e.g. "def f(): pass"
+    or a signature over several lines followed by the body) are skipped.
+
+    Returns:
+        list of Symbol: The symbols in the order of the file. Empty if the code
+        can't be parsed.
+
+    >>> [s.name for s in find_python_symbols("class A:\\n    def f(self):\\n        pass\\n")]
+    ['A', 'f']
+    """
+    try:
+        module = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+    lines = source.splitlines(keepends=True)
+
+    symbols = []
+    def visit(node, in_class):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                first = child.body[0]
+                if ast.get_docstring(child) is None and _starts_line(lines, first):
+                    if isinstance(child, ast.ClassDef):
+                        kind = "class"
+                    else:
+                        kind = "method" if in_class else "function"
+                    start = min([child.lineno] + [d.lineno for d in child.decorator_list])
+                    end = min(child.end_lineno, start + SYMBOL_CONTEXT_LINES - 1)
+                    # The docstring goes above the decorators of the first statement
+                    insert_line = min(
+                        [first.lineno] + [d.lineno for d in getattr(first, "decorator_list", [])]
+                        ) - 1
+                    first_line = lines[insert_line]
+                    symbols.append(
+                        Symbol(
+                            name=child.name,
+                            kind=kind,
+                            line=child.lineno,
+                            insert_line=insert_line,
+                            indent=first_line[:len(first_line) - len(first_line.lstrip())],
+                            source="".join(lines[start - 1:end])
+                        )
+                    )
+                visit(child, isinstance(child, ast.ClassDef))
+            else:
+                visit(child, in_class)
+    visit(module, False)
+    return sorted(symbols, key=lambda symbol: symbol.line)
+
+
+def _starts_line(lines, node):
+    # Decorators always start a line, otherwise only whitespace may precede the
+    # statement. col_offset counts UTF-8 bytes.
+    if getattr(node, "decorator_list", None):
+        return True
+    return not lines[node.lineno - 1].encode("utf-8")[:node.col_offset].strip()
+
+
+_JAVA_MODIFIERS = r"(?:(?:public|protected|private|static|final|abstract|sealed|non-sealed" \
+    r"|synchronized|native|default|strictfp)\s+)*"
+_JAVA_TYPE = re.compile(
+    r"^\s*" + _JAVA_MODIFIERS + r"(class|interface|enum|record|@interface)\s+(\w+)"
+    )
+_JAVA_METHOD = re.compile(
+    r"^\s*" + _JAVA_MODIFIERS + r"(?:<[^>]*>\s*)?(?:[\w.$]+(?:<.*>)?(?:\[\])*\s+)?(\w+)\s*\("
+    )
+_JAVA_KEYWORDS = {
+    "if", "for", "while", "switch", "catch", "return", "new", "throw", "else",
+    "do", "try", "synchronized", "super", "this", "assert", "case", "yield"
+}
+
+
+def find_java_symbols(source: str) -> List[Symbol]:
+    """
+    Finds the types, methods and constructors without Javadoc in Java code.
+
+    A declaration is documented if the lines above it, skipping annotations and
+    blank lines, end with a comment that starts with "/**". Method declarations
+    are only recognised at the top level of a type body.
+
+    >>> code = "public class A {\\n    /** Doc. */\\n    void f() {}\\n    int g(int x) {\\n        return x;\\n    }\\n}\\n"
+    >>> [(s.name, s.kind) for s in find_java_symbols(code)]
+    [('A', 'class'), ('g', 'method')]
+    """
+    lines = source.splitlines(keepends=True)
+    code_lines = _strip_java_comments(source).splitlines()
+    symbols = []
+    # Nesting depth of braces and of the type bodies around the current line
+    depth = 0
+    type_depths = []
+    pending_type = False
+    for index, line in enumerate(code_lines):
+        stripped = line.strip()
+        type_match = _JAVA_TYPE.match(line)
+        method_match = _JAVA_METHOD.match(line)
+        kind = name = None
+        if type_match:
+            kind, name = "class", type_match.group(2)
+            # The body starts with the next opening brace
+            pending_type = True
+        elif method_match and type_depths and depth == type_depths[-1] + 1 \
+                and method_match.group(1) not in _JAVA_KEYWORDS \
+                and not stripped.endswith(";") and "=" not in stripped.split("(")[0]:
+            kind, name = "method", method_match.group(1)
+
+        if kind and not _has_javadoc(lines, code_lines, index):
+            start = _annotation_start(code_lines, index)
+            original = lines[start]
+            symbols.append(
+                Symbol(
+                    name=name,
+                    kind=kind,
+                    line=index + 1,
+                    insert_line=start,
+                    indent=original[:len(original) - len(original.lstrip())],
+                    source="".join(lines[start:index + SYMBOL_CONTEXT_LINES])
+                )
+            )
+
+        for character in line:
+            if character == "{":
+                if pending_type:
+                    type_depths.append(depth)
+                    pending_type = False
+                depth += 1
+            elif character == "}":
+                depth -= 1
+                if type_depths and type_depths[-1] == depth:
+                    type_depths.pop()
+    return symbols
+
+
+def _strip_java_comments(source):
+    """
+    Blanks out comments and string literals, keeping the line structure.
+    """
+    def blank(match):
+        return re.sub(r"[^\n]", " ", match.group(0))
+    return re.sub(
+        r'/\*.*?\*/|//[^\n]*|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'',
+        blank,
+        source,
+        flags=re.DOTALL
+        )
+
+
+def _annotation_start(code_lines, index):
+    # Annotations belong to the declaration, the Javadoc goes above them
+    start = index
+    while start > 0:
+        if code_lines[start - 1].strip().startswith("@"):
+            start -= 1
+            continue
+        # The last line of an annotation over several lines: walk back over
+        # its parentheses to the line of the "@"
+        balance = 0
+        probe = start - 1
+        while probe >= 0:
+            balance += code_lines[probe].count(")") - code_lines[probe].count("(")
+            if balance <= 0:
+                break
+            probe -= 1
+        if probe < start - 1 and balance == 0 and code_lines[probe].strip().startswith("@"):
+            start = probe
+            continue
+        break
+    return start
+
+
+def _has_javadoc(lines, code_lines, index):
+    previous = _annotation_start(code_lines, index) - 1
+    while previous >= 0 and not lines[previous].strip():
+        previous -= 1
+    if previous < 0 or not lines[previous].rstrip().endswith("*/"):
+        return False
+    while previous >= 0 and "/*" not in lines[previous]:
+        previous -= 1
+    return previous >= 0 and "/**" in lines[previous]
+
+
+def find_symbols(language: str, source: str) -> List[Symbol]:
+    if language == "python":
+        return find_python_symbols(source)
+    if language == "java":
+        return find_java_symbols(source)
+    return []
+
+
+def format_docstring(language: str, text: str, indent: str) -> str:
+    """
+    Formats the text of a docstring as a comment of the language.
+
+    >>> format_docstring("python", "Adds two numbers.", "    ")
+    '    \"\"\"Adds two numbers.\"\"\"\\n'
+    >>> format_docstring("java", "Adds two numbers.", "")
+    '/**\\n * Adds two numbers.\\n */\\n'
+    """
+    text_lines = [line.rstrip() for line in text.strip().splitlines()]
+    if language == "python":
+        text_lines = [line.replace('"""', "'''") for line in text_lines]
+        # Backslashes in the text are kept as they are
+        raw = any("\\" in line for line in text_lines)
+        quotes = 'r"""' if raw else '"""'
+        if raw:
+            # A raw string can't escape its closing quotes
+            text_lines = [line + " " if line.endswith("\\") else line for line in text_lines]
+        if len(text_lines) == 1:
+            # A quote right before the closing quotes would end the string
+            if text_lines[0].endswith('"'):
+                text_lines[0] = text_lines[0] + " " if raw else text_lines[0][:-1] + '\\"'
+
+            return f'{indent}{quotes}{text_lines[0]}"""\n'
+        body = "".join(f"{indent}{line}\n" if line else "\n" for line in text_lines)
+        return f'{indent}{quotes}\n{body}{indent}"""\n'
+    text_lines = [line.replace("*/", "*&#47;") for line in text_lines]
+    body = "".join(f"{indent} * {line}\n" if line else f"{indent} *\n" for line in text_lines)
+    return f"{indent}/**\n{body}{indent} */\n"
+
+
+def insert_docstrings(language: str, source: str, docstrings: Dict[Symbol, str]) -> str:
+    """
+    Inserts docstrings for symbols of a source code.
+
+    The insertions are made from the bottom to the top, so the line indexes of
+    the remaining symbols stay valid.
+
+    Args:
+        language (str): "python" or "java".
+        source (str): The source code the symbols were found in.
+        docstrings (dict): The text of the docstring by symbol.
+
+    Returns:
+        str: The source code with the docstrings.
+    """
+    lines = source.splitlines(keepends=True)
+    for symbol in sorted(docstrings, key=lambda symbol: symbol.insert_line, reverse=True):
+        text = docstrings[symbol]
+        if not text or not text.strip():
+            continue
+        lines.insert(symbol.insert_line, format_docstring(language, text, symbol.indent))
+    return "".join(lines)
@@ -0,0 +1,72 @@
+import subprocess
+from code_quality_agent.src.docstring_index import (
+    DocstringIndex,
+    blob_sha,
+    extract_files,
+    extract_pydoc,
+    lacks_module_docstring
+)
+
+def extract_serially(file_paths):
+    docstrings = []
+    for file_path in file_paths:
+        with open(file_path) as f:
+            docstrings.append(extract_pydoc(f.read()))
+    return docstrings
+
+def write(path, content):
+    with open(path, "w") as f:
+        f.write(content)
+
+def test_update_parses_only_new_contents(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    subprocess.run(["git", "init", "-q", str(repo)], check=True)
+    write(repo / "a.py", '"""Parses the config file."""\n')
+    write(repo / "b.py", '"""Sends the request."""\n')
+    write(repo / "broken.py", "def (:\n")
+    subprocess.run(["git", "-C", str(repo), "add", "a.py"], check=True)
+    files = [str(repo / name) for name in ["a.py", "b.py", "broken.py"]]
+
+    index = DocstringIndex("python", "repo", index_dir=str(tmp_path / "index"))
+    assert index.update(str(repo), files, extract_serially) == 3
+    assert index.get(files[0]) == ["Parses the config file."]
+    assert index.get(files[2]) is None
+    index.save()
+
+    index = DocstringIndex("python", "repo", index_dir=str(tmp_path / "index"))
+    write(repo / "b.py", '"""Sends the request again."""\n')
+    assert index.update(str(repo), files, extract_serially) == 1
+    assert index.docstrings() == ["Parses the config file.", "Sends the request again."]
+
+def test_sample_is_relevant_and_bounded(tmp_path):
+    index = DocstringIndex("python", "repo", index_dir=str(tmp_path))
+    index._docstrings = {"1": ["Parses the config file."], "2": ["Sends the request."]}
+    index._files = {"a.py": "1", "b.py": "2"}
+    assert index.sample("def send(request): pass")[0] == "Sends the request."
+    assert index.sample("def send(request): pass", max_chars=20) == ["Sends the request."]
+
+def test_blob_sha_matches_git(tmp_path):
+    write(tmp_path / "a.txt", "hello\n")
+    sha = subprocess.run(
+        ["git", "hash-object", str(tmp_path / "a.txt")],
+        check=True, capture_output=True, text=True
+        ).stdout.strip()
+    assert blob_sha(b"hello\n") == sha
+
+def test_extract_files_in_processes(tmp_path):
+    file_paths = []
+    for i in range(5):
+        write(tmp_path / f"m{i}.py", f'"""Module {i}."""\n')
+        file_paths.append(str(tmp_path / f"m{i}.py"))
+    write(tmp_path / "broken.py", "def (:\n")
+    file_paths.append(str(tmp_path / "broken.py"))
+    expected = [[f"Module {i}."] for i in range(5)] + [None]
+    assert extract_files("python", file_paths, max_workers=1) == expected
+    assert extract_files("python", file_paths, max_workers=2, chunk_size=2) == expected
+
+def test_lacks_module_docstring():
+    # Whole-file mode documents Python files without a module docstring
+    assert lacks_module_docstring("class A:\n    \"\"\"Class.\"\"\"\n") is True
+    assert lacks_module_docstring("\"\"\"Module.\"\"\"\n\nclass A:\n    pass\n") is False
+    assert lacks_module_docstring("def f(:\n") is None
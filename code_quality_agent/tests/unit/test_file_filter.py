@@ -0,0 +1,47 @@
+import subprocess
+from code_quality_agent.src.file_filter import filter_files
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    mode = "wb" if isinstance(content, bytes) else "w"
+    with open(path, mode) as f:
+        f.write(content)
+
+def test_filter_files(tmp_path):
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    write(tmp_path / ".gitignore", "*.log\n")
+    write(tmp_path / ".gitattributes", "gen/** linguist-generated\n*.dat -diff\n")
+    write(tmp_path / ".optimaignore", "fixtures/\n")
+    files = {
+        "src/app.py": "print('hello')\n",
+        "debug.log": "log\n",
+        "gen/Parser.java": "class Parser {}\n",
+        "data.dat": "data\n",
+        "fixtures/case.json": "{}\n",
+        "node_modules/x/index.js": "x\n",
+        "package-lock.json": "{}\n",
+        "bundle.js": "var a=1;" * 1000,
+        "image.bin": b"\x89PNG\0\0",
+    }
+    for name, content in files.items():
+        write(tmp_path / name, content)
+
+    kept, skipped = filter_files(str(tmp_path), list(files))
+    assert kept == ["src/app.py"]
+    assert skipped == {
+        "debug.log": "ignored",
+        "gen/Parser.java": "generated",
+        "data.dat": "binary",
+        "fixtures/case.json": "ignored",
+        "node_modules/x/index.js": "ignored directory",
+        "package-lock.json": "generated",
+        "bundle.js": "minified",
+        "image.bin": "binary",
+    }
+
+def test_filter_files_without_git(tmp_path):
+    write(tmp_path / "a.py", "a = 1\n")
+    write(tmp_path / "big.py", "a = 1\n" * 50000)
+    kept, skipped = filter_files(str(tmp_path), ["a.py", "big.py"])
+    assert kept == ["a.py"]
+    assert skipped == {"big.py": "too large"}
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import pytest
+from code_quality_agent.src.file_retriever import FileRetriever
+
+def git(path, *args):
+    subprocess.run(["git", "-C", str(path)] + list(args), check=True, capture_output=True)
+
+def write(path, content="x\n"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+@pytest.fixture
+def tree(tmp_path):
+    for name in ["a.py", "src/b.py", "src/C.java", "README", "node_modules/d.js",
+                 ".hidden/e.py", "src/__init__.py", "ignored/f.py"]:
+        write(tmp_path / name)
+    write(tmp_path / ".gitignore", "ignored/\n")
+    FileRetriever.clear_cache()
+    yield tmp_path
+    FileRetriever.clear_cache()
+
+def expected(tmp_path, names):
+    return sorted(os.path.join(str(tmp_path), *name.split("/")) for name in names)
+
+def test_git_repository(tree):
+    git(tree, "init", "-q")
+    git(tree, "-c", "user.email=t@example.com", "-c", "user.name=T",
+        "commit", "-q", "--allow-empty", "-m", "initial")
+    retriever = FileRetriever(str(tree))
+    assert sorted(retriever.iter_files("py")) == expected(tree, ["a.py", "src/b.py"])
+    assert retriever.get_mapping()["java"] == expected(tree, ["src/C.java"])
+    assert retriever.get_mapping()[""] == expected(tree, ["README"])
+
+    # Same commit: the cached list is used, the new file is not listed
+    write(tree / "g.py")
+    assert len(list(FileRetriever(str(tree)).iter_files("py"))) == 2
+
+def test_walk_without_git(tree):
+    retriever = FileRetriever(str(tree))
+    assert sorted(retriever.iter_files("py")) == expected(tree, ["a.py", "ignored/f.py", "src/b.py"])
+
+def test_cache_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr("code_quality_agent.src.file_retriever.FILE_LIST_CACHE_SIZE", 2)
+    FileRetriever.clear_cache()
+    for index in range(3):
+        repo = tmp_path / str(index)
+        write(repo / "a.py")
+        git(repo, "init", "-q")
+        git(repo, "-c", "user.email=t@example.com", "-c", "user.name=T",
+            "commit", "-q", "--allow-empty", "-m", "initial")
+        FileRetriever(str(repo))
+    assert [key[0] for key in FileRetriever._cache] == [str(tmp_path / "1"), str(tmp_path / "2")]
+    FileRetriever.clear_cache()
@@ -0,0 +1,84 @@
+import json
+from code_quality_agent.src.findings import (
+    Finding,
+    FindingIndex,
+    black_findings,
+    check_python_files,
+    normalise_path,
+    parse_pmd_report
+)
+
+PMD_REPORT = json.dumps({
+    "formatVersion": 0,
+    "files": [
+        {
+            "filename": "src/Foo.java",
+            "violations": [
+                {"beginline": 7, "endline": 9, "rule": "UnusedLocalVariable",
+                 "description": "Avoid unused local variables such as 'x'."},
+                {"beginline": 2, "endline": 2, "rule": "UnnecessaryImport",
+                 "description": "Unused import 'java.util.List'"}
+            ]
+        },
+        {"filename": "src/Bar.java", "violations": []}
+    ]
+})
+
+def test_parse_pmd_report():
+    index = parse_pmd_report(PMD_REPORT)
+    assert len(index) == 2
+    assert index.files() == ["src/Foo.java"]
+    findings = index.get("src/Foo.java")
+    assert findings[0] == Finding("src/Foo.java", 2, 2, "UnnecessaryImport", "Unused import 'java.util.List'")
+    assert findings[1].rule == "UnusedLocalVariable"
+    assert findings[1].end_line == 9
+
+def test_parse_pmd_report_invalid():
+    assert len(parse_pmd_report("")) == 0
+    assert len(parse_pmd_report("Exception in thread main")) == 0
+
+def test_finding_index_describe():
+    index = FindingIndex([
+        Finding("a.py", 5, 5, "black", "b"),
+        Finding("a.py", 1, 2, "black", "a"),
+    ])
+    assert index.describe("a.py") == "Lines 1-2 [black]: a\nLine 5 [black]: b"
+    assert index.get("missing.py") == []
+
+def test_black_findings():
+    source = "x = 1\ny = [1,2]\nz = 3\n"
+    findings = black_findings("a.py", source)
+    assert len(findings) == 1
+    assert findings[0].begin_line == 2
+    assert findings[0].end_line == 2
+    assert "y = [1, 2]" in findings[0].message
+    assert black_findings("a.py", "x = 1\n") == []
+    assert black_findings("a.py", "def (:\n") == []
+
+def test_check_python_files(tmp_path):
+    with open(tmp_path / "a.py", "w") as f:
+        f.write("x=1\n")
+    with open(tmp_path / "b.java", "w") as f:
+        f.write("class B {}\n")
+    index = check_python_files(str(tmp_path), ["a.py", "b.java", "missing.py"])
+    assert index.files() == ["a.py"]
+
+def test_normalise_path():
+    assert normalise_path("/repo/src/Foo.java", "/repo") == "src/Foo.java"
+    assert normalise_path("./src/Foo.java", "/repo") == "src/Foo.java"
+    assert normalise_path("src\\Foo.java", "/repo") == "src/Foo.java"
+
+def test_finding_index_exact_paths():
+    index = parse_pmd_report(json.dumps({
+        "files": [
+            {"filename": "/repo/src/Foo.java",
+             "violations": [{"beginline": 1, "rule": "r", "description": "foo"}]},
+            {"filename": "/repo/src/BarFoo.java",
+             "violations": [{"beginline": 1, "rule": "r", "description": "barfoo"}]},
+            {"filename": "src/Foo.java",
+             "violations": [{"beginline": 2, "rule": "r", "description": "foo2"}]}
+        ]
+    }), root="/repo")
+    assert sorted(index.files()) == ["src/BarFoo.java", "src/Foo.java"]
+    assert [f.message for f in index.get("src/Foo.java")] == ["foo", "foo2"]
+    assert [f.message for f in index.get("/repo/src/Foo.java")] == ["foo", "foo2"]
@@ -0,0 +1,31 @@
+from unittest.mock import patch
+from code_quality_agent.src.formatters import format_java_files, format_python_file
+
+def test_format_python_file(tmp_path):
+    file_path = tmp_path / "a.py"
+    with open(file_path, "w") as f:
+        f.write("x=1\ny=[1,2]\n")
+    assert format_python_file(str(file_path))
+    with open(file_path) as f:
+        assert f.read() == "x = 1\ny = [1, 2]\n"
+    assert not format_python_file(str(file_path))
+
+def test_format_python_file_ranges(tmp_path):
+    file_path = tmp_path / "a.py"
+    with open(file_path, "w") as f:
+        f.write("x=1\ny=[1,2]\n")
+    assert format_python_file(str(file_path), [(2, 2)])
+    with open(file_path) as f:
+        assert f.read() == "x=1\ny = [1, 2]\n"
+
+def test_format_python_file_invalid(tmp_path):
+    file_path = tmp_path / "a.py"
+    with open(file_path, "w") as f:
+        f.write("def (:\n")
+    assert not format_python_file(str(file_path))
+
+@patch("code_quality_agent.src.formatters.google_java_format_available", return_value=False)
+def test_format_java_files_not_installed(_, tmp_path):
+    with open(tmp_path / "A.java", "w") as f:
+        f.write("class A{}\n")
+    assert format_java_files(str(tmp_path), ["A.java"]) == []
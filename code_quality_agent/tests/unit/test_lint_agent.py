@@ -0,0 +1,159 @@
+import os
+import json
+import threading
+import subprocess
+import pytest
+from unittest.mock import MagicMock, patch
+
+# The OpenAI client of the module is created at import, the variables are only
+# set for the import, so they don't leak into other tests
+with patch.dict(os.environ, {
+        "HTTPS_PROXY": os.environ.get("HTTPS_PROXY", "http://localhost:3128"),
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "test"),
+        "AZURE_OPENAI_ENDPOINT": os.environ.get("AZURE_OPENAI_ENDPOINT", "https://example.invalid")
+        }):
+    from code_quality_agent.src import lint_agent
+    from code_quality_agent.src.lint_agent import LintAgent
+from controller.src.result_store import ResultStore
+
+def make_repo(tmp_path, files):
+    subprocess.run(["git", "init", "-q", str(tmp_path / "repo")], check=True)
+    for name, content in files.items():
+        path = tmp_path / "repo" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return str(tmp_path / "repo")
+
+def make_agent(tmp_path, directory, file_list, language, **kwargs):
+    return LintAgent(
+        file_list=file_list,
+        directory=directory,
+        language=language,
+        result_store=ResultStore(str(tmp_path / "store")),
+        diff_scoped=False,
+        **kwargs
+        )
+
+def test_every_python_file_is_reviewed(tmp_path, monkeypatch):
+    directory = make_repo(tmp_path, {
+        "clean.py": "x = 1\n",
+        "messy.py": "x=[1,\n  2]\n",
+    })
+    agent = make_agent(tmp_path, directory, ["clean.py", "messy.py"], "python")
+    # Only the file with findings has a task, but both go to the AI model
+    assert [os.path.basename(path) for path, _ in agent.tasks] == ["messy.py"]
+
+    requests = []
+    def request_improvement(file_path, code, task_description=None):
+        requests.append((os.path.basename(file_path), task_description))
+        return json.dumps({"improved_source_code": code, "explanation": ""})
+    monkeypatch.setattr(agent, "_request_improvement", request_improvement)
+    agent.improve_code(MagicMock(), 20, 1)
+
+    assert [name for name, _ in requests] == ["clean.py", "messy.py"]
+    assert requests[0][1] is None
+    assert requests[1][1]
+
+def test_python_files_are_reviewed_after_the_formatter(tmp_path, monkeypatch):
+    directory = make_repo(tmp_path, {"messy.py": "x=[1,\n  2]\n"})
+    agent = make_agent(tmp_path, directory, ["messy.py"], "python")
+    assert agent.apply_local_fixes() == ["messy.py"]
+    assert agent.tasks == []
+
+    prompts = []
+    def get_completion(prompt, **kwargs):
+        prompts.append(prompt)
+        return json.dumps({"improved_source_code": "x = [1, 2]\n", "explanation": ""})
+    monkeypatch.setattr(lint_agent, "get_completion", get_completion)
+    agent.improve_code(MagicMock(), 20, 1)
+
+    assert len(prompts) == 1
+    assert "x = [1, 2]" in prompts[0]
+
+def test_improve_code_keeps_the_order_of_the_files(tmp_path, monkeypatch):
+    names = ["a.txt", "b.txt", "c.txt", "d.txt"]
+    directory = make_repo(tmp_path, {name: f"content of {name}\n" for name in names})
+    agent = make_agent(tmp_path, directory, names, "other")
+    finished = {name: threading.Event() for name in names}
+    def get_completion(prompt, **kwargs):
+        index = next(i for i, name in enumerate(names) if f"content of {name}" in prompt)
+        # The files finish in reverse order
+        if index + 1 < len(names):
+            assert finished[names[index + 1]].wait(5)
+        finished[names[index]].set()
+        if names[index] == "b.txt":
+            return "not JSON"
+        return json.dumps({"improved_source_code": f"improved {names[index]}\n", "explanation": ""})
+    monkeypatch.setattr(lint_agent, "get_completion", get_completion)
+
+    agent.improve_code(MagicMock(), 20, 1, max_workers=len(names))
+    # The failing file is left out, the others keep their order
+    assert [os.path.basename(path) for path, _ in agent.improved_source_code] == ["a.txt", "c.txt", "d.txt"]
+    assert [result.read() for result in agent.get_results()] == [
+        "improved a.txt\n", "improved c.txt\n", "improved d.txt\n"
+    ]
+    assert agent.get_file_paths() == names
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+@pytest.fixture
+def pmd(tmp_path, monkeypatch):
+    """
+    Runs _run_pmd with a stubbed PMD that writes "new" to its cache and exits
+    with the given code. Returns the calls and the shared cache file.
+    """
+    cache_dir = tmp_path / "pmd_cache"
+    monkeypatch.setattr(lint_agent, "PMD_CACHE_DIR", str(cache_dir))
+    directory = make_repo(tmp_path, {"A.java": "class A {}\n", "b.txt": "b\n", "src/C.java": "class C {}\n"})
+    agent = make_agent(tmp_path, directory, ["A.java", "b.txt", "src/C.java"], "other", cache_name="demo")
+    calls = []
+    def run(returncode):
+        def fake_run(command, cwd, capture_output, text):
+            cache = command[command.index("--cache") + 1]
+            calls.append({
+                "command": command,
+                "cwd": cwd,
+                "file_list": read(command[command.index("--file-list") + 1]),
+                "cache": cache,
+                "cache_content": read(cache) if os.path.exists(cache) else None
+            })
+            with open(cache, "w") as f:
+                f.write("new")
+            return subprocess.CompletedProcess(command, returncode, stdout="{}", stderr="")
+        monkeypatch.setattr(lint_agent.subprocess, "run", fake_run)
+        return agent._run_pmd("pmd")
+    return run, calls, cache_dir / "demo.cache"
+
+def test_run_pmd_command_line(pmd):
+    run, calls, shared_cache = pmd
+    assert run(0) == "{}"
+    call = calls[0]
+    cache = call["cache"]
+    assert call["command"] == [
+        "pmd", "check",
+        "--file-list", call["command"][3],
+        "-R", "rulesets/java/quickstart.xml",
+        "--cache", cache,
+        "-f", "json",
+        "--no-progress"
+    ]
+    assert call["file_list"] == "A.java\nsrc/C.java"
+    assert call["cwd"].endswith("repo")
+    # PMD works on a copy of the cache in the cache directory
+    assert os.path.dirname(cache) == str(shared_cache.parent)
+    assert cache != str(shared_cache)
+    assert call["cache_content"] is None
+    assert not os.path.exists(call["command"][3])
+
+@pytest.mark.parametrize("returncode, kept", [(0, True), (4, True), (1, False)])
+def test_run_pmd_replaces_the_cache_after_success(pmd, returncode, kept):
+    run, calls, shared_cache = pmd
+    shared_cache.parent.mkdir()
+    shared_cache.write_text("old")
+    run(returncode)
+    # PMD starts with the stored cache
+    assert calls[0]["cache_content"] == "old"
+    assert shared_cache.read_text() == ("new" if kept else "old")
+    assert os.listdir(shared_cache.parent) == ["demo.cache"]
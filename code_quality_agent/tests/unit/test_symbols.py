@@ -0,0 +1,126 @@
+import ast
+from code_quality_agent.src.symbols import (
+    find_java_symbols,
+    find_python_symbols,
+    insert_docstrings
+)
+
+PYTHON = '''import os
+
+class Loader:
+    """Loads files."""
+
+    @staticmethod
+    def load(path):
+        # Read everything
+        return open(path).read()
+
+def join(a, b):
+    def inner():
+        return a
+    return os.path.join(a, b)
+
+def one_liner(): return 1
+'''
+
+JAVA = '''package demo;
+
+/** A calculator. */
+public class Calculator
+{
+    private int total = compute(1);
+
+    public Calculator(int start) {
+        total = start;
+    }
+
+    /**
+     * Adds.
+     */
+    public int add(int x) {
+        if (x > 0) {
+            total += x;
+        }
+        return total;
+    }
+
+    @Override
+    public String toString() {
+        return "{" + total + "}";
+    }
+
+    static class Helper {
+        void help() {}
+    }
+}
+'''
+
+def test_find_python_symbols():
+    symbols = find_python_symbols(PYTHON)
+    assert [(s.name, s.kind) for s in symbols] == [
+        ("load", "method"), ("join", "function"), ("inner", "function")
+    ]
+    assert symbols[0].source.startswith("    @staticmethod\n")
+
+def test_insert_python_docstrings():
+    symbols = find_python_symbols(PYTHON)
+    result = insert_docstrings("python", PYTHON, {
+        symbols[0]: "Returns the content of a file.",
+        symbols[1]: "Joins two paths.\n\nArgs:\n    a: The first path.",
+    })
+    module = ast.parse(result)
+    loader = module.body[1]
+    assert ast.get_docstring(loader.body[1]) == "Returns the content of a file."
+    assert ast.get_docstring(module.body[2]).startswith("Joins two paths.\n\nArgs:\n    a:")
+    assert find_python_symbols(result)[0].name == "inner"
+
+def test_find_java_symbols():
+    symbols = find_java_symbols(JAVA)
+    assert [(s.name, s.kind) for s in symbols] == [
+        ("Calculator", "method"), ("toString", "method"), ("Helper", "class"), ("help", "method")
+    ]
+    # The Javadoc goes above the annotation
+    assert JAVA.splitlines()[symbols[1].insert_line].strip() == "@Override"
+
+def test_insert_java_docstrings():
+    symbols = find_java_symbols(JAVA)
+    result = insert_docstrings("java", JAVA, {symbols[1]: "Formats the total."})
+    assert "    /**\n     * Formats the total.\n     */\n    @Override\n" in result
+    assert [s.name for s in find_java_symbols(result)] == ["Calculator", "Helper", "help"]
+
+def test_python_docstring_goes_above_decorators_of_the_first_statement():
+    code = "class A:\n    @property\n    def x(self):\n        return 1\n"
+    symbols = find_python_symbols(code)
+    result = insert_docstrings("python", code, {symbols[0]: "Holds x."})
+    assert ast.get_docstring(ast.parse(result).body[0]) == "Holds x."
+
+def test_python_docstring_ending_in_a_quote():
+    code = "def f():\n    return 'one'\n"
+    for text in ['Returns "one"', 'Returns "C:\\\\one"']:
+        result = insert_docstrings("python", code, {find_python_symbols(code)[0]: text})
+        assert ast.get_docstring(ast.parse(result).body[0]).rstrip() == text
+
+def test_python_docstring_ending_in_a_backslash():
+    code = "def f():\n    return 'C:'\n"
+    for text in ["Returns C:\\", "Returns a path.\n\nFor example C:\\"]:
+        result = insert_docstrings("python", code, {find_python_symbols(code)[0]: text})
+        assert ast.get_docstring(ast.parse(result).body[0]).rstrip() == text
+
+def test_python_body_on_the_line_of_a_multi_line_signature_is_skipped():
+    code = "def f(\n    a): return a\n\ndef g(\n    a):\n    return a\n"
+    assert [s.name for s in find_python_symbols(code)] == ["g"]
+
+def test_java_docstring_goes_above_multi_line_annotations():
+    code = (
+        "public class A {\n"
+        "    @SuppressWarnings({\n"
+        '        "a",\n'
+        '        "b"})\n'
+        "    void f() {}\n"
+        "}\n"
+    )
+    symbols = find_java_symbols(code)
+    assert code.splitlines()[symbols[1].insert_line].strip() == "@SuppressWarnings({"
+    result = insert_docstrings("java", code, {symbols[1]: "Does f."})
+    assert "    /**\n     * Does f.\n     */\n    @SuppressWarnings({\n" in result
+    assert [s.name for s in find_java_symbols(result)] == ["A"]
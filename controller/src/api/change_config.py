@@ -5,12 +5,34 @@ import threading
 import logging
 from flask import Blueprint, request, abort, jsonify
 from controller.src.main import main
+from controller.src import metrics
 
 LOGGER = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG)
 
 change_config_blueprint = Blueprint("change_config", __name__)
 
+def run_queued(*args):
+    """
+    Runs main for an accepted request, which no longer counts as queued.
+    While main runs, the request counts as in progress (see main).
+    """
+    metrics.RUNS_QUEUED.dec()
+    main(*args)
+
+def start_run(*args):
+    """
+    Queues a run of main in a thread.
+    """
+    metrics.RUNS_QUEUED.inc()
+    thread = threading.Thread(target=run_queued, args=args)
+    try:
+        thread.start()
+    except RuntimeError:
+        # The thread never runs, so run_queued can't count the run out
+        metrics.RUNS_QUEUED.dec()
+        raise
+
 @change_config_blueprint.route("/optima/api/coding/openaideployment", methods=["POST"])
 def change_config():
     if request.method == "POST":
@@ -43,8 +65,7 @@ def change_config():
                     text_deployment = event["body"]["TEXT-DEPLOYMENT"]
                     git_repo = event["body"]["GIT-REPO"]
                     pr_number = event["body"]["PR-NUMBER"]
-                    thread = threading.Thread(target=main, args=(json_deployment, text_deployment, git_repo, pr_number))
-                    thread.start()
+                    start_run(json_deployment, text_deployment, git_repo, pr_number)
                     return jsonify({"message": "Success"}), 200
                 else:
                     LOGGER.debug("Unauthorized")
@@ -0,0 +1,8 @@
+from flask import Blueprint, Response
+from controller.src import metrics
+
+metrics_blueprint = Blueprint("metrics", __name__)
+
+@metrics_blueprint.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
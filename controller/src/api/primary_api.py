@@ -1,8 +1,10 @@
 from flask import Flask
 from controller.src.api.change_config import change_config_blueprint
+from controller.src.api.metrics import metrics_blueprint
 
 app = Flask(__name__)
 app.register_blueprint(change_config_blueprint)
+app.register_blueprint(metrics_blueprint)
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000)
\ No newline at end of file
@@ -0,0 +1,285 @@
+"""
+This module applies edits returned by the AI model to the original file content.
+
+Instead of a whole file, the AI model can return search/replace edits. The
+edits are validated against the original content: every search block has to
+match a region of the file, exactly or after normalising whitespace, or at
+least fuzzily. If an edit can't be matched, or its search block matches several
+places and no line number decides between them, an EditApplyError is raised and
+the caller falls back to regenerating the whole file. If only parts of a file
+were sent to the AI model, the edits are restricted to these regions.
+
+Unified diffs are accepted as well, their hunks are converted to search/replace
+edits.
+"""
+import os
+import re
+import difflib
+from typing import List, Optional, Tuple
+
+# Minimum similarity of a fuzzily matched region and the search block
+FUZZY_THRESHOLD = 0.85
+
+# Patch mode: the agents ask for edits instead of the whole file
+PATCH_RESPONSES = os.environ.get("PATCH_RESPONSES", "0") == "1"
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class EditApplyError(Exception):
+    """
+    Raised if an edit doesn't match the original content.
+    """
+
+
+def apply_edits(
+        original: str,
+        edits: List[dict],
+        threshold: float = FUZZY_THRESHOLD,
+        regions: Optional[List[Tuple[int, int]]] = None
+        ) -> str:
+    """
+    Applies search/replace edits to a text.
+
+    Each edit is a dict with the keys "search" and "replace". The search block is
+    looked up exactly first, then line by line ignoring leading and trailing
+    whitespace, and finally fuzzily with difflib. An edit may contain a "line"
+    key with the approximate line number, which decides between several matches.
+
+    Args:
+        original (str): The original content.
+        edits (list of dict): The edits in the order they should be applied.
+        threshold (float, optional): The minimum similarity of a fuzzy match.
+        regions (list of tuple, optional): The line ranges (1-based, inclusive)
+            of the original content the edits may change, e.g. the hunks of
+            extract_hunks that were sent to the AI model. Defaults to the whole
+            content.
+
+    Returns:
+        str: The edited content.
+
+    Raises:
+        EditApplyError: If an edit is malformed, its search block is not found
+            in the regions or matches several places without a line number.
+
+    >>> apply_edits("a = 1\\nb = 2\\n", [{"search": "b = 2", "replace": "b = 3"}])
+    'a = 1\\nb = 3\\n'
+    """
+    content = original
+    # 0-based, inclusive, updated as the edits add or remove lines
+    allowed = None if regions is None else [[start - 1, end - 1] for start, end in regions]
+    for edit in edits:
+        if not isinstance(edit, dict) or "search" not in edit or "replace" not in edit:
+            raise EditApplyError(f"Malformed edit: {edit!r}")
+        search, replace = edit["search"], edit["replace"]
+        if not search.strip():
+            raise EditApplyError("Empty search block.")
+        content = _apply_edit(content, search, replace, edit.get("line"), threshold, allowed)
+    return content
+
+
+def apply_unified_diff(original: str, diff: str, threshold: float = FUZZY_THRESHOLD) -> str:
+    """
+    Applies a unified diff to a text.
+
+    Every hunk is converted to a search/replace edit (context and removed lines
+    are searched, context and added lines replace them), so hunks with wrong
+    line numbers or slightly different whitespace still apply.
+
+    Raises:
+        EditApplyError: If the diff has no hunks or a hunk doesn't match.
+
+    >>> apply_unified_diff("a\\nb\\nc\\n", "@@ -1,3 +1,3 @@\\n a\\n-b\\n+B\\n c")
+    'a\\nB\\nc\\n'
+    """
+    edits = []
+    hunk = None
+    for diff_line in diff.splitlines():
+        header = _HUNK_HEADER.match(diff_line)
+        if header:
+            hunk = {"search": [], "replace": [], "line": int(header.group(1))}
+            edits.append(hunk)
+        elif hunk is None or diff_line.startswith(("---", "+++", "\\")):
+            continue
+        elif diff_line.startswith("-"):
+            hunk["search"].append(diff_line[1:])
+        elif diff_line.startswith("+"):
+            hunk["replace"].append(diff_line[1:])
+        else:
+            text = diff_line[1:] if diff_line.startswith(" ") else diff_line
+            hunk["search"].append(text)
+            hunk["replace"].append(text)
+    if not edits:
+        raise EditApplyError("The diff contains no hunks.")
+
+    content = original
+    for edit in edits:
+        if not edit["search"]:
+            # Pure insertion, anchored at the line number
+            lines = content.splitlines(keepends=True)
+            position = min(max(edit["line"], 0), len(lines))
+            inserted = "".join(l + "\n" for l in edit["replace"])
+            content = "".join(lines[:position]) + inserted + "".join(lines[position:])
+            continue
+        content = _apply_edit(
+            content,
+            "\n".join(edit["search"]) + "\n",
+            "\n".join(edit["replace"]) + ("\n" if edit["replace"] else ""),
+            edit["line"],
+            threshold
+            )
+    return content
+
+
+def apply_patch_response(original: str, response: dict, threshold: float = FUZZY_THRESHOLD) -> str:
+    """
+    Applies the patch of a model response, either search/replace edits in the
+    key "edits" or a unified diff in the key "diff".
+
+    Raises:
+        EditApplyError: If the response contains no patch or it doesn't apply.
+    """
+    if not isinstance(response, dict):
+        raise EditApplyError("The response is not a JSON object.")
+    if isinstance(response.get("edits"), list):
+        return apply_edits(original, response["edits"], threshold)
+    if isinstance(response.get("diff"), str):
+        return apply_unified_diff(original, response["diff"], threshold)
+    raise EditApplyError("The response contains neither edits nor a diff.")
+
+
+def _apply_edit(content, search, replace, line, threshold, allowed=None):
+    # 1. Exact match
+    last_offset = search.rstrip("\n").count("\n")
+    positions = []
+    for match in re.finditer(re.escape(search), content):
+        first = content.count("\n", 0, match.start())
+        if _inside(allowed, first, first + last_offset):
+            positions.append(match.start())
+    if positions:
+        position = _closest(positions, line, content)
+        first = content.count("\n", 0, position)
+        _shift(allowed, first + last_offset, replace.count("\n") - search.count("\n"))
+        return content[:position] + replace + content[position + len(search):]
+
+    # 2. and 3. Match whole lines, ignoring whitespace or fuzzily
+    lines = content.splitlines(keepends=True)
+    search_lines = search.strip("\n").splitlines()
+    region = _find_lines(lines, search_lines, line, threshold, allowed)
+    if region is None:
+        raise EditApplyError(f"Search block not found:\n{search}")
+    start, end = region
+    replacement = replace
+    if replacement and not replacement.endswith("\n") and end > start:
+        replacement += "\n"
+    _shift(allowed, end - 1, replacement.count("\n") - (end - start))
+    return "".join(lines[:start]) + replacement + "".join(lines[end:])
+
+
+def _inside(allowed, first, last):
+    return allowed is None or any(start <= first and last <= end for start, end in allowed)
+
+
+def _shift(allowed, last, delta):
+    """
+    Moves the regions after the edited line last by delta lines and resizes
+    the region that contains it.
+    """
+    if not allowed or not delta:
+        return
+    for region in allowed:
+        if region[0] > last:
+            region[0] += delta
+            region[1] += delta
+        elif region[1] >= last:
+            region[1] += delta
+
+
+def _closest(positions, line, content):
+    if len(positions) == 1:
+        return positions[0]
+    if line is None:
+        raise EditApplyError("The search block matches several places.")
+    return min(positions, key=lambda p: abs(content.count("\n", 0, p) + 1 - line))
+
+
+def _find_lines(lines, search_lines, line, threshold, allowed=None) -> Optional[Tuple[int, int]]:
+    """
+    Finds the region of lines that matches search_lines best.
+
+    Returns:
+        tuple: The start (inclusive) and end (exclusive) line index or None.
+
+    Raises:
+        EditApplyError: If several regions match equally well and there is no
+            line number.
+    """
+    size = len(search_lines)
+    if size == 0 or size > len(lines):
+        return None
+    stripped_search = [l.strip() for l in search_lines]
+    stripped_lines = [l.strip() for l in lines]
+
+    candidates = []
+    starts = [
+        start for start in range(len(lines) - size + 1)
+        if _inside(allowed, start, start + size - 1)
+        ]
+    for start in starts:
+        window = stripped_lines[start:start + size]
+        if window == stripped_search:
+            candidates.append((1.0, start))
+    if not candidates:
+        search_text = "\n".join(stripped_search)
+        matcher = difflib.SequenceMatcher(autojunk=False)
+        matcher.set_seq2(search_text)
+        for start in starts:
+            matcher.set_seq1("\n".join(stripped_lines[start:start + size]))
+            if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= threshold:
+                candidates.append((ratio, start))
+    if not candidates:
+        return None
+
+    best_ratio = max(ratio for ratio, _ in candidates)
+    best = [start for ratio, start in candidates if ratio == best_ratio]
+    if line is not None:
+        best.sort(key=lambda start: abs(start + 1 - line))
+    elif len(best) > 1:
+        raise EditApplyError("The search block matches several places.")
+    return best[0], best[0] + size
+
+
+def extract_hunks(source: str, ranges: List[Tuple[int, int]], context: int = 3) -> List[Tuple[int, int, str]]:
+    """
+    Cuts the changed line ranges plus context out of a file.
+
+    Overlapping or adjacent regions are merged.
+
+    Args:
+        source (str): The file content.
+        ranges (list of tuple): The changed line ranges (1-based, inclusive).
+        context (int, optional): The number of context lines around each range.
+
+    Returns:
+        list of tuple: The start line, end line and text of every region.
+
+    >>> extract_hunks("1\\n2\\n3\\n4\\n5\\n6\\n", [(2, 2), (4, 4)], context=0)
+    [(2, 2, '2\\n'), (4, 4, '4\\n')]
+    >>> extract_hunks("1\\n2\\n3\\n4\\n5\\n6\\n", [(2, 2), (4, 4)], context=1)
+    [(1, 5, '1\\n2\\n3\\n4\\n5\\n')]
+    """
+    lines = source.splitlines(keepends=True)
+    regions = []
+    for start, end in sorted(ranges):
+        start = max(start - context, 1)
+        end = min(end + context, len(lines))
+        if start > end:
+            continue
+        if regions and start <= regions[-1][1] + 1:
+            regions[-1] = (regions[-1][0], max(regions[-1][1], end))
+        else:
+            regions.append((start, end))
+    return [(start, end, "".join(lines[start - 1:end])) for start, end in regions]
@@ -6,6 +6,9 @@ feature branch.
 """
 import os
 from git import Repo, Git
+from controller.src.helper import get_tracked_files
+from controller.src import tracing
+from controller.src.result_store import StoredResult
 import shutil
 import stat
 import time
@@ -24,10 +27,28 @@ class GitHandler:
     _unique_feature_branch_name = ""
     _pr_number = None
     _unique_id = None
+    _tracked_files = None
+    _batch_push = False
+    _push_pending = False
 
     def get_tmp_path(self):
         return self._tmp_path
 
+    @classmethod
+    def get_tracked_files(cls, refresh=False):
+        """
+        Returns the files tracked in the cloned repository.
+
+        The files are listed once with git ls-files and reused by the later 
+        stages. Use refresh=True after operations that add or remove files.
+
+        Returns:
+            set of str: The tracked file paths relative to the repository root.
+        """
+        if cls._tracked_files is None or refresh:
+            cls._tracked_files = get_tracked_files(cls._tmp_path)
+        return cls._tracked_files
+
     def set_credentials(self, email, name):
         self._git.config("--global", "user.email", email)
         self._git.config("--global", "user.name", name)
@@ -68,8 +89,14 @@ class GitHandler:
         cls._token = token
         cls._repo_name = repo_name
         cls._pr_number = pr_number
+        # Nothing of the previous run in this process is carried over
+        cls._repo = None
+        cls._tracked_files = None
+        cls._batch_push = False
+        cls._push_pending = False
 
     @classmethod
+    @tracing.traced("git.clone")
     def clone(cls):
         cls._repo = Repo.clone_from(
             "https://{git_username}:{git_access_token}@{git_base_url}/{owner}/{repo}.git".format(
@@ -85,6 +112,7 @@ class GitHandler:
         cls._unique_feature_branch_name = "optima/" + str(cls._pr_number) + "/" + str(time.time())
         cls._feature_branch = cls._repo.create_head(cls._unique_feature_branch_name)
         cls._repo.git.checkout(cls._feature_branch)
+        cls._tracked_files = None
         print("Creatured feature branch.")
         print("active branch: " + cls._repo.active_branch.name)
 
@@ -106,6 +134,61 @@ class GitHandler:
                     os.chmod(os.path.join(root, file), stat.S_IRWXU)
             shutil.rmtree(cls._tmp_path)
 
+    @classmethod
+    def set_batch_push(cls, batch_push=True):
+        """
+        Enables or disables the commit-batching mode.
+
+        In batching mode commit_and_push only commits locally. The commits of all 
+        agents are pushed together by push() at the end of the run.
+        """
+        cls._batch_push = batch_push
+
+    @classmethod
+    def commit(cls, file_paths, commit_msg):
+        """
+        Adds the files to the staging area and commits them.
+
+        Whether there is anything to commit is checked with the exit code of 
+        "git diff --cached --quiet", without producing the diff.
+
+        Returns:
+            bool: True if a commit was made, False if there were no changes.
+        """
+        if not file_paths:
+            return False
+        with tracing.span("git.commit", files=len(file_paths)) as span:
+            cls._repo.git.add(file_paths)
+
+            status, _, _ = cls._repo.git.diff(
+                "--cached",
+                "--quiet",
+                with_extended_output=True,
+                with_exceptions=False
+                )
+            span.set("committed", status != 0)
+            if status == 0:
+                return False
+            cls._repo.git.commit("-m", commit_msg)
+        return True
+
+    @classmethod
+    def push(cls):
+        """
+        Pushes the active branch, setting the upstream branch.
+
+        In batching mode nothing is pushed if no commit was made since the last push.
+
+        Returns:
+            bool: True if the branch was pushed.
+        """
+        if cls._batch_push and not cls._push_pending:
+            return False
+        with tracing.span("git.push"):
+            cls._repo.git.push("--set-upstream", "origin", cls._repo.active_branch.name)
+        cls._push_pending = False
+        return True
+
     @classmethod
     def commit_and_push(cls, file_paths, commit_msg):
         """
@@ -115,16 +198,18 @@ class GitHandler:
         - Adds the files with the resolved merge conflicts to the staging area.
         - Commits the changes with the commit message generated by the AI model.
         - Pushes the changes to the remote repository, setting the upstream branch to the active branch.
+          In batching mode (see set_batch_push) the push is deferred to push().
+
+        Returns:
+            bool: True if a commit was made.
         """
-        cls._repo.git.add(file_paths)
-        
-        changes = cls._repo.git.diff("--staged")
-        if changes:
-            cls._repo.git.commit("-m", commit_msg)
-            cls._repo.git.push("--set-upstream", "origin", GitHandler._repo.active_branch.name)
-            return True
-        else:
+        if not cls.commit(file_paths, commit_msg):
             return False
+        if cls._batch_push:
+            cls._push_pending = True
+        else:
+            cls.push()
+        return True
 
     @classmethod
     def write_responses(cls, file_paths, responses):
@@ -135,12 +220,20 @@ class GitHandler:
         file in the downstream repository in write mode and writes the corresponding response from the 
         responses list to the file.
 
+        The responses are the file contents or the handles of a result store (see 
+        controller.src.result_store), which are read one at a time.
+
         Note: The method assumes that the order of the file paths in _file_paths matches the order of 
         the responses in responses.
         """
         print("Writing responses to files...")
         print(file_paths)
-        for i, file_path in enumerate(file_paths):
-            with open(os.path.join(cls._tmp_path, file_path), 'w') as file:
-                print("Writing to " + os.path.join(cls._tmp_path, file_path))
-                file.write(responses[i])
\ No newline at end of file
+        with tracing.span("write", files=len(file_paths)) as span:
+            for i, file_path in enumerate(file_paths):
+                response = responses[i]
+                if isinstance(response, StoredResult):
+                    response = response.read()
+                with open(os.path.join(cls._tmp_path, file_path), 'w') as file:
+                    print("Writing to " + os.path.join(cls._tmp_path, file_path))
+                    file.write(response)
+                span.add("bytes", len(response.encode("utf-8")))
\ No newline at end of file
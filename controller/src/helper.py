@@ -1,52 +1,281 @@
 import os
+import re
 import csv
+import logging
+import subprocess
 import requests
 from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from controller.src import tracing
 
-def get_changed_files(
+LOGGER = logging.getLogger(__name__)
+
+# Files whose diff exceeds this many changed lines are not sent to the agents.
+MAX_CHANGED_LINES = int(os.environ.get("MAX_CHANGED_LINES", 2000))
+
+_HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+
+class ChangedFile(NamedTuple):
+    """
+    A file of a pull request as reported by the GitHub pull request files API.
+
+    The API omits the patch for binary files and for diffs that are too large
+    to display, so patch is None in these cases.
+    """
+    filename: str
+    status: str
+    additions: int
+    deletions: int
+    changes: int
+    sha: str
+    patch: Optional[str]
+
+    @classmethod
+    def from_api(cls, entry: dict) -> "ChangedFile":
+        return cls(
+            filename=entry["filename"],
+            status=entry.get("status", "modified"),
+            additions=entry.get("additions", 0),
+            deletions=entry.get("deletions", 0),
+            changes=entry.get("changes", 0),
+            sha=entry.get("sha", ""),
+            patch=entry.get("patch")
+        )
+
+    def is_removed(self) -> bool:
+        return self.status == "removed"
+
+    def is_binary_or_huge(self, max_changes: int = MAX_CHANGED_LINES) -> bool:
+        return self.patch is None or self.changes > max_changes
+
+    def changed_ranges(self) -> List[Tuple[int, int]]:
+        return parse_patch_ranges(self.patch)
+
+
+def get_pr_files(
         token: str,
         git_owner: str,
         git_repo: str,
         pr_number: str
-        ):
+        ) -> List[ChangedFile]:
     """
-    Get a list of files changed in a pull request.
+    Get the files changed in a pull request including the diff metadata.
+
+    The pull request files API is paginated, so all pages are fetched.
 
     Args:
-        base_url (str): The base url of your GitHub API.
         token (str): A GitHub Access Token to access the repo.
+        git_owner (str): The owner of the repository.
+        git_repo (str): The name of the repository.
+        pr_number (str): The number of the pull request.
+
+    Returns:
+        list of ChangedFile: The changed files with status, line counts, sha and patch.
     """
     url = f"https://{os.environ['GIT_BASE_URL']}/api/v3/repos/{git_owner}/{git_repo}/pulls/{pr_number}/files"
     headers = {"Authorization": f"token {token}"}
-    response = requests.get(url, headers=headers)
+    params = {"per_page": 100, "page": 1}
 
-    if response.status_code != 200:
-        raise Exception(f"Failed to fetch changed files: {response.content}")
+    changed_files = []
+    with tracing.span("github.changed_files") as span:
+        while True:
+            response = requests.get(url, headers=headers, params=params)
+            span.add("bytes", len(response.content))
+            span.add("requests", 1)
+            if response.status_code != 200:
+                raise Exception(f"Failed to fetch changed files: {response.content}")
+            files = response.json()
+            changed_files += [ChangedFile.from_api(file) for file in files]
+            if len(files) < params["per_page"]:
+                break
+            params["page"] += 1
+        span.set("files", len(changed_files))
 
-    files = response.json()
-    
     print("Debug: Changed files:")
-    changed_files = [file["filename"] for file in files]
-    print(changed_files)
+    print([(file.filename, file.status) for file in changed_files])
     return changed_files
 
-def not_deleted_files(tmp_path, changed_files):
+def get_changed_files(
+        token: str,
+        git_owner: str,
+        git_repo: str,
+        pr_number: str
+        ):
+    """
+    Get a list of files changed in a pull request.
 
-    # Check the operating system and format the path accordingly
-    if os.name == "nt":  # Windows
-        tmp_path = tmp_path.replace("/", "\\")
-    else:  # Unix/Linux
-        tmp_path = tmp_path.replace("\\", "/")
-    
-    actually_changed_files = []
+    Args:
+        base_url (str): The base url of your GitHub API.
+        token (str): A GitHub Access Token to access the repo.
+    """
+    return [
+        file.filename
+        for file in get_pr_files(token, git_owner, git_repo, pr_number)
+        ]
+
+def filter_changed_files(
+        changed_files: List[ChangedFile],
+        max_changes: int = MAX_CHANGED_LINES
+        ) -> List[ChangedFile]:
+    """
+    Removes the files the agents should not work on, using only the API metadata.
 
+    Removed files are dropped as well as binary files and files with huge diffs 
+    (GitHub sends no patch for them), so none of them is read from disk later.
+
+    Args:
+        changed_files (list of ChangedFile): The files of the pull request.
+        max_changes (int, optional): The maximum number of changed lines per file.
+
+    Returns:
+        list of ChangedFile: The files that should be processed.
+    """
+    kept_files = []
     for file in changed_files:
-        normpath_tmp = os.path.normpath(tmp_path)
-        normpath_file = os.path.normpath(file)
-        os.chdir(normpath_tmp)
-        if os.path.exists(normpath_file):
+        if file.is_removed():
+            continue
+        if file.is_binary_or_huge(max_changes):
+            LOGGER.debug("Skipping binary or huge file %s", file.filename)
+            continue
+        kept_files.append(file)
+    return kept_files
+
+def parse_patch_ranges(patch: Optional[str]) -> List[Tuple[int, int]]:
+    """
+    Extracts the changed line ranges of the new file version from a unified diff.
+
+    Added lines are merged into inclusive (start, end) ranges. A hunk that only 
+    deletes lines yields the line at which the deletion happened.
+
+    Args:
+        patch (str): The patch of a file as returned by the GitHub API.
+
+    Returns:
+        list of tuple: The changed line ranges, sorted by start line.
+    """
+    ranges = []
+    if not patch:
+        return ranges
+
+    line_no = 0
+    in_hunk = False
+    hunk_has_additions = False
+    deletion_line = None
+
+    def close_hunk():
+        if in_hunk and not hunk_has_additions and deletion_line is not None:
+            add_line(max(deletion_line, 1))
+
+    def add_line(number):
+        if ranges and ranges[-1][1] >= number - 1:
+            ranges[-1] = (ranges[-1][0], max(ranges[-1][1], number))
+        else:
+            ranges.append((number, number))
+
+    for line in patch.split("\n"):
+        header = _HUNK_HEADER.match(line)
+        if header:
+            close_hunk()
+            line_no = int(header.group(1))
+            in_hunk = True
+            hunk_has_additions = False
+            deletion_line = None
+        elif not in_hunk:
+            continue
+        elif line.startswith("+"):
+            add_line(line_no)
+            hunk_has_additions = True
+            line_no += 1
+        elif line.startswith("-"):
+            if deletion_line is None:
+                deletion_line = line_no
+        elif line.startswith("\\"):
+            # "\ No newline at end of file"
+            continue
+        else:
+            line_no += 1
+    close_hunk()
+    return sorted(ranges)
+
+def get_changed_ranges(changed_files: List[ChangedFile]) -> Dict[str, List[Tuple[int, int]]]:
+    """
+    Maps the file names of the changed files to their changed line ranges.
+    """
+    return {file.filename: file.changed_ranges() for file in changed_files}
+
+def format_ranges(ranges: List[Tuple[int, int]]) -> str:
+    """
+    Formats line ranges for prompts, e.g. "3-5, 9".
+
+    >>> format_ranges([(3, 5), (9, 9)])
+    '3-5, 9'
+    """
+    return ", ".join(
+        str(start) if start == end else f"{start}-{end}"
+        for start, end in ranges
+        )
+
+def get_tracked_files(tmp_path: str) -> Set[str]:
+    """
+    Lists all files of the checked-out tree with a single git call.
+
+    The paths are relative to the repository root and use forward slashes, just 
+    like the file names of the GitHub API. The working directory of the process 
+    is not changed, so the function is safe to use from concurrent threads.
+
+    Args:
+        tmp_path (str): The path of the local repository.
+
+    Returns:
+        set of str: The tracked file paths.
+    """
+    result = subprocess.run(
+        ["git", "-C", tmp_path, "ls-files", "-z"],
+        capture_output=True,
+        check=True
+        )
+    return set(
+        path for path in result.stdout.decode("utf-8").split("\0") if path
+        )
+
+def not_deleted_files(tmp_path, changed_files, tracked_files=None):
+    """
+    Removes the files that don't exist in the checked-out tree from the changed files.
+
+    Files the GitHub API reports as removed are dropped without looking at the 
+    tree. All other files are checked against the tracked files of the 
+    repository, which are listed with one git call if they are not passed in.
+
+    Args:
+        tmp_path (str): The path of the local repository.
+        changed_files (list of str or ChangedFile): The changed files of the pull request.
+        tracked_files (set of str, optional): The result of get_tracked_files, 
+            if it is already known.
+
+    Returns:
+        list of str: The file names of the changed files that still exist.
+    """
+    if tracked_files is None:
+        try:
+            tracked_files = get_tracked_files(tmp_path)
+        except (OSError, subprocess.CalledProcessError):
+            LOGGER.debug("git ls-files failed, checking the files one by one")
+            tracked_files = None
+
+    actually_changed_files = []
+    for file in changed_files:
+        if isinstance(file, ChangedFile):
+            # The API already tells us which files were removed
+            if file.is_removed():
+                continue
+            file = file.filename
+        if tracked_files is not None:
+            if file.replace("\\", "/") in tracked_files:
+                actually_changed_files.append(file)
+        elif os.path.exists(os.path.join(os.path.abspath(tmp_path), os.path.normpath(file))):
             actually_changed_files.append(file)
-    
+
     return actually_changed_files
 
 def get_pr_branches(username, token, owner, repo, pr_number):
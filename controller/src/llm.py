@@ -0,0 +1,137 @@
+"""
+This module sends prompts to the chat completions API.
+
+The get_completion functions of all agents send their requests through
+complete(), so every request is routed to a deployment by its task (see
+controller.src.routing), and traced with its deployment, latency, sizes and
+token counts in one place, and counted in the metrics of the service (see
+controller.src.metrics).
+"""
+import time
+import logging
+import openai
+from controller.src import tracing
+from controller.src import metrics
+from controller.src import routing
+from controller.src.result_store import estimate_tokens
+
+LOGGER = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = "You are a system designed to improve code quality."
+
+# The errors that hand a request on to the next deployment of its route
+FALLBACK_ERRORS = (openai.RateLimitError, openai.APITimeoutError)
+
+
+def complete(
+        client,
+        prompt: str,
+        model: str,
+        type: str = "json_object",
+        agent: str = None,
+        task: str = None
+        ) -> str:
+    """
+    Sends a prompt to the OpenAI API and returns the AI's response.
+
+    The deployments of the route of the task are tried in order, the next one
+    is only asked if a deployment answers with 429 or times out. The client
+    doesn't retry the deployments that have a fallback.
+
+    Args:
+        client (AzureOpenAI): The client of the calling agent.
+        prompt (str): The user prompt.
+        model (str): The deployment, the last one tried.
+        type (str, optional): The response format, "json_object" or "text".
+        agent (str, optional): The name of the calling agent, recorded in the trace
+            and the metrics.
+        task (str, optional): The task of the request, one of the tasks of
+            controller.src.routing. Without it the request goes to model.
+
+    Returns:
+        str: The content of the response.
+    """
+    messages = [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+    candidates = routing.candidates(task, estimate_tokens(prompt), model)
+    for index, candidate in enumerate(candidates):
+        last = index == len(candidates) - 1
+        options = {}
+        if not last:
+            options["max_retries"] = 0
+        if candidate.timeout is not None:
+            options["timeout"] = candidate.timeout
+        try:
+            return _request(
+                client.with_options(**options) if options else client,
+                messages,
+                candidate,
+                type,
+                agent or ""
+                )
+        except FALLBACK_ERRORS as error:
+            if last:
+                raise
+            reason = "rate_limit" if isinstance(error, openai.RateLimitError) else "timeout"
+            LOGGER.warning(
+                "%s: %s failed (%s), trying %s.",
+                candidate.route,
+                candidate.deployment,
+                reason,
+                candidates[index + 1].deployment
+                )
+            metrics.LLM_FALLBACKS.inc(
+                route=candidate.route,
+                deployment=candidate.deployment,
+                reason=reason
+                )
+
+
+def _request(client, messages, candidate: routing.Candidate, type: str, agent: str) -> str:
+    model = candidate.deployment
+    status = "error"
+    start = time.perf_counter()
+    metrics.LLM_IN_FLIGHT.inc(deployment=model)
+    try:
+        with tracing.span(
+                "llm.completion",
+                agent=agent,
+                model=model,
+                route=candidate.route,
+                response_format=type,
+                prompt_bytes=len(messages[-1]["content"].encode("utf-8"))
+                ) as span:
+            response = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0, # this is the degree of randomness of the model"s output,
+                response_format={"type": type}
+            )
+            content = response.choices[0].message.content
+            span.set("response_bytes", len((content or "").encode("utf-8")))
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                span.set("prompt_tokens", usage.prompt_tokens)
+                span.set("completion_tokens", usage.completion_tokens)
+                metrics.LLM_PROMPT_TOKENS.inc(usage.prompt_tokens, deployment=model, agent=agent)
+                metrics.LLM_COMPLETION_TOKENS.inc(
+                    usage.completion_tokens,
+                    deployment=model,
+                    agent=agent
+                    )
+        status = "ok"
+    finally:
+        duration = time.perf_counter() - start
+        metrics.LLM_IN_FLIGHT.dec(deployment=model)
+        metrics.LLM_LATENCY.observe(duration, deployment=model, agent=agent)
+        metrics.LLM_ROUTE_LATENCY.observe(duration, route=candidate.route, deployment=model)
+        metrics.LLM_REQUESTS.inc(deployment=model, agent=agent, status=status)
+    return content
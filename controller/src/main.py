@@ -1,7 +1,19 @@
 import os
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from controller.src.git_handler import GitHandler
-from controller.src.helper import not_deleted_files, get_changed_files, get_pr_branches
+from controller.src.pipeline import Pipeline
+from controller.src import tracing
+from controller.src import metrics
+from controller.src.result_store import ResultStore
+from controller.src.helper import (
+    not_deleted_files,
+    get_pr_files,
+    filter_changed_files,
+    get_changed_ranges,
+    get_pr_branches
+)
 from merge_agent.src.merge_git_handler import MergeGitHandler
 from pull_request_agent.src.pr_git_handler import PRGitHandler
 from merge_agent.src.merge_agent import MergeAgent
@@ -11,170 +23,370 @@ from pull_request_agent.src.pr_agent import PRAgent
 LOGGER = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG)
 
+# Language groups of the Code Quality Agent. They touch disjoint files, so they
+# run concurrently and are committed in this order.
+# Python files are formatted with black first, then the AI model reviews every
+# one of them together with the remaining findings.
+LINT_LANGUAGES = ["java", "python", "other"]
+# The deployment for the commit messages, usually a cheaper one than the text
+# deployment, which is used if it isn't set
+COMMIT_DEPLOYMENT = os.environ.get("COMMIT_DEPLOYMENT")
+
+def split_by_language(file_list):
+    """
+    Splits the file list into the language groups of LINT_LANGUAGES.
+    """
+    return {
+        "java": [file for file in file_list if file.endswith(".java")],
+        "python": [file for file in file_list if file.endswith(".py")],
+        "other": [file for file in file_list if not file.endswith((".java", ".py"))],
+    }
+
+def run_lint_pass(
+        language: str,
+        file_list: list,
+        directory: str,
+        json_deployment: str,
+        text_deployment: str,
+        changed_ranges: dict,
+        cache_name: str,
+        pr_gi: PRGitHandler,
+        index: float,
+        increment: float,
+        result_store: ResultStore = None
+        ) -> LintAgent:
+    """
+    Runs one language group of the Code Quality Agent up to the commit.
+
+    Formatting, linting, prompting and creating the commit message happen here,
+    so several groups can run concurrently. The formatters change the files in
+    place, writing the AI model's changes and committing is left to the caller
+    (see commit_lint_passes), which keeps the order of the commits
+    deterministic.
+
+    Returns:
+        LintAgent: The agent with the improved code and the commit message.
+    """
+    lag = LintAgent(
+        file_list=file_list,
+        directory=directory,
+        language=language,
+        json_model=json_deployment,
+        text_model=text_deployment,
+        changed_ranges=changed_ranges,
+        cache_name=cache_name,
+        result_store=result_store,
+        commit_model=COMMIT_DEPLOYMENT
+        )
+    LOGGER.debug("Applying formatter fixes to %s code...", language)
+    lag.apply_local_fixes()
+    LOGGER.debug("Improving %s code...", language)
+    lag.improve_code(pr_gi, index, increment)
+    LOGGER.debug(lag)
+    if lag.improved_source_code or lag.fixed_files:
+        lag.make_commit_msg()
+    return lag
+
+def run_lint_passes(file_list: list, index: float, increment: float, **kwargs) -> list:
+    """
+    Runs the language groups of LINT_LANGUAGES concurrently.
+
+    Args:
+        file_list (list of str): The files to improve.
+        index (float): The progress in percent when the passes start.
+        increment (float): The progress in percent per file.
+        **kwargs: Passed on to run_lint_pass.
+
+    Returns:
+        list of LintAgent: The agents in the order of LINT_LANGUAGES.
+    """
+    groups = split_by_language(file_list)
+    with ThreadPoolExecutor(max_workers=len(LINT_LANGUAGES)) as executor:
+        futures = []
+        for language in LINT_LANGUAGES:
+            futures.append(
+                executor.submit(
+                    tracing.wrap(run_lint_pass),
+                    language=language,
+                    file_list=groups[language],
+                    index=index,
+                    increment=increment,
+                    **kwargs
+                    )
+                )
+            index += len(groups[language]) * increment
+        return [future.result() for future in futures]
+
+def commit_lint_passes(gi: GitHandler, lint_agents: list) -> bool:
+    """
+    Writes the changes of the lint passes and commits them one after another.
+
+    Returns:
+        bool: True if at least one commit was made.
+    """
+    committed = False
+    for lag in lint_agents:
+        if not lag.improved_source_code and not lag.fixed_files:
+            continue
+        LOGGER.debug("Writing changes...")
+        lag.write_changes()
+        LOGGER.debug("Committing changes...")
+        LOGGER.debug("File paths:\n" + str(lag.get_file_paths()))
+        LOGGER.debug("Commit message:\n" + lag.get_commit_msg())
+        committed = gi.commit_and_push(lag.get_file_paths(), lag.get_commit_msg()) or committed
+    return committed
+
 def main(
         json_deployment: str,
         text_deployment: str,
         git_repo: str,
         pr_number: str
         ):
-    """ Set up the local git repository """
+    """
+    Runs the agents for a pull request.
+
+    The run is a pipeline of stages (see controller.src.pipeline). Cloning and
+    fetching the changed files run concurrently. Afterwards the merge agent and
+    the linting of all files the merge doesn't touch run concurrently. Only the
+    files the merge touches are linted after the merge is committed. The
+    commits are made in the order merge, lint, lint of merged files and are
+    pushed together at the end.
+
+    The whole run is traced as one trace (see controller.src.tracing) and
+    counted in the metrics of the service (see controller.src.metrics). The 
+    files the agents rewrite are kept in a result store (see 
+    controller.src.result_store) that is removed at the end of the run.
+    """
+    metrics.RUNS_IN_PROGRESS.inc()
+    start = time.perf_counter()
+    result_store = ResultStore()
+    try:
+        with tracing.span("webhook", repo=git_repo, pr_number=str(pr_number)):
+            _main(json_deployment, text_deployment, git_repo, pr_number, result_store)
+    finally:
+        result_store.clean_up()
+        metrics.RUNS_IN_PROGRESS.dec()
+        metrics.RUN_DURATION.observe(time.perf_counter() - start)
+
+def _main(
+        json_deployment: str,
+        text_deployment: str,
+        git_repo: str,
+        pr_number: str,
+        result_store: ResultStore
+        ):
 
     # Arguments
     git_user = os.environ["GIT_USERNAME"]
     token = os.environ["GIT_ACCESS_TOKEN"]
     owner = "GCDM"
     repo = git_repo
-    source_branch, target_branch = get_pr_branches(
-        git_user,
-        token,
-        owner,
-        git_repo,
-        pr_number
-        )
-    file_list = get_changed_files(
-        token=token,
-        git_owner=owner,
-        git_repo=repo,
-        pr_number=pr_number
-        )
 
-    # Initializing PRGitHandler
     pr_gi = PRGitHandler(pr_number)
     gi = GitHandler()
-    gi.initialize(
-        source_branch,
-        target_branch,
-        git_user,
-        owner,
-        token,
-        repo,
-        pr_number
-        )
-    gi.set_credentials(
-        email="optima-coding-mentor@bmw.de",
-        name="Optima Coding Mentor"
-    )
-    gi.clean_up()
-    gi.clone()
-    pr_gi.create_progress_bar(
-        percentage=0,
-        status="Processing webhook information."
-        )
-    
-    updated_file_list = not_deleted_files(gi.get_tmp_path(), file_list)
 
     """ Initialize with the Pull Request Agent """
     pr_agent = PRAgent(json_model=json_deployment, text_model=text_deployment)
 
-    """ Interaction with the Merge Agent"""
-    try:
+    def fetch_changed_files():
+        # Removed, binary and huge files are dropped based on the API metadata
+        return filter_changed_files(
+            get_pr_files(
+                token=token,
+                git_owner=owner,
+                git_repo=repo,
+                pr_number=pr_number
+                )
+            )
+
+    def clone():
+        """ Set up the local git repository """
+        source_branch, target_branch = get_pr_branches(
+            git_user,
+            token,
+            owner,
+            git_repo,
+            pr_number
+            )
+        gi.initialize(
+            source_branch,
+            target_branch,
+            git_user,
+            owner,
+            token,
+            repo,
+            pr_number
+            )
+        gi.set_credentials(
+            email="optima-coding-mentor@bmw.de",
+            name="Optima Coding Mentor"
+        )
+        gi.clean_up()
+        gi.clone()
+        # Every agent commits locally, the branch is pushed once at the end
+        gi.set_batch_push(True)
+        pr_gi.create_progress_bar(
+            percentage=0,
+            status="Processing webhook information."
+            )
+
+    def select_files(_, changed_files):
+        return not_deleted_files(
+            gi.get_tmp_path(),
+            changed_files,
+            gi.get_tracked_files()
+            )
+
+    def detect_incoming_files(_):
+        # Files the merge of the target branch will change, read without merging
+        return set(MergeGitHandler.get_incoming_filepaths())
+
+    def solve_merge_conflicts(_):
+        """ Interaction with the Merge Agent"""
         pr_gi.create_progress_bar(
             percentage=10,
             status="Checking for merge conflicts."
             )
-    except:
-        pr_agent.report_error("Pull Request Agent failed creating progress bar.")
-    
-    try:
         mgh = MergeGitHandler()
-        mag = MergeAgent(gi._repo, json_model=json_deployment, text_model=text_deployment)
+        mag = MergeAgent(
+            gi._repo,
+            json_model=json_deployment,
+            text_model=text_deployment,
+            result_store=result_store,
+            commit_model=COMMIT_DEPLOYMENT
+            )
 
         LOGGER.debug("Initialized GitHandler and Agents")
         for i, file_path in enumerate(mgh.get_unmerged_filepaths()):
             file_content = mgh.get_f_content(i)
             mag.make_prompt(file_path, file_content)
-            LOGGER.debug("Ai is solving the merge conflict in %s...", mgh.get_unmerged_filepaths()[i])
-            resp = mag.solve_merge_conflict()
+            LOGGER.debug("Ai is solving the merge conflict in %s...", file_path)
+            mag.solve_merge_conflict()
+        return mag
 
+    def commit_merge(mag):
+        if not mag.get_file_paths():
+            return False
         LOGGER.debug("Committing changes...")
         gi.write_responses(mag.get_file_paths(), mag.get_responses())
         mag.make_commit_msg()
-        merge_commit_and_push = gi.commit_and_push(mag.get_file_paths(), mag.get_commit_msg())
-    except:
+        return gi.commit_and_push(mag.get_file_paths(), mag.get_commit_msg())
+
+    def lint_options(changed_files, file_list):
+        # Kennzahlen, um den Progress zu berechnen; LintAgent Progress in {x | 0.2 <= x <= 0.9}
+        return {
+            "directory": gi.get_tmp_path(),
+            "json_deployment": json_deployment,
+            "text_deployment": text_deployment,
+            "changed_ranges": get_changed_ranges(changed_files),
+            "cache_name": repo,
+            "pr_gi": pr_gi,
+            "increment": 70.0 / max(len(file_list), 1),
+            "result_store": result_store,
+        }
+
+    def lint_untouched_files(changed_files, file_list):
+        """ Interaction with the Code Quality Agent """
+        LOGGER.debug("Interaction with the Code Quality Agent...")
+        # Without the incoming files every file counts as untouched
+        incoming_files = pipeline.result("incoming_files", set())
+        untouched_files = [file for file in file_list if file not in incoming_files]
+        return run_lint_passes(
+            untouched_files,
+            index=20,
+            **lint_options(changed_files, file_list)
+            )
+
+    def lint_merged_files(changed_files, file_list):
+        incoming_files = pipeline.result("incoming_files", set())
+        merged_files = [file for file in file_list if file in incoming_files]
+        if not merged_files:
+            return []
+        # The ranges of the pull request don't match the merged files, so they
+        # are formatted and linted as a whole
+        options = {**lint_options(changed_files, file_list), "changed_ranges": None}
+        return run_lint_passes(
+            merged_files,
+            index=20 + (len(file_list) - len(merged_files)) * options["increment"],
+            **options
+            )
+
+    pipeline = Pipeline()
+    pipeline.add("changed_files", fetch_changed_files)
+    pipeline.add("clone", clone)
+    pipeline.add("file_list", select_files, depends_on=("clone", "changed_files"))
+    pipeline.add("incoming_files", detect_incoming_files, depends_on=("clone",))
+    pipeline.add("merge", solve_merge_conflicts, depends_on=("incoming_files",))
+    pipeline.add("commit_merge", commit_merge, depends_on=("merge",))
+    pipeline.add(
+        "lint",
+        lint_untouched_files,
+        depends_on=("changed_files", "file_list"),
+        after=("incoming_files",)
+        )
+    pipeline.add(
+        "commit_lint",
+        lambda lint_agents: commit_lint_passes(gi, lint_agents),
+        depends_on=("lint",),
+        after=("commit_merge",)
+        )
+    pipeline.add(
+        "lint_merged",
+        lint_merged_files,
+        depends_on=("changed_files", "file_list"),
+        after=("incoming_files", "commit_merge")
+        )
+    pipeline.add(
+        "commit_lint_merged",
+        lambda lint_agents: commit_lint_passes(gi, lint_agents),
+        depends_on=("lint_merged",),
+        after=("commit_lint",)
+        )
+    # Without a fresh clone the git handler still holds the previous run's repository
+    pipeline.add(
+        "push",
+        lambda _: gi.push(),
+        depends_on=("clone",),
+        after=("commit_lint_merged",)
+        )
+    pipeline.run()
+
+    if not pipeline.succeeded("clone"):
+        pr_agent.report_error("Failed to set up the local git repository.")
+        return
+
+    merge_commit_and_push = pipeline.result("commit_merge", False)
+    if pipeline.failed("merge") or pipeline.failed("commit_merge"):
         pr_agent.report_error("Merge Agent failed to solve merge conflicts.")
-        merge_commit_and_push = False
+
+    lint_agents = pipeline.result("lint", []) + pipeline.result("lint_merged", [])
+    lint_commit_and_push = pipeline.result("commit_lint", False) \
+        or pipeline.result("commit_lint_merged", False)
+    if any(
+            pipeline.failed(stage)
+            for stage in ["lint", "commit_lint", "lint_merged", "commit_lint_merged"]
+            ):
+        pr_agent.report_error("Code Quality Agent failed to improve code.")
+
+    if pipeline.failed("push"):
+        # The summary would describe changes that never reached the remote
+        pr_agent.report_error("Failed to push the changes.")
+        return
 
     try:
         """ Update the Pull Request Agent's memory """
         if merge_commit_and_push:
+            mag = pipeline.result("merge")
             pr_agent.set_memory(
                 "merge_agent",
                 mag.get_file_paths(),
                 mag.get_responses(),
                 mag.get_commit_msg()
             )
-    except:
+    except Exception:
+        LOGGER.exception("Updating the memory failed.")
         pr_agent.report_error("Pull Request Agent failed to update memory.")
 
-    try:
-        """ Interaction with the Code Quality Agent """
-        other_file_list = [file for file in updated_file_list if ".java" not in file]
-        # Kennzahlen, um den Progress zu berechnen; LintAgent Progress in {x | 0.2 <= x <= 0.9}
-        progress_increment_per_file = 70.0 / len(updated_file_list)
-        quant_java_files =  len(updated_file_list) - len(other_file_list)
-
-        LOGGER.debug("Interaction with the Code Quality Agent...")
-        ja_lag = LintAgent(
-            file_list= updated_file_list,
-            directory=gi.get_tmp_path(),
-            language="java",
-            json_model=json_deployment,
-            text_model=text_deployment
-            )
-
-        LOGGER.debug("Improving Java code...")
-        ja_lag.improve_code(pr_gi, 20, progress_increment_per_file)
-        LOGGER.debug("Writing changes...")
-        ja_lag.write_changes()
-        print(ja_lag)
-
-        LOGGER.debug("Committing changes...")
-        ja_lag.make_commit_msg()
-        LOGGER.debug("File paths:\n" + str(ja_lag.get_file_paths()))
-        LOGGER.debug("Commit message:\n" + ja_lag.get_commit_msg())
-        lint_commit_and_push = gi.commit_and_push(ja_lag.get_file_paths(), ja_lag.get_commit_msg())
-
-        """
-        py_lag = LintAgent(
-            file_list= updated_file_list,
-            directory=gi.get_tmp_path(),
-            language="python"
-            )
-        LOGGER.debug("Improving Python code...")
-        py_lag.improve_code()
-        LOGGER.debug("Writing changes...")
-        py_lag.write_changes()
-        print(py_lag)
-        """
-
-        other_lag = LintAgent(
-            file_list= other_file_list,
-            directory=gi.get_tmp_path(),
-            language="other",
-            json_model=json_deployment,
-            text_model=text_deployment
-            ) 
-
-        LOGGER.debug("Improving other code...")
-        other_lag.improve_code(
-            pr_gi,
-            quant_java_files * progress_increment_per_file + 20,
-            progress_increment_per_file
-            )
-        
-        LOGGER.debug("Writing changes...")
-        other_lag.write_changes()
-        print(other_lag)
-
-        LOGGER.debug("Committing changes...")
-        other_lag.make_commit_msg()
-        LOGGER.debug("File paths:\n" + str(other_lag.get_file_paths()))
-        LOGGER.debug("Commit message:\n" + other_lag.get_commit_msg())
-        lint_commit_and_push = lint_commit_and_push or gi.commit_and_push(other_lag.get_file_paths(), other_lag.get_commit_msg())
-    except:
-        pr_agent.report_error("Code Quality Agent failed to improve code.")
-        lint_commit_and_push = False
-
     pr_gi.create_progress_bar(
         percentage=90,
         status="Updating the pull request comment."
@@ -186,12 +398,14 @@ def main(
         if lint_commit_and_push:
             pr_agent.set_memory(
                 "cq_agent",
-                ja_lag.get_file_paths(),
-                ja_lag.get_responses() +  other_lag.get_responses(),
-                ja_lag.get_commit_msg() +  other_lag.get_commit_msg()
+                [path for lag in lint_agents for path in lag.get_file_paths()],
+                [result for lag in lint_agents for result in lag.get_results()],
+                "\n".join(lag.get_commit_msg() for lag in lint_agents if lag.get_commit_msg()),
+                [path for lag in lint_agents for path in lag.fixed_files]
             )
         LOGGER.debug(pr_agent)
-    except:
+    except Exception:
+        LOGGER.exception("Updating the memory failed.")
         pr_agent.report_error("Pull Request Agent failed to update memory.")
 
     try:
@@ -202,8 +416,9 @@ def main(
 
         LOGGER.debug("Updating pull request...")
         pr_gi.comment_pull_request(pr_agent.get_summary())
-    except:
+    except Exception:
+        LOGGER.exception("Updating the pull request failed.")
         pr_agent.report_error("Pull Request Agent failed to update pull request.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,194 @@
+"""
+This module provides the metrics of the service in the Prometheus text format.
+
+The metrics are kept in memory of the process that runs the Flask app and the
+webhook threads, and are served by the /metrics endpoint (see
+controller.src.api.metrics). Counters, gauges and histograms with labels are
+implemented here, so no Prometheus client library is needed.
+"""
+import math
+import threading
+from typing import Dict, List, Tuple
+
+_lock = threading.Lock()
+_registry: List["_Metric"] = []
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        with _lock:
+            _registry.append(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects the labels {self.labels}")
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = [
+            '{}="{}"'.format(
+                label,
+                value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+                )
+            for label, value in pairs
+            ]
+        return "{" + ",".join(escaped) + "}"
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        with _lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines += self._render_value(key, value)
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{self._format_labels(key)} {_format_number(value)}"]
+
+
+class Counter(_Metric):
+    """
+    A value that only goes up, e.g. the number of requests.
+    """
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    """
+    A value that goes up and down, e.g. the number of runs in progress.
+    """
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """
+    The distribution of observed values, e.g. request durations, in cumulative buckets.
+    """
+    type = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=(1, 5, 10, 30, 60, 120, 300, 600)):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            counts = [
+                count + (1 if value <= bound else 0)
+                for count, bound in zip(counts, self.buckets)
+                ]
+            self._values[key] = (counts, total + value)
+
+    def _render_value(self, key, value):
+        counts, total = value
+        lines = []
+        for count, bound in zip(counts, self.buckets):
+            le = "+Inf" if bound == math.inf else _format_number(bound)
+            lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', le)])} {count}")
+        lines.append(f"{self.name}_sum{self._format_labels(key)} {_format_number(total)}")
+        lines.append(f"{self.name}_count{self._format_labels(key)} {counts[-1]}")
+        return lines
+
+
+def _format_number(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def render() -> str:
+    """
+    Returns all metrics in the Prometheus text exposition format.
+    """
+    with _lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+LLM_LATENCY = Histogram(
+    "llm_completion_duration_seconds",
+    "Duration of the chat completion requests.",
+    ("deployment", "agent"),
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600)
+)
+LLM_REQUESTS = Counter(
+    "llm_completions_total",
+    "Number of chat completion requests by result.",
+    ("deployment", "agent", "status")
+)
+LLM_ROUTE_LATENCY = Histogram(
+    "llm_route_duration_seconds",
+    "Duration of the chat completion requests by route (see controller.src.routing).",
+    ("route", "deployment"),
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600)
+)
+LLM_FALLBACKS = Counter(
+    "llm_fallbacks_total",
+    "Number of requests handed on to the next deployment of their route.",
+    ("route", "deployment", "reason")
+)
+LLM_PROMPT_TOKENS = Counter(
+    "llm_prompt_tokens_total",
+    "Number of prompt tokens sent.",
+    ("deployment", "agent")
+)
+LLM_COMPLETION_TOKENS = Counter(
+    "llm_completion_tokens_total",
+    "Number of completion tokens received.",
+    ("deployment", "agent")
+)
+LLM_IN_FLIGHT = Gauge(
+    "llm_requests_in_flight",
+    "Number of chat completion requests waiting for a response.",
+    ("deployment",)
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "Number of cache lookups by agent and result (hit or miss).",
+    ("agent", "result")
+)
+RUNS_QUEUED = Gauge(
+    "webhook_runs_queued",
+    "Number of accepted webhook runs that haven't started yet."
+)
+RUNS_IN_PROGRESS = Gauge(
+    "webhook_runs_in_progress",
+    "Number of webhook runs in progress."
+)
+RUN_DURATION = Histogram(
+    "webhook_run_duration_seconds",
+    "Duration of the webhook runs.",
+    buckets=(30, 60, 120, 300, 600, 900, 1200, 1800, 3600)
+)
@@ -0,0 +1,120 @@
+"""
+This module provides the Pipeline class for running the stages of a webhook run.
+
+A stage is a function with a name. It starts as soon as the stages it depends on
+are done, so independent stages (e.g. cloning and fetching the changed files)
+run concurrently. The results of the stages a stage depends on are passed to
+its function as positional arguments. Every stage runs in a tracing span
+named "stage.<name>", a child of the span that is active when run() is called.
+"""
+import logging
+from controller.src import tracing
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+LOGGER = logging.getLogger(__name__)
+
+
+class SkippedStage(Exception):
+    """
+    Stored as the error of a stage that didn't run because a stage it depends on failed.
+    """
+
+
+class Pipeline:
+    """
+    A directed acyclic graph of stages that are run by a thread pool.
+
+    Stages can depend on other stages in two ways:
+    - depends_on: The stage needs the results of these stages. If one of them
+      fails, the stage is skipped.
+    - after: The stage only has to run after these stages, whether they
+      succeeded or not. This is used to keep the order of git commits.
+
+    Since a stage can only depend on stages that were added before, the graph
+    has no cycles.
+    """
+    def __init__(self, max_workers: int = 8) -> None:
+        self._max_workers = max_workers
+        self._stages = {}
+        self._results = {}
+        self._errors = {}
+
+    def add(self, name: str, func, depends_on=(), after=()) -> None:
+        """
+        Adds a stage to the pipeline.
+
+        Args:
+            name (str): The unique name of the stage.
+            func (callable): Called with the results of depends_on as arguments.
+            depends_on (tuple of str, optional): The stages whose results are needed.
+            after (tuple of str, optional): The stages that must be finished first.
+        """
+        if name in self._stages:
+            raise ValueError(f"Stage {name} already exists.")
+        for dependency in tuple(depends_on) + tuple(after):
+            if dependency not in self._stages:
+                raise ValueError(f"Stage {name} depends on unknown stage {dependency}.")
+        self._stages[name] = (func, tuple(depends_on), tuple(after))
+
+    def run(self) -> dict:
+        """
+        Runs all stages and waits until they are finished.
+
+        Exceptions of a stage are logged and stored, they don't stop the
+        stages that don't depend on the failed stage.
+
+        Returns:
+            dict: The results of the successful stages by name.
+        """
+        pending = dict(self._stages)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            while pending or running:
+                self._start_ready_stages(executor, pending, running)
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self._results[name] = future.result()
+                    except Exception as e:
+                        LOGGER.exception("Stage %s failed.", name)
+                        self._errors[name] = e
+        return self._results
+
+    def _start_ready_stages(self, executor, pending, running):
+        running_names = set(running.values())
+        for name, (func, depends_on, after) in list(pending.items()):
+            if any(
+                    stage in pending or stage in running_names
+                    for stage in depends_on + after
+                    ):
+                continue
+            del pending[name]
+            failed = [stage for stage in depends_on if stage in self._errors]
+            if failed:
+                LOGGER.debug("Skipping stage %s, %s failed.", name, ", ".join(failed))
+                self._errors[name] = SkippedStage(", ".join(failed))
+                continue
+            arguments = [self._results[stage] for stage in depends_on]
+            future = executor.submit(tracing.wrap(self._run_stage), name, func, arguments)
+            running[future] = name
+            running_names.add(name)
+
+    @staticmethod
+    def _run_stage(name, func, arguments):
+        with tracing.span("stage." + name):
+            return func(*arguments)
+
+    def result(self, name: str, default=None):
+        return self._results.get(name, default)
+
+    def failed(self, name: str) -> bool:
+        """
+        Checks whether a stage raised an exception. Skipped stages don't count.
+        """
+        return name in self._errors and not isinstance(self._errors[name], SkippedStage)
+
+    def succeeded(self, name: str) -> bool:
+        return name in self._results
@@ -0,0 +1,225 @@
+"""
+This module keeps the files rewritten by the agents on disk instead of in memory.
+
+The agents put every rewritten file into a ResultStore, which writes the new
+content and its diff to the store's directory and returns a StoredResult: a
+handle with the file path, the explanation of the AI model and the diff
+statistics. Only the handles are kept in the agents' state, the content is read
+back when the file is written to the clone.
+
+The Pull Request Agent works from digest(), a summary of the handles with as
+many diffs as fit into a token budget, instead of the full files.
+"""
+import os
+import shutil
+import difflib
+import tempfile
+import threading
+from typing import List, NamedTuple, Optional
+
+# The stores of the runs live next to the temporary clones
+RESULT_STORE_DIR = os.environ.get(
+    "RESULT_STORE_DIR",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        ".tmp",
+        "results"
+        )
+    )
+# Maximum length of the explanation kept in a handle
+MAX_EXPLANATION_CHARS = 1000
+# Maximum length of an explanation in a commit message prompt
+COMMIT_EXPLANATION_CHARS = 200
+# The file extensions of languages in which whitespace has no meaning
+FREE_FORM_EXTENSIONS = (".java",)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of tokens of a text, about 4 characters per token.
+
+    >>> estimate_tokens("a" * 40)
+    10
+    """
+    return (len(text) + 3) // 4
+
+
+class StoredResult(NamedTuple):
+    """
+    The handle of a rewritten file in a ResultStore.
+    """
+    path: str
+    content_file: str
+    diff_file: Optional[str]
+    explanation: str
+    size: int
+    additions: int
+    deletions: int
+
+    def read(self) -> str:
+        """
+        Returns the rewritten content.
+        """
+        with open(self.content_file, "r", encoding="utf-8") as file:
+            return file.read()
+
+    def diff(self) -> str:
+        """
+        Returns the unified diff to the original content, empty if it is unknown.
+        """
+        if self.diff_file is None:
+            return ""
+        with open(self.diff_file, "r", encoding="utf-8") as file:
+            return file.read()
+
+    def summary(self, max_explanation_chars: Optional[int] = None) -> str:
+        """
+        Returns a one-line description of the change.
+
+        Args:
+            max_explanation_chars (int, optional): Cuts the explanation off
+                after this many characters.
+
+        >>> StoredResult("a.py", "1.txt", "1.diff", "Renamed x.", 10, 2, 1).summary()
+        'a.py (+2 -1): Renamed x.'
+        >>> StoredResult("a.py", "1.txt", "1.diff", "Renamed x.", 10, 2, 1).summary(7)
+        'a.py (+2 -1): Renamed ...'
+        """
+        line = f"{self.path} (+{self.additions} -{self.deletions})"
+        explanation = " ".join(self.explanation.split())
+        if max_explanation_chars is not None and len(explanation) > max_explanation_chars:
+            explanation = explanation[:max_explanation_chars].rstrip() + " ..."
+        return f"{line}: {explanation}" if explanation else line
+
+    def formatting_only(self) -> bool:
+        """
+        Returns whether the change only touches whitespace, False if the diff
+        is unknown.
+
+        Only in the languages of FREE_FORM_EXTENSIONS all whitespace is
+        insignificant. In other files, e.g. Python, the indentation and the
+        line breaks have to stay the same, only trailing whitespace may change.
+        """
+        if self.diff_file is None:
+            return False
+        removed, added = [], []
+        for line in self.diff().splitlines()[2:]:
+            if line.startswith("-"):
+                removed.append(line[1:])
+            elif line.startswith("+"):
+                added.append(line[1:])
+        if self.path.endswith(FREE_FORM_EXTENSIONS):
+            return "".join("".join(removed).split()) == "".join("".join(added).split())
+        return [line.rstrip() for line in removed] == [line.rstrip() for line in added]
+
+
+class ResultStore:
+    """
+    A directory with the rewritten files of one run.
+
+    Args:
+        directory (str, optional): The parent directory of the store. Defaults
+            to RESULT_STORE_DIR.
+    """
+    def __init__(self, directory: str = None) -> None:
+        parent = directory or RESULT_STORE_DIR
+        os.makedirs(parent, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix="run-", dir=parent)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def put(
+            self,
+            path: str,
+            content: str,
+            original: Optional[str] = None,
+            explanation: str = ""
+            ) -> StoredResult:
+        """
+        Writes a rewritten file and its diff to the store.
+
+        Args:
+            path (str): The path of the file the content belongs to.
+            content (str): The rewritten content.
+            original (str, optional): The content before the rewrite. Without
+                it no diff is stored.
+            explanation (str, optional): The explanation of the change.
+
+        Returns:
+            StoredResult: The handle of the stored content.
+        """
+        with self._lock:
+            self._count += 1
+            name = os.path.join(self.directory, str(self._count))
+        with open(name + ".txt", "w", encoding="utf-8") as file:
+            file.write(content)
+
+        diff_file, additions, deletions = None, 0, 0
+        if original is not None:
+            diff = list(difflib.unified_diff(
+                original.splitlines(keepends=True),
+                content.splitlines(keepends=True),
+                fromfile="a/" + path,
+                tofile="b/" + path
+                ))
+            for line in diff[2:]:
+                if line.startswith("+"):
+                    additions += 1
+                elif line.startswith("-"):
+                    deletions += 1
+            diff_file = name + ".diff"
+            with open(diff_file, "w", encoding="utf-8") as file:
+                file.writelines(line if line.endswith("\n") else line + "\n" for line in diff)
+
+        return StoredResult(
+            path=path,
+            content_file=name + ".txt",
+            diff_file=diff_file,
+            explanation=(explanation or "")[:MAX_EXPLANATION_CHARS],
+            size=len(content.encode("utf-8")),
+            additions=additions,
+            deletions=deletions
+        )
+
+    def clean_up(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def digest(results: List[StoredResult], max_tokens: int) -> str:
+    """
+    Describes the changes of several files within a token budget.
+
+    The summaries of all files come first, then the diffs in the order of the
+    results, as long as they fit into the budget. The last diff that doesn't
+    fit is cut off.
+
+    Args:
+        results (list of StoredResult): The changed files.
+        max_tokens (int): The token budget of the digest.
+
+    Returns:
+        str: The digest.
+    """
+    lines, used = [], 0
+    for index, result in enumerate(results):
+        line = "- " + result.summary()
+        if used + estimate_tokens(line) > max_tokens:
+            lines.append(f"- ... and {len(results) - index} more files")
+            return "\n".join(lines)
+        lines.append(line)
+        used += estimate_tokens(line) + 1
+
+    sections = ["\n".join(lines)]
+    for index, result in enumerate(results):
+        diff = result.diff()
+        if not diff:
+            continue
+        remaining = (max_tokens - used) * 4
+        if remaining < 200:
+            sections.append(f"(The diffs of {len(results) - index} more files are left out.)")
+            break
+        if len(diff) > remaining:
+            diff = diff[:remaining].rsplit("\n", 1)[0] + "\n... (cut off)\n"
+        sections.append(diff)
+        used += estimate_tokens(diff) + 1
+    return "\n\n".join(sections)
@@ -0,0 +1,138 @@
+"""
+This module routes the requests of the agents to deployments by task.
+
+Every request names its task (see the constants below), and the routes of
+MODEL_ROUTES pick its deployments by the task and the estimated size of the
+prompt. Short requests like commit messages can then go to a cheaper, faster
+deployment and don't queue behind the rewrites of whole files. MODEL_ROUTES is
+a JSON list of routes, or the path of a JSON file with the list:
+
+    [
+        {"task": "commit_message", "deployments": ["gpt-35-turbo"], "timeout": 20},
+        {"task": "rewrite", "max_tokens": 2000, "deployments": ["gpt-4o-mini"]},
+        {"task": "*", "deployments": ["gpt-4o", "gpt-4o-eu"], "timeout": 120}
+    ]
+
+The first route whose task matches and whose max_tokens isn't exceeded by the
+prompt is used. Its deployments are tried in order, followed by the deployment
+the agent asked for: a deployment that answers with 429 or times out hands the
+request on to the next one (see controller.src.llm.complete). Requests without
+a matching route go to the deployment the agent asked for.
+"""
+import os
+import json
+from typing import List, NamedTuple, Optional
+
+# The tasks of the requests
+COMMIT_MESSAGE = "commit_message"
+TITLE = "title"
+SUMMARY = "summary"
+FORMATTING_FIX = "formatting_fix"
+MERGE_HUNK = "merge_hunk"
+EDIT = "edit"
+REWRITE = "rewrite"
+DOCSTRINGS = "docstrings"
+
+# The route of the requests without a task or a matching route
+DEFAULT_ROUTE = "default"
+
+
+class Route(NamedTuple):
+    """
+    A rule that sends the requests of a task to a list of deployments.
+
+    task is "*" for all tasks, max_tokens limits the route to prompts up to
+    that estimated size, timeout (in seconds) applies to the deployments of
+    the route but not to the fallback to the agent's deployment.
+    """
+    name: str
+    task: str
+    deployments: List[str]
+    max_tokens: Optional[int] = None
+    timeout: Optional[float] = None
+
+    def matches(self, task: Optional[str], prompt_tokens: int) -> bool:
+        """
+        >>> Route("small", "*", ["a"], max_tokens=100).matches("rewrite", 50)
+        True
+        >>> Route("small", "title", ["a"], max_tokens=100).matches("rewrite", 50)
+        False
+        """
+        if self.task != "*" and self.task != task:
+            return False
+        return self.max_tokens is None or prompt_tokens <= self.max_tokens
+
+
+class Candidate(NamedTuple):
+    """
+    A deployment to try for a request.
+    """
+    route: str
+    deployment: str
+    timeout: Optional[float] = None
+
+
+def load_routes(config: Optional[str]) -> List[Route]:
+    """
+    Parses the routes from a JSON list or the path of a JSON file.
+
+    >>> load_routes('[{"task": "title", "max_tokens": 500, "deployments": ["a"]}]')[0].name
+    'title<=500'
+    """
+    if not config:
+        return []
+    if not config.lstrip().startswith("["):
+        with open(config, "r", encoding="utf-8") as file:
+            config = file.read()
+    routes = []
+    for entry in json.loads(config):
+        task = entry.get("task", "*")
+        max_tokens = entry.get("max_tokens")
+        if not entry.get("deployments"):
+            raise ValueError(f"The route for {task} has no deployments.")
+        routes.append(Route(
+            name=entry.get("name") or (task if max_tokens is None else f"{task}<={max_tokens}"),
+            task=task,
+            deployments=list(entry["deployments"]),
+            max_tokens=max_tokens,
+            timeout=entry.get("timeout")
+        ))
+    return routes
+
+
+ROUTES = load_routes(os.environ.get("MODEL_ROUTES"))
+
+
+def candidates(
+        task: Optional[str],
+        prompt_tokens: int,
+        default: str,
+        routes: Optional[List[Route]] = None
+        ) -> List[Candidate]:
+    """
+    Returns the deployments to try for a request, in order.
+
+    Args:
+        task (str): The task of the request, None for unrouted requests.
+        prompt_tokens (int): The estimated size of the prompt.
+        default (str): The deployment the agent asked for, always the last one.
+        routes (list of Route, optional): Defaults to ROUTES.
+
+    >>> routes = [Route("title", "title", ["small"], timeout=10)]
+    >>> [c.deployment for c in candidates("title", 20, "gpt-4", routes)]
+    ['small', 'gpt-4']
+    >>> candidates("rewrite", 20, "gpt-4", routes)
+    [Candidate(route='rewrite', deployment='gpt-4', timeout=None)]
+    """
+    routes = ROUTES if routes is None else routes
+    if task is not None:
+        for route in routes:
+            if route.matches(task, prompt_tokens):
+                result = [
+                    Candidate(route.name, deployment, route.timeout)
+                    for deployment in route.deployments
+                    ]
+                if default not in route.deployments:
+                    result.append(Candidate(route.name, default))
+                return result
+    return [Candidate(task or DEFAULT_ROUTE, default)]
@@ -0,0 +1,250 @@
+"""
+This module provides lightweight tracing for the webhook runs.
+
+A span measures one operation (a pipeline stage, an OpenAI request, a PMD run,
+a git command, ...) and records its duration, its attributes (e.g. bytes and
+token counts) and whether it failed. Spans are nested by the context they are
+started in: the span that is active when a new span starts becomes its parent.
+Thread pools have to run their tasks with wrap(), so the tasks continue the
+trace of the thread that submitted them.
+
+Finished spans are exported to
+- a JSON lines file, if TRACE_FILE is set, one span per line, and
+- an OTLP/HTTP endpoint with JSON encoding (e.g. a local OpenTelemetry
+  collector at http://localhost:4318/v1/traces), if TRACE_OTLP_ENDPOINT is
+  set. The spans of a trace are sent together when its root span ends.
+
+Without either setting the spans are only measured and logged at the end of a
+trace.
+"""
+import os
+import json
+import time
+import secrets
+import logging
+import threading
+import contextvars
+from functools import wraps
+from contextlib import contextmanager
+from collections import defaultdict
+from typing import Optional
+import requests
+
+LOGGER = logging.getLogger(__name__)
+
+# JSON lines file the spans are appended to
+TRACE_FILE = os.environ.get("TRACE_FILE")
+# OTLP/HTTP endpoint for traces, e.g. http://localhost:4318/v1/traces
+TRACE_OTLP_ENDPOINT = os.environ.get("TRACE_OTLP_ENDPOINT")
+SERVICE_NAME = os.environ.get("TRACE_SERVICE_NAME", "optima-coding-mentor")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_lock = threading.Lock()
+# The finished spans of the traces whose root span is still open
+_open_traces = {}
+
+
+class Span:
+    """
+    A timed operation with attributes.
+    """
+    def __init__(self, name: str, parent: Optional["Span"], attributes: dict) -> None:
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._start = time.perf_counter()
+        self.duration_ms = None
+
+    def set(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def add(self, key: str, value) -> None:
+        """
+        Adds to a numeric attribute, e.g. to count bytes over several writes.
+        """
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def finish(self) -> None:
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        self.end_ns = self.start_ns + int(self.duration_ms * 1_000_000)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoSpan:
+    """
+    Stands in for the current span if there is none.
+    """
+    def set(self, key, value):
+        pass
+
+    def add(self, key, value):
+        pass
+
+
+def current_span():
+    """
+    Returns the active span, or an object that ignores attributes if there is none.
+    """
+    return _current_span.get() or _NoSpan()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Measures the code in the with block as a span.
+
+    Args:
+        name (str): The name of the operation, e.g. "git.clone".
+        **attributes: Initial attributes of the span.
+
+    Yields:
+        Span: The span, to add attributes while it is running.
+    """
+    parent = _current_span.get()
+    new_span = Span(name, parent, attributes)
+    if parent is None:
+        with _lock:
+            _open_traces[new_span.trace_id] = []
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        new_span.finish()
+        _export(new_span, is_root=parent is None)
+
+
+def traced(name: str):
+    """
+    Decorator that runs a function in a span.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def wrap(func):
+    """
+    Binds a function to the current context, so it continues the current trace
+    when it is run by a thread pool.
+
+    Every call runs in its own copy of the context, since a context can't be
+    entered by several threads at once.
+    """
+    context = contextvars.copy_context()
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+
+def _export(finished: Span, is_root: bool) -> None:
+    record = finished.to_dict()
+    with _lock:
+        if TRACE_FILE:
+            try:
+                with open(TRACE_FILE, "a", encoding="utf-8") as file:
+                    file.write(json.dumps(record, default=str) + "\n")
+            except OSError:
+                LOGGER.debug("Can't write the trace file %s", TRACE_FILE)
+        trace = _open_traces.get(finished.trace_id)
+        if trace is not None:
+            trace.append(record)
+        if is_root:
+            trace = _open_traces.pop(finished.trace_id, [])
+    if is_root:
+        _log_summary(trace)
+        if TRACE_OTLP_ENDPOINT:
+            _send_otlp(trace)
+
+
+def _log_summary(records):
+    durations = defaultdict(float)
+    for record in records:
+        durations[record["name"]] += record["duration_ms"]
+    LOGGER.debug("Trace summary (ms):\n" + "\n".join(
+        f"{name}: {duration:.0f}"
+        for name, duration in sorted(durations.items(), key=lambda item: -item[1])
+        ))
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(records) -> dict:
+    """
+    Converts span records to an OTLP/HTTP JSON request body.
+    """
+    spans = []
+    for record in records:
+        otlp_span = {
+            "traceId": record["trace_id"],
+            "spanId": record["span_id"],
+            "name": record["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(record["start_ns"]),
+            "endTimeUnixNano": str(record["end_ns"]),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in record["attributes"].items()
+            ],
+            # 1 = OK, 2 = ERROR
+            "status": {"code": 2, "message": record["error"]} if record["error"] else {"code": 1},
+        }
+        if record["parent_id"]:
+            otlp_span["parentSpanId"] = record["parent_id"]
+        spans.append(otlp_span)
+    return {
+        "resourceSpans": [{
+            "resource": {
+                "attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]
+            },
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+        }]
+    }
+
+
+def _send_otlp(records) -> None:
+    try:
+        response = requests.post(
+            TRACE_OTLP_ENDPOINT,
+            headers={"Content-Type": "application/json"},
+            data=json.dumps(to_otlp(records), default=str),
+            timeout=5
+            )
+        if response.status_code >= 300:
+            LOGGER.debug("OTLP export failed: %s %s", response.status_code, response.text)
+    except requests.RequestException as e:
+        LOGGER.debug("OTLP export failed: %s", e)
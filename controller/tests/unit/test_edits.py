@@ -0,0 +1,106 @@
+import pytest
+from controller.src.edits import (
+    EditApplyError,
+    apply_edits,
+    apply_patch_response,
+    apply_unified_diff,
+    extract_hunks
+)
+
+SOURCE = """def f(x):
+    y = x + 1
+    return y
+
+def g(x):
+    y = x + 1
+    return y
+"""
+
+def test_apply_edits_exact():
+    edits = [{"search": "def g(x):\n    y = x + 1", "replace": "def g(x):\n    y = x + 2"}]
+    result = apply_edits(SOURCE, edits)
+    assert result.endswith("def g(x):\n    y = x + 2\n    return y\n")
+    assert result.startswith("def f(x):\n    y = x + 1\n")
+
+def test_apply_edits_uses_line_hint():
+    edits = [{"search": "    y = x + 1\n", "replace": "    y = x - 1\n", "line": 6}]
+    result = apply_edits(SOURCE, edits)
+    assert result.count("y = x + 1") == 1
+    assert result.splitlines()[5] == "    y = x - 1"
+
+def test_apply_edits_ignores_whitespace():
+    edits = [{"search": "def f(x):\n  y = x + 1  ", "replace": "def f(x):\n    y = x * 2"}]
+    result = apply_edits(SOURCE, edits)
+    assert result.startswith("def f(x):\n    y = x * 2\n    return y\n")
+
+def test_apply_edits_fuzzy():
+    edits = [{"search": "def f(x):\n    y = x+1\n    return y", "replace": "def f(x):\n    return x + 1"}]
+    result = apply_edits(SOURCE, edits)
+    assert result.startswith("def f(x):\n    return x + 1\n\ndef g(x):")
+
+def test_apply_edits_not_found():
+    with pytest.raises(EditApplyError):
+        apply_edits(SOURCE, [{"search": "class Foo:\n    pass", "replace": ""}])
+    with pytest.raises(EditApplyError):
+        apply_edits(SOURCE, [{"replace": "x"}])
+    with pytest.raises(EditApplyError):
+        apply_edits(SOURCE, [{"search": "  ", "replace": "x"}])
+
+def test_apply_edits_rejects_ambiguous_matches():
+    with pytest.raises(EditApplyError):
+        apply_edits(SOURCE, [{"search": "    y = x + 1\n", "replace": "    y = x - 1\n"}])
+    with pytest.raises(EditApplyError):
+        apply_edits(SOURCE, [{"search": "  y = x + 1  \n  return y", "replace": "    return x\n"}])
+
+def test_apply_edits_stays_in_regions():
+    edit = {"search": "    y = x + 1\n", "replace": "    y = x - 1\n"}
+    result = apply_edits(SOURCE, [edit], regions=[(5, 7)])
+    assert result.splitlines()[5] == "    y = x - 1"
+    assert result.splitlines()[1] == "    y = x + 1"
+    with pytest.raises(EditApplyError):
+        apply_edits(SOURCE, [{"search": "    return y\n\ndef g(x):", "replace": ""}], regions=[(5, 7)])
+    # The regions move with the lines added by earlier edits
+    edits = [
+        {"search": "def f(x):\n", "replace": "def f(x):\n    x = abs(x)\n"},
+        {"search": "    return y\n", "replace": "    return -y\n", "line": 4},
+        {"search": "def g(x):\n    y", "replace": "def g(x):\n    z"},
+    ]
+    result = apply_edits(SOURCE, edits, regions=[(1, 3), (5, 7)])
+    assert "    x = abs(x)\n    y = x + 1\n    return -y\n\ndef g(x):\n    z = x + 1" in result
+    with pytest.raises(EditApplyError):
+        apply_edits(SOURCE, edits[:1] + [{"search": "\ndef g", "replace": "\ndef h"}], regions=[(1, 3)])
+
+def test_extract_hunks():
+    hunks = extract_hunks(SOURCE, [(2, 2)], context=1)
+    assert hunks == [(1, 3, "def f(x):\n    y = x + 1\n    return y\n")]
+    # Context is clamped to the file
+    assert extract_hunks(SOURCE, [(7, 7)], context=5)[0][:2] == (2, 7)
+
+def test_apply_unified_diff():
+    diff = """--- a/f.py
++++ b/f.py
+@@ -5,3 +5,3 @@
+ def g(x):
+-    y = x + 1
++    y = x + 2
+     return y
+"""
+    result = apply_unified_diff(SOURCE, diff)
+    assert result.endswith("def g(x):\n    y = x + 2\n    return y\n")
+    assert result.startswith("def f(x):\n    y = x + 1\n")
+
+def test_apply_unified_diff_insertion():
+    result = apply_unified_diff(SOURCE, "@@ -3,0 +4,1 @@\n+# end of f")
+    assert result.splitlines()[3] == "# end of f"
+
+def test_apply_unified_diff_without_hunks():
+    with pytest.raises(EditApplyError):
+        apply_unified_diff(SOURCE, "no diff")
+
+def test_apply_patch_response():
+    edits = {"edits": [{"search": "return y\n\ndef g", "replace": "return -y\n\ndef g"}]}
+    assert "return -y\n\ndef g" in apply_patch_response(SOURCE, edits)
+    diff = {"diff": "@@ -1,1 +1,1 @@\n-def f(x):\n+def f(z):"}
+    assert apply_patch_response(SOURCE, diff).startswith("def f(z):\n")
+    with pytest.raises(EditApplyError):
+        apply_patch_response(SOURCE, {"improved_source_code": SOURCE})
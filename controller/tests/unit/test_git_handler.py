@@ -0,0 +1,78 @@
+import subprocess
+import pytest
+from git import Repo
+from controller.src.git_handler import GitHandler
+
+def git(path, *args):
+    return subprocess.run(
+        ["git", "-C", str(path)] + list(args),
+        check=True,
+        capture_output=True,
+        text=True
+        ).stdout
+
+@pytest.fixture
+def repo(tmp_path):
+    remote = tmp_path / "remote.git"
+    local = tmp_path / "local"
+    subprocess.run(["git", "init", "-q", "--bare", str(remote)], check=True)
+    subprocess.run(["git", "init", "-q", str(local)], check=True)
+    git(local, "config", "user.email", "test@example.com")
+    git(local, "config", "user.name", "Test")
+    git(local, "remote", "add", "origin", str(remote))
+    with open(local / "a.txt", "w") as f:
+        f.write("a\n")
+    git(local, "add", "a.txt")
+    git(local, "commit", "-q", "-m", "initial")
+    GitHandler._repo = Repo(str(local))
+    GitHandler._batch_push = False
+    GitHandler._push_pending = False
+    yield local, remote
+    GitHandler._batch_push = False
+
+def test_commit_without_changes(repo):
+    local, _ = repo
+    assert not GitHandler.commit(["a.txt"], "nothing")
+    assert not GitHandler.commit([], "nothing")
+
+def test_commit_and_push(repo):
+    local, remote = repo
+    with open(local / "a.txt", "w") as f:
+        f.write("b\n")
+    assert GitHandler.commit_and_push(["a.txt"], "change a")
+    branch = GitHandler._repo.active_branch.name
+    assert git(remote, "log", "--format=%s", branch).split() == ["change", "a", "initial"]
+
+def test_batch_push(repo):
+    local, remote = repo
+    GitHandler.set_batch_push(True)
+    assert not GitHandler.push()
+    for i in range(2):
+        with open(local / "a.txt", "w") as f:
+            f.write(str(i))
+        assert GitHandler.commit_and_push(["a.txt"], f"commit {i}")
+    branch = GitHandler._repo.active_branch.name
+    # Nothing is pushed until push() is called
+    assert git(remote, "branch", "--list") == ""
+    assert GitHandler.push()
+    assert git(remote, "log", "--format=%s", branch).splitlines() == ["commit 1", "commit 0", "initial"]
+    assert not GitHandler.push()
+
+def test_initialize_resets_the_previous_run(repo):
+    local, remote = repo
+    GitHandler.set_batch_push(True)
+    with open(local / "a.txt", "w") as f:
+        f.write("first run\n")
+    assert GitHandler.commit_and_push(["a.txt"], "first run")
+    # The first run ends without pushing, the second run starts
+    GitHandler.initialize("main", "main", "user", "owner", "token", "repo", "1")
+    assert GitHandler._repo is None
+    assert not GitHandler._batch_push and not GitHandler._push_pending
+    # Stands in for the clone of the second run
+    GitHandler._repo = Repo(str(local))
+    with open(local / "a.txt", "w") as f:
+        f.write("second run\n")
+    # Without batching mode the commit is pushed right away
+    assert GitHandler.commit_and_push(["a.txt"], "second run")
+    branch = GitHandler._repo.active_branch.name
+    assert git(remote, "log", "--format=%s", branch).splitlines() == ["second run", "first run", "initial"]
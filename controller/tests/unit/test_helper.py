@@ -0,0 +1,84 @@
+import os
+import subprocess
+import pytest
+from controller.src.helper import (
+    ChangedFile,
+    filter_changed_files,
+    format_ranges,
+    get_tracked_files,
+    not_deleted_files,
+    parse_patch_ranges
+)
+
+@pytest.fixture
+def repo(tmp_path):
+    os.makedirs(tmp_path / "src")
+    for path in ["a.py", "src/b.py"]:
+        with open(tmp_path / path, "w") as f:
+            f.write("print('test')\n")
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    subprocess.run(["git", "-C", str(tmp_path), "add", "."], check=True)
+    return str(tmp_path)
+
+def make_file(filename, status="modified", changes=2, patch="@@ -1 +1 @@\n-a\n+b"):
+    return ChangedFile(
+        filename=filename,
+        status=status,
+        additions=changes // 2,
+        deletions=changes // 2,
+        changes=changes,
+        sha="0" * 40,
+        patch=patch
+    )
+
+def test_from_api():
+    entry = {
+        "filename": "src/Foo.java",
+        "status": "added",
+        "additions": 3,
+        "deletions": 0,
+        "changes": 3,
+        "sha": "abc",
+        "patch": "@@ -0,0 +1,3 @@\n+a\n+b\n+c"
+    }
+    file = ChangedFile.from_api(entry)
+    assert file.filename == "src/Foo.java"
+    assert file.status == "added"
+    assert file.changed_ranges() == [(1, 3)]
+
+@pytest.mark.parametrize("patch,expected", [
+    (None, []),
+    ("@@ -1,3 +1,4 @@\n a\n+b\n+c\n d\n-e", [(2, 3)]),
+    ("@@ -1,2 +1,2 @@\n a\n-b\n+c\n@@ -10,2 +10,3 @@\n x\n+y\n z", [(2, 2), (11, 11)]),
+    ("@@ -5,3 +5,2 @@\n a\n-b\n c", [(6, 6)]),
+    ("@@ -1 +1 @@\n-a\n+b\n\\ No newline at end of file", [(1, 1)]),
+])
+def test_parse_patch_ranges(patch, expected):
+    assert parse_patch_ranges(patch) == expected
+
+def test_filter_changed_files():
+    files = [
+        make_file("kept.py"),
+        make_file("removed.py", status="removed"),
+        make_file("image.png", patch=None),
+        make_file("huge.java", changes=5000),
+    ]
+    assert [f.filename for f in filter_changed_files(files, max_changes=100)] == ["kept.py"]
+
+def test_get_tracked_files(repo):
+    assert get_tracked_files(repo) == {"a.py", "src/b.py"}
+
+def test_not_deleted_files(repo):
+    cwd = os.getcwd()
+    files = ["a.py", "src/b.py", "src/deleted.py"]
+    assert not_deleted_files(repo, files) == ["a.py", "src/b.py"]
+    # The working directory of the process must not change
+    assert os.getcwd() == cwd
+
+def test_not_deleted_files_uses_status():
+    # The removed file is dropped because of its status, not the tracked files
+    files = [make_file("a.py"), make_file("b.py", status="removed")]
+    assert not_deleted_files("unused", files, {"a.py", "b.py"}) == ["a.py"]
+
+def test_format_ranges():
+    assert format_ranges([(1, 1), (4, 7)]) == "1, 4-7"
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+import pytest
+from flask import Flask
+from controller.src import metrics
+from controller.src.llm import complete
+from controller.src.api.metrics import metrics_blueprint
+
+class FakeClient:
+    def __init__(self, error=None):
+        self.error = error
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        if self.error:
+            raise self.error
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="{}"))],
+            usage=SimpleNamespace(prompt_tokens=12, completion_tokens=3)
+        )
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("test_duration_seconds", "Test.", ("route",), buckets=(1, 5))
+    histogram.observe(0.5, route="a")
+    histogram.observe(3, route="a")
+    histogram.observe(10, route="a")
+    lines = histogram.render()
+    assert 'test_duration_seconds_bucket{route="a",le="1"} 1' in lines
+    assert 'test_duration_seconds_bucket{route="a",le="5"} 2' in lines
+    assert 'test_duration_seconds_bucket{route="a",le="+Inf"} 3' in lines
+    assert 'test_duration_seconds_sum{route="a"} 13.5' in lines
+    assert 'test_duration_seconds_count{route="a"} 3' in lines
+
+def test_labels_are_checked_and_escaped():
+    counter = metrics.Counter("test_total", "Test.", ("name",))
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
+    counter.inc(name='a "b"\n')
+    assert 'test_total{name="a \\"b\\"\\n"} 1' in counter.render()
+
+def test_complete_records_tokens_and_latency():
+    complete(FakeClient(), "prompt", model="metrics-test", agent="lint_agent")
+    labels = {"deployment": "metrics-test", "agent": "lint_agent"}
+    assert metrics.LLM_PROMPT_TOKENS.get(**labels) == 12
+    assert metrics.LLM_COMPLETION_TOKENS.get(**labels) == 3
+    assert metrics.LLM_REQUESTS.get(status="ok", **labels) == 1
+    assert metrics.LLM_IN_FLIGHT.get(deployment="metrics-test") == 0
+    assert 'llm_completion_duration_seconds_count{deployment="metrics-test",agent="lint_agent"} 1' \
+        in metrics.render()
+
+def test_complete_counts_failed_requests():
+    with pytest.raises(TimeoutError):
+        complete(FakeClient(TimeoutError()), "prompt", model="metrics-failing", agent="pr_agent")
+    labels = {"deployment": "metrics-failing", "agent": "pr_agent"}
+    assert metrics.LLM_REQUESTS.get(status="error", **labels) == 1
+    assert metrics.LLM_IN_FLIGHT.get(deployment="metrics-failing") == 0
+
+def test_metrics_endpoint():
+    app = Flask(__name__)
+    app.register_blueprint(metrics_blueprint)
+    response = app.test_client().get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert "# TYPE webhook_runs_in_progress gauge" in response.get_data(as_text=True)
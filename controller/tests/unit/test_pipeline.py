@@ -0,0 +1,48 @@
+import threading
+import pytest
+from controller.src.pipeline import Pipeline
+
+def test_results_are_passed_to_dependent_stages():
+    pipeline = Pipeline()
+    pipeline.add("a", lambda: 1)
+    pipeline.add("b", lambda: 2)
+    pipeline.add("sum", lambda a, b: a + b, depends_on=("a", "b"))
+    results = pipeline.run()
+    assert results == {"a": 1, "b": 2, "sum": 3}
+
+def test_independent_stages_run_concurrently():
+    # Both stages wait for each other, this only finishes if they run concurrently
+    barrier = threading.Barrier(2, timeout=5)
+    pipeline = Pipeline(max_workers=2)
+    pipeline.add("a", barrier.wait)
+    pipeline.add("b", barrier.wait)
+    pipeline.run()
+    assert pipeline.succeeded("a") and pipeline.succeeded("b")
+
+def test_failed_stage_skips_dependent_stages():
+    def fail():
+        raise RuntimeError("failed")
+    calls = []
+    pipeline = Pipeline()
+    pipeline.add("fail", fail)
+    pipeline.add("dependent", lambda _: calls.append("dependent"), depends_on=("fail",))
+    pipeline.add("after", lambda: calls.append("after"), after=("fail",))
+    pipeline.run()
+    assert pipeline.failed("fail")
+    assert not pipeline.failed("dependent")
+    assert not pipeline.succeeded("dependent")
+    assert calls == ["after"]
+
+def test_after_keeps_order():
+    order = []
+    pipeline = Pipeline(max_workers=4)
+    pipeline.add("first", lambda: order.append("first"))
+    pipeline.add("second", lambda: order.append("second"), after=("first",))
+    pipeline.add("third", lambda: order.append("third"), after=("second",))
+    pipeline.run()
+    assert order == ["first", "second", "third"]
+
+def test_unknown_dependency():
+    pipeline = Pipeline()
+    with pytest.raises(ValueError):
+        pipeline.add("a", lambda b: b, depends_on=("b",))
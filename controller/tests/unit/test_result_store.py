@@ -0,0 +1,53 @@
+import os
+from controller.src.result_store import ResultStore, digest, estimate_tokens
+
+ORIGINAL = "".join(f"line {i}\n" for i in range(50))
+
+def rewrite(i):
+    return ORIGINAL.replace(f"line {i}\n", f"changed {i}\n")
+
+def test_put_spills_content_and_diff(tmp_path):
+    store = ResultStore(str(tmp_path))
+    result = store.put("src/a.py", rewrite(3), original=ORIGINAL, explanation="Renamed\nline 3.")
+    assert result.read() == rewrite(3)
+    assert "-line 3\n+changed 3\n" in result.diff()
+    assert (result.additions, result.deletions) == (1, 1)
+    assert result.summary() == "src/a.py (+1 -1): Renamed line 3."
+    assert os.path.dirname(result.content_file) == store.directory
+    store.clean_up()
+    assert not os.path.exists(store.directory)
+
+def test_put_without_original_has_no_diff(tmp_path):
+    result = ResultStore(str(tmp_path)).put("a.py", "x = 1\n")
+    assert result.diff() == "" and result.diff_file is None
+
+def test_digest_stays_within_the_budget(tmp_path):
+    store = ResultStore(str(tmp_path))
+    results = [
+        store.put(f"src/{i}.py", rewrite(i), original=ORIGINAL, explanation=f"Change {i}.")
+        for i in range(40)
+    ]
+    text = digest(results, max_tokens=500)
+    assert estimate_tokens(text) <= 520
+    assert "src/0.py (+1 -1): Change 0." in text
+    assert "+changed 0" in text
+    assert "more files are left out" in text
+
+def test_digest_cuts_the_file_list(tmp_path):
+    store = ResultStore(str(tmp_path))
+    results = [store.put(f"src/{i}.py", "x\n", explanation="Change.") for i in range(100)]
+    text = digest(results, max_tokens=50)
+    assert text.endswith("more files")
+    assert estimate_tokens(text) <= 60
+
+def test_formatting_only(tmp_path):
+    store = ResultStore(str(tmp_path))
+    assert store.put("A.java", ORIGINAL.replace("line 3", "line  3"), original=ORIGINAL).formatting_only()
+    assert store.put("a.py", ORIGINAL.replace("line 3\n", "line 3  \n"), original=ORIGINAL).formatting_only()
+    assert store.put("a.py", ORIGINAL, original=ORIGINAL).formatting_only()
+    # Indentation is meaningful in Python
+    code = "if x:\n    y()\n    z()\n"
+    assert not store.put("a.py", code.replace("    z", "z"), original=code).formatting_only()
+    assert store.put("A.java", code.replace("    z", "z"), original=code).formatting_only()
+    assert not store.put("a.py", rewrite(3), original=ORIGINAL).formatting_only()
+    assert not store.put("a.py", ORIGINAL).formatting_only()
@@ -0,0 +1,73 @@
+import json
+from types import SimpleNamespace
+import httpx
+import openai
+import pytest
+from controller.src import llm
+from controller.src import metrics
+from controller.src import routing
+
+REQUEST = httpx.Request("POST", "https://example.com/chat/completions")
+
+class FakeClient:
+    """
+    Answers with the deployment, or raises the error configured for it.
+    """
+    def __init__(self, errors=None, options=None):
+        self.errors = errors or {}
+        self.options = options or {}
+        self.calls = []
+        self.chat = SimpleNamespace(completions=self)
+
+    def with_options(self, **options):
+        client = FakeClient(self.errors, options)
+        client.calls = self.calls
+        return client
+
+    def create(self, model, **kwargs):
+        self.calls.append((model, self.options))
+        if model in self.errors:
+            raise self.errors[model]
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=model))])
+
+@pytest.fixture
+def routes(monkeypatch):
+    routes = routing.load_routes(json.dumps([
+        {"task": "commit_message", "deployments": ["small-a", "small-b"], "timeout": 5},
+        {"task": "rewrite", "max_tokens": 100, "deployments": ["mini"]},
+    ]))
+    monkeypatch.setattr(routing, "ROUTES", routes)
+    return routes
+
+def test_routes_by_task_and_size(routes):
+    assert [c.deployment for c in routing.candidates("rewrite", 50, "gpt-4")] == ["mini", "gpt-4"]
+    assert [c.deployment for c in routing.candidates("rewrite", 500, "gpt-4")] == ["gpt-4"]
+    assert routing.candidates(None, 50, "gpt-4") == [routing.Candidate("default", "gpt-4")]
+
+def test_load_routes_from_file(tmp_path):
+    path = tmp_path / "routes.json"
+    path.write_text('[{"task": "*", "deployments": ["a"], "timeout": 30}]')
+    assert routing.load_routes(str(path)) == [routing.Route("*", "*", ["a"], None, 30)]
+    with pytest.raises(ValueError):
+        routing.load_routes('[{"task": "title"}]')
+
+def test_complete_falls_back_on_rate_limits_and_timeouts(routes):
+    client = FakeClient({
+        "small-a": openai.RateLimitError("429", response=httpx.Response(429, request=REQUEST), body=None),
+        "small-b": openai.APITimeoutError(REQUEST),
+    })
+    assert llm.complete(client, "prompt", model="gpt-4", task="commit_message") == "gpt-4"
+    assert client.calls == [
+        ("small-a", {"max_retries": 0, "timeout": 5}),
+        ("small-b", {"max_retries": 0, "timeout": 5}),
+        ("gpt-4", {}),
+    ]
+    assert metrics.LLM_FALLBACKS.get(route="commit_message", deployment="small-a", reason="rate_limit") >= 1
+    assert metrics.LLM_FALLBACKS.get(route="commit_message", deployment="small-b", reason="timeout") >= 1
+    assert 'llm_route_duration_seconds_count{route="commit_message",deployment="gpt-4"}' in metrics.render()
+
+def test_complete_raises_when_the_last_deployment_fails(routes):
+    client = FakeClient({"gpt-4": openai.APITimeoutError(REQUEST)})
+    with pytest.raises(openai.APITimeoutError):
+        llm.complete(client, "prompt", model="gpt-4", task="title")
+    assert client.calls == [("gpt-4", {})]
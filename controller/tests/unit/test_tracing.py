@@ -0,0 +1,87 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from controller.src import tracing
+from controller.src.pipeline import Pipeline
+
+@pytest.fixture
+def trace_file(tmp_path, monkeypatch):
+    path = tmp_path / "trace.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_FILE", str(path))
+    def read():
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+    return read
+
+def test_spans_are_nested_and_exported(trace_file):
+    with tracing.span("root", repo="demo") as root:
+        with tracing.span("child") as child:
+            child.add("bytes", 3)
+            child.add("bytes", 4)
+        with pytest.raises(ValueError):
+            with tracing.span("failing"):
+                raise ValueError("boom")
+    records = {record["name"]: record for record in trace_file()}
+    assert records["child"]["parent_id"] == root.span_id
+    assert records["child"]["trace_id"] == root.trace_id
+    assert records["child"]["attributes"] == {"bytes": 7}
+    assert records["failing"]["status"] == "error"
+    assert records["failing"]["error"] == "ValueError: boom"
+    assert records["root"]["parent_id"] is None
+    assert records["root"]["duration_ms"] >= records["child"]["duration_ms"]
+
+def test_wrap_continues_the_trace_in_threads(trace_file):
+    def work():
+        with tracing.span("work"):
+            tracing.current_span().set("thread", True)
+    with tracing.span("root") as root:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            for future in [executor.submit(tracing.wrap(work)) for _ in range(2)]:
+                future.result()
+    work_records = [record for record in trace_file() if record["name"] == "work"]
+    assert len(work_records) == 2
+    assert all(record["parent_id"] == root.span_id for record in work_records)
+
+def test_wrap_allows_concurrent_calls(trace_file):
+    # Both calls run at the same time
+    barrier = threading.Barrier(2, timeout=5)
+    def work():
+        with tracing.span("work"):
+            barrier.wait()
+    with tracing.span("root") as root:
+        wrapped = tracing.wrap(work)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            for future in [executor.submit(wrapped) for _ in range(2)]:
+                future.result()
+    work_records = [record for record in trace_file() if record["name"] == "work"]
+    assert [record["parent_id"] for record in work_records] == [root.span_id] * 2
+
+def test_pipeline_stages_are_spans(trace_file):
+    pipeline = Pipeline()
+    pipeline.add("a", lambda: 1)
+    pipeline.add("b", lambda a: a + 1, depends_on=("a",))
+    with tracing.span("run"):
+        pipeline.run()
+    names = [record["name"] for record in trace_file()]
+    assert names == ["stage.a", "stage.b", "run"]
+
+def test_otlp_export(monkeypatch):
+    sent = []
+    class Response:
+        status_code = 200
+    def post(url, headers, data, timeout):
+        sent.append((url, json.loads(data)))
+        return Response()
+    monkeypatch.setattr(tracing, "TRACE_OTLP_ENDPOINT", "http://collector/v1/traces")
+    monkeypatch.setattr(tracing.requests, "post", post)
+    with tracing.span("root", files=2):
+        with tracing.span("child"):
+            pass
+    url, body = sent[0]
+    spans = body["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert url == "http://collector/v1/traces"
+    assert [span["name"] for span in spans] == ["child", "root"]
+    assert spans[0]["parentSpanId"] == spans[1]["spanId"]
+    assert spans[1]["attributes"] == [{"key": "files", "value": {"intValue": "2"}}]
+    assert spans[1]["status"] == {"code": 1}
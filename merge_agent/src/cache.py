@@ -11,6 +11,12 @@ import os
 import pandas as pd
 from typing import Optional
 
+# The default cache folder
+MERGE_CACHE_DIR = os.environ.get(
+    "MERGE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+    )
+
 class Cache:
     """
     A class used to cache prompts and their corresponding answers.
@@ -23,7 +29,7 @@ class Cache:
     prompt and the index of the row is used to name a separate CSV file that stores the answer for 
     the prompt.
     """
-    def __init__(self, cache_folder: str = ".cache", cache_file: str = "prompts.csv") -> None:
+    def __init__(self, cache_folder: str = None, cache_file: str = "prompts.csv") -> None:
         """
         Initializes the Cache with the specified cache folder and cache file.
 
@@ -32,10 +38,14 @@ class Cache:
         column.
 
         Args:
-            cache_folder (str, optional): The name of the cache folder. Defaults to ".cache".
+            cache_folder (str, optional): The name of the cache folder, relative to this 
+                module. Defaults to MERGE_CACHE_DIR.
             cache_file (str, optional): The name of the cache file. Defaults to "prompts.csv".
         """
-        self.cache_folder = os.path.join(os.path.dirname(__file__), cache_folder)
+        if cache_folder is None:
+            self.cache_folder = MERGE_CACHE_DIR
+        else:
+            self.cache_folder = os.path.join(os.path.dirname(__file__), cache_folder)
         self.cache_file = os.path.join(self.cache_folder, cache_file)
 
         # Create cache directory if it doesn"t exist
@@ -17,8 +17,13 @@ import ast
 import merge_agent.src.prompts as prompts
 import httpx
 from openai import AzureOpenAI
+from controller.src.llm import complete
+from controller.src import metrics
+from controller.src import routing
 from merge_agent.src.functions import encode_to_base64, decode_from_base64
 from merge_agent.src.cache import Cache
+from controller.src.edits import PATCH_RESPONSES, EditApplyError, apply_patch_response
+from controller.src.result_store import ResultStore, COMMIT_EXPLANATION_CHARS
 
 EXPLANATION, ANSWER = 0, 0
 CODE, COMMIT_MSG = 1, 1
@@ -34,27 +39,11 @@ client = AzureOpenAI(
     )
 )
 
-def get_completion(prompt, model="GCDM-EMEA-GPT4-1106", type="json_object"): # make global env variable that's used for the model
+def get_completion(prompt, model="GCDM-EMEA-GPT4-1106", type="json_object", task=None): # make global env variable that's used for the model
     """
     Sends a prompt to the OpenAI API and returns the AI"s response.
     """
-    messages = [
-        {
-            "role": "system",
-            "content": "You are a system designed to improve code quality."
-        },
-        {
-            "role": "user",
-            "content": prompt
-        }
-    ]
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=0, # this is the degree of randomness of the model"s output,
-        response_format={"type": type}
-    )
-    return response.choices[0].message.content
+    return complete(client, prompt, model=model, type=type, agent="merge_agent", task=task)
 
 class MergeAgent():
     """
@@ -68,24 +57,37 @@ class MergeAgent():
     6. Creating a pull request in the downstream repository.
     """
 
-    def __init__(self, repo, json_model="GCDM-EMEA-GPT4-1106", text_model="GCDM-EMEA-GPT4"):
+    def __init__(
+            self,
+            repo,
+            json_model="GCDM-EMEA-GPT4-1106",
+            text_model="GCDM-EMEA-GPT4",
+            result_store=None,
+            commit_model=None
+            ):
         """
         Initializes the Agent with two Git repositories: downstream and upstream.
 
         Args:
             repo (str): The path to the Git repository.
+            result_store (ResultStore, optional): Stores the resolved files. Defaults to
+                a new store.
+            commit_model (str, optional): The deployment for the commit message, usually
+                a cheaper one. Defaults to text_model.
 
         The method also initializes several instance variables:
         - _file_paths: A list to store the paths of the files with merge conflicts.
         - _prompt: A string to store the prompt for the AI model.
         - explanations: A list to store the explanations provided by the AI model.
-        - responses: A list to store the responses (solutions to the merge conflicts) from the AI model.
+        - responses: A list to store the handles (see controller.src.result_store) of the 
+          resolved files, the files themselves are kept in the result store.
         - commit_msg: A string to store the commit message.
         - _cache: An instance of the Cache class to store the responses from the AI model.
         """
         self._repo = repo
         self._file_paths = []
         self._prompt = ""
+        self._file_content = ""
 
         self.explanations = []
         self.responses = []
@@ -93,8 +95,10 @@ class MergeAgent():
 
         self.json_model = json_model
         self.text_model = text_model
+        self.commit_model = commit_model or text_model
 
         self._cache = Cache()
+        self._results = result_store or ResultStore()
 
     def get_file_paths(self):
         """
@@ -110,7 +114,7 @@ class MergeAgent():
         Returns the responses (solutions to the merge conflicts) from the AI model.
 
         Returns:
-            list of str: The responses from the AI model.
+            list of StoredResult: The handles of the resolved files.
         """
         return self.responses
     
@@ -132,48 +136,104 @@ class MergeAgent():
         If it doesn't (cache miss), it sends the prompt to the OpenAI API, gets the response,
         and updates the cache with the base64 encoded response.
 
-        The method then appends the explanation and the resolved file content (code) from the response 
-        to the explanations and responses lists respectively.
+        In patch mode (PATCH_RESPONSES) the AI model only returns the resolved conflict
+        blocks, which are applied to the file content locally. If they can't be applied,
+        the whole resolved file is requested instead.
+
+        The method then appends the explanation to the explanations list and stores the resolved 
+        file content (code) in the result store, keeping only its handle in the responses list.
 
         Returns:
             dict: The response from the OpenAI API or the cache, which includes the explanation 
             and the resolved file content (code).
         """
-        base64_prompt = encode_to_base64(self._prompt)
+        response = None
+        if PATCH_RESPONSES:
+            try:
+                response = self._ask(
+                    prompts.merge_patch_prompt.format(file_content=self._file_content),
+                    self._apply_patch,
+                    task=routing.MERGE_HUNK
+                    )
+            except (EditApplyError, KeyError, TypeError, ValueError) as e:
+                print("Patch could not be applied, requesting the whole file: " + str(e))
+        if response is None:
+            response = self._ask(self._prompt, task=routing.REWRITE)
+        self.explanations += [response["explanation"]]
+        # The merge conflict resolved file content is kept on disk
+        self.responses += [
+            self._results.put(
+                self._file_paths[-1],
+                response["code"],
+                original=self._file_content,
+                explanation=response["explanation"]
+                )
+            ]
+        return response
+    
+    def _ask(self, prompt, resolve=None, task=None):
+        """
+        Returns the response for a prompt from the cache or the OpenAI API.
+
+        Args:
+            prompt (str): The prompt for the AI model.
+            resolve (callable, optional): Converts the AI model's response before it is
+                cached. If it raises, nothing is cached.
+            task (str, optional): The task of the request (see controller.src.routing).
+
+        Returns:
+            dict: The response, which includes the explanation and the resolved file
+            content (code).
+        """
+        base64_prompt = encode_to_base64(prompt)
         if self._cache.lookup(base64_prompt):
-            print("Cache hit!\n")
+            metrics.CACHE_LOOKUPS.inc(agent="merge_agent", result="hit")
             cache_content = self._cache.get_answer(base64_prompt)
             response = decode_from_base64(cache_content)
-            response = ast.literal_eval(response) #Prevent json.loads from throwing an error
-        else:
-            print("Cache miss!")
-            response = json.loads(get_completion(self._prompt, model=self.json_model ,type="json_object"))
-            self._cache.update(
-                base64_prompt,
-                encode_to_base64(response)
-                )                
-        self.explanations += [response["explanation"]]
-        self.responses += [response["code"]] # merge conflict resolved file content
+            return ast.literal_eval(response) #Prevent json.loads from throwing an error
+        metrics.CACHE_LOOKUPS.inc(agent="merge_agent", result="miss")
+        response = json.loads(get_completion(prompt, model=self.json_model, type="json_object", task=task))
+        if resolve is not None:
+            response = resolve(response)
+        self._cache.update(
+            base64_prompt,
+            encode_to_base64(response)
+            )
         return response
-    
+
+    def _apply_patch(self, response):
+        """
+        Applies the resolved conflict blocks of a patch response to the file content.
+
+        Raises:
+            EditApplyError: If a block doesn't match or a conflict is left unresolved.
+        """
+        code = apply_patch_response(self._file_content, response)
+        if "<<<<<<<" in code or ">>>>>>>" in code:
+            raise EditApplyError("The patch leaves merge conflict markers in the file.")
+        return {
+            "explanation": response["explanation"],
+            "code": code
+        }
+
     def make_commit_msg(self):
         """
         Generates a commit message based on the explanations provided by the AI model.
 
-        This method constructs a commit prompt by appending each explanation from the explanations list 
-        to the commit_prompt string. It then sends the commit_prompt to the OpenAI API and stores the 
-        response as the commit message.
+        This method appends one line per resolved file to the commit_prompt string, with its 
+        diff statistics and the start of its explanation (see StoredResult.summary). It then 
+        sends the commit_prompt to commit_model and stores the response as the commit message.
 
         The commit message is stored in the instance variable commit_msg.
         """
-        commit_prompt = prompts.commit_prompt
-        for i, explanation in enumerate(self.explanations):
-            commit_prompt += "Explanation " + str(i) + ":\n"
-            commit_prompt += explanation + "\n"
+        commit_prompt = prompts.commit_prompt + "\n".join(
+            result.summary(COMMIT_EXPLANATION_CHARS) for result in self.responses
+            )
         self.commit_msg = get_completion(
             commit_prompt,
-            model=self.text_model,
-            type="text"
+            model=self.commit_model,
+            type="text",
+            task=routing.COMMIT_MESSAGE
             )
 
     def make_prompt(self, file_path: str, file_content:str) -> str:
@@ -192,6 +252,7 @@ class MergeAgent():
             str: The prompt for the AI model.
         """
         self._file_paths += [file_path]
+        self._file_content = file_content
         self._prompt = prompts.merge_prompt.format(file_content=file_content)
         return self._prompt
 
@@ -11,6 +11,7 @@ import stat
 from datetime import datetime
 from uuid import uuid4
 from controller.src.git_handler import GitHandler
+from controller.src import tracing
 
 class MergeGitHandler(GitHandler):
     """
@@ -55,6 +56,7 @@ class MergeGitHandler(GitHandler):
         print("Creatured feature branch.")
         print("active branch: " + self._repo.active_branch.name) """
 
+    @tracing.traced("git.merge")
     def _run_workflow(self):
         """
         Runs the workflow for merging the main branch into the feature branch and getting the file paths 
@@ -127,6 +129,24 @@ class MergeGitHandler(GitHandler):
         except GitCommandError as e:
             return True
         
+    @classmethod
+    def get_incoming_filepaths(cls):
+        """
+        Gets the file paths that merging the target branch will change.
+
+        These are the files changed on the target branch since the merge base. 
+        The working tree is not touched, so other stages can read the remaining 
+        files while the merge runs.
+
+        Returns:
+            list of str: The file paths relative to the repository root.
+        """
+        with tracing.span("git.merge_detect") as span:
+            diff = cls._repo.git.diff("--name-only", "HEAD..." + cls._target_branch)
+            file_paths = [path for path in diff.splitlines() if path]
+            span.set("files", len(file_paths))
+        return file_paths
+
     def get_unmerged_filepaths(self):
         """
         Gets the file paths of any unmerged files.
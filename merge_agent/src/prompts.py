@@ -9,8 +9,24 @@ Merge conflicted file content:
 {file_content}
 """
 
+merge_patch_prompt = """
+Output json with the 2 keys 'explanation' and 'edits'. The first key's value (str) \
+should explain what steps you took to resolve the merge conflicts and why you did so. \
+The second key's value is a list of objects with the keys 'search', 'replace' \
+and 'line'. Add one object per merge conflict: 'search' is the conflict block \
+copied verbatim from the file, from the line starting with <<<<<<< up to and \
+including the line starting with >>>>>>>, 'replace' is the resolved code of \
+that block and 'line' is the line number of the <<<<<<< marker.
+Do not return the whole file.
+
+Merge conflicted file content:
+{file_content}
+"""
+
 commit_prompt = """
 I want you to act as a GitHub commit message generator.
+Every line below describes the resolved merge conflicts of one file: its path, \
+the number of added and removed lines and an explanation.
 Summarize the following explanations in 3-10 words. The summary should contain \
 the most important information from each individual declaration.
 Do not write any explanations or other words, just reply with the commit \
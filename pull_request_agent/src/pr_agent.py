@@ -1,7 +1,27 @@
 import os
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
 import pull_request_agent.src.prompts as prompts
 import httpx
 from openai import AzureOpenAI
+from controller.src.llm import complete
+from controller.src import tracing
+from controller.src import metrics
+from controller.src import routing
+from controller.src.result_store import digest, estimate_tokens
+from pull_request_agent.src.summary_cache import SummaryCache
+
+LOGGER = logging.getLogger(__name__)
+
+# Token budget of the changes of one file in its summary prompt
+PR_FILE_MAX_TOKENS = int(os.environ.get("PR_FILE_MAX_TOKENS", 3000))
+# Token budget of the file summaries in one reduce prompt
+PR_REDUCE_MAX_TOKENS = int(os.environ.get("PR_REDUCE_MAX_TOKENS", 6000))
+# Maximum number of rounds that combine the file summaries
+PR_REDUCE_MAX_ROUNDS = int(os.environ.get("PR_REDUCE_MAX_ROUNDS", 3))
+# Number of concurrent requests for the file summaries
+PR_SUMMARY_WORKERS = int(os.environ.get("PR_SUMMARY_WORKERS", 8))
 
 client = AzureOpenAI(
     api_key=os.getenv("OPENAI_API_KEY"),
@@ -13,45 +33,37 @@ client = AzureOpenAI(
     )
 )
 
-def get_completion(prompt, model="GCDM-EMEA-GPT4", type="text"):
+def get_completion(prompt, model="GCDM-EMEA-GPT4", type="text", task=None):
     """
     Sends a prompt to the OpenAI API and returns the AI"s response.
     """
-    messages = [
-        {
-            "role": "system",
-            "content": "You are a system designed to improve code quality."
-        },
-        {
-            "role": "user",
-            "content": prompt
-        }
-    ]
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=0, # this is the degree of randomness of the model"s output,
-        response_format={"type": type}
-    )
-    return response.choices[0].message.content
+    return complete(client, prompt, model=model, type=type, agent="pr_agent", task=task)
 
 class PRAgent:
-    def __init__(self, json_model="GCDM-EMEA-GPT4-1106", text_model="GCDM-EMEA-GPT4"):
+    def __init__(
+            self,
+            json_model="GCDM-EMEA-GPT4-1106",
+            text_model="GCDM-EMEA-GPT4",
+            summary_cache=None
+            ):
         self.memory_merge_agent = {
             "files_changed": [],
             "code_changes": [],
             "commit_message": "",
+            "formatted_files": [],
         }
         self.memory_cq_agent = {
             "files_changed": [],
             "code_changes": [],
             "commit_message": "",
+            "formatted_files": [],
         }
         self.response = ""
         self.title = ""
 
         self.json_model = json_model
         self.text_model = text_model
+        self._summary_cache = summary_cache or SummaryCache()
     
     def get_summary(self):
         return self.response
@@ -59,32 +71,167 @@ class PRAgent:
     def get_title(self):
         return self.title
 
-    def set_memory(self, agent, files_changed, code_changes, commit_message):
+    def set_memory(self, agent, files_changed, code_changes, commit_message, formatted_files=None):
+        """
+        Stores the changes of an agent.
+
+        Args:
+            agent (str): "merge_agent" or "cq_agent".
+            files_changed (list of str): The changed files.
+            code_changes (list of StoredResult): The handles of the rewritten 
+                files (see controller.src.result_store).
+            commit_message (str): The commit message of the agent.
+            formatted_files (list of str, optional): The files changed by the 
+                local formatters.
+        """
         if agent == "merge_agent":
             self.memory_merge_agent["files_changed"] = files_changed
             self.memory_merge_agent["code_changes"] = code_changes
             self.memory_merge_agent["commit_message"] = commit_message
+            self.memory_merge_agent["formatted_files"] = formatted_files or []
         elif agent == "cq_agent":
             self.memory_cq_agent["files_changed"] = files_changed
             self.memory_cq_agent["code_changes"] = code_changes
             self.memory_cq_agent["commit_message"] = commit_message
+            self.memory_cq_agent["formatted_files"] = formatted_files or []
 
     def make_summary(self):
+        """
+        Summarises the changes of both agents and creates the title.
+
+        The summary is made in map-reduce fashion, so its prompts stay small 
+        for any number of files:
+        1. Every changed file is summarised from its diff (see 
+           controller.src.result_store.digest), concurrently and cached by 
+           the content of the prompt.
+        2. While the file summaries exceed PR_REDUCE_MAX_TOKENS, groups of 
+           them are combined into shorter summaries.
+        3. One request makes the pull request summary and the title.
+        """
+        lines = []
+        for agent, memory in [
+                ("Merge Agent", self.memory_merge_agent),
+                ("Code Quality Agent", self.memory_cq_agent)
+                ]:
+            lines += [f"[{agent}] {line}" for line in self._summarise_files(memory)]
+        lines = self._reduce(lines)
+
+        commit_messages = "\n".join(
+            memory["commit_message"]
+            for memory in [self.memory_merge_agent, self.memory_cq_agent]
+            if memory["commit_message"]
+            )
         response = get_completion(
-            prompts.pr_user_prompt.format(
-                memory_merge_agent=self.memory_merge_agent,
-                memory_cq_agent=self.memory_cq_agent
+            prompts.pr_summary_prompt.format(
+                commit_messages=commit_messages,
+                changes="\n".join(lines)
                 ),
-            model=self.text_model
+            model=self.json_model,
+            type="json_object",
+            task=routing.SUMMARY
             )
-        self.response = response
-    
+        try:
+            data = json.loads(response)
+            self.response = data["summary"]
+            self.title = data.get("title", "")
+        except (ValueError, KeyError, TypeError):
+            LOGGER.debug("The summary is not in the expected format: %s", response)
+            self.response = response
+            self.title = ""
+
+    def _summarise_files(self, memory):
+        """
+        Returns one summary line per changed file of an agent.
+        """
+        results = memory["code_changes"]
+        stored = set(result.path for result in results)
+        lines = []
+        if results:
+            with ThreadPoolExecutor(max_workers=PR_SUMMARY_WORKERS) as executor:
+                lines += list(executor.map(tracing.wrap(self._summarise_file), results))
+        # The formatted files without a stored rewrite have no diff to summarise
+        lines += [
+            f"{path}: Formatted."
+            for path in dict.fromkeys(memory["formatted_files"]) if path not in stored
+            ]
+        return lines
+
+    def _summarise_file(self, result):
+        changes = digest([result], PR_FILE_MAX_TOKENS)
+        prompt = prompts.pr_file_prompt.format(changes=changes)
+        key = SummaryCache.key(self.text_model, prompt)
+        summary = self._summary_cache.get(key)
+        if summary is not None:
+            metrics.CACHE_LOOKUPS.inc(agent="pr_agent", result="hit")
+        else:
+            metrics.CACHE_LOOKUPS.inc(agent="pr_agent", result="miss")
+            summary = get_completion(prompt, model=self.text_model, type="text", task=routing.SUMMARY)
+            self._summary_cache.put(key, summary)
+        summary = " ".join(summary.split())
+        if not summary.startswith(result.path):
+            summary = f"{result.path}: {summary}"
+        return summary
+
+    def _reduce(self, lines):
+        """
+        Combines groups of summary lines until all of them fit into 
+        PR_REDUCE_MAX_TOKENS.
+
+        The AI model may answer with as much text as it got, so there are 
+        PR_REDUCE_MAX_ROUNDS rounds at most and the rounds stop as soon as one 
+        doesn't shorten the lines. What still doesn't fit is cut off.
+        """
+        # Every line fits into half the budget, so every group has two lines
+        # at least
+        max_chars = PR_REDUCE_MAX_TOKENS * 2
+        lines = _truncate_lines(lines, max_chars)
+        for _ in range(PR_REDUCE_MAX_ROUNDS):
+            tokens = estimate_tokens("\n".join(lines))
+            if len(lines) <= 1 or tokens <= PR_REDUCE_MAX_TOKENS:
+                return lines
+            groups, group = [], []
+            for line in lines:
+                if group and estimate_tokens("\n".join(group + [line])) > PR_REDUCE_MAX_TOKENS:
+                    groups.append(group)
+                    group = []
+                group.append(line)
+            groups.append(group)
+            with ThreadPoolExecutor(max_workers=PR_SUMMARY_WORKERS) as executor:
+                reduced = list(executor.map(tracing.wrap(self._reduce_group), groups))
+            reduced = _truncate_lines([line for group in reduced for line in group], max_chars)
+            if estimate_tokens("\n".join(reduced)) >= tokens:
+                LOGGER.debug("Combining the summaries didn't shorten them.")
+                break
+            lines = reduced
+        return _fit_lines(lines, PR_REDUCE_MAX_TOKENS)
+
+    def _reduce_group(self, lines):
+        if len(lines) == 1:
+            return lines
+        response = get_completion(
+            prompts.pr_reduce_prompt.format(changes="\n".join(lines)),
+            model=self.text_model,
+            type="text",
+            task=routing.SUMMARY
+            )
+        # The combined summary must be shorter than its input
+        return _fit_lines(
+            [line.strip() for line in response.splitlines() if line.strip()],
+            estimate_tokens("\n".join(lines)) // 2
+            )
+
     def make_title(self):
+        """
+        Creates the title from the summary, unless make_summary already did.
+        """
+        if self.title:
+            return
         response = get_completion(
             prompts.pr_title_system_prompt.format(
                 prev_responses=self.response
             ),
-            model=self.text_model
+            model=self.text_model,
+            task=routing.TITLE
         )
         self.title = response
 
@@ -97,4 +244,34 @@ class PRAgent:
             f.write(self.response)
 
     def __str__(self):
-        return f"Merge Agent Memory: {self.memory_merge_agent}\nCode Quality Agent Memory: {self.memory_cq_agent}"
\ No newline at end of file
+        return "Merge Agent Memory:\n{}\nCode Quality Agent Memory:\n{}".format(
+            "\n".join(result.summary() for result in self.memory_merge_agent["code_changes"]),
+            "\n".join(result.summary() for result in self.memory_cq_agent["code_changes"])
+            )
+
+
+def _truncate_lines(lines, max_chars):
+    """
+    Cuts off the lines longer than max_chars.
+
+    >>> _truncate_lines(["short", "a long line"], 6)
+    ['short', 'a long ...']
+    """
+    return [line if len(line) <= max_chars else line[:max_chars] + " ..." for line in lines]
+
+
+def _fit_lines(lines, max_tokens):
+    """
+    Returns the first lines that fit into max_tokens, and a note on the rest.
+
+    >>> _fit_lines(["a" * 40, "b" * 40, "c" * 40], 15)
+    ['aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa', '... and 2 more changes']
+    """
+    kept, used = [], 0
+    for index, line in enumerate(lines):
+        tokens = estimate_tokens(line) + 1
+        if used + tokens > max_tokens:
+            return kept + [f"... and {len(lines) - index} more changes"]
+        kept.append(line)
+        used += tokens
+    return kept
@@ -3,7 +3,9 @@ import json
 import re
 import os
 import logging
+import threading
 from controller.src.git_handler import GitHandler
+from controller.src import tracing
 
 LOGGER = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG)
@@ -12,11 +14,18 @@ class PRGitHandler(GitHandler):
     def __init__(self, pr_number) -> None:
         self._pr_number = pr_number
         self.comment_id = None
+        self._last_percentage = None
+        # Several pipeline stages report their progress concurrently
+        self._comment_lock = threading.Lock()
 
     def get_pr_number(self):
         return self._pr_number
 
     def create_or_update_comment(self, comment: str):
+        with self._comment_lock, tracing.span("github.comment", bytes=len(comment.encode("utf-8"))):
+            self._create_or_update_comment(comment)
+
+    def _create_or_update_comment(self, comment: str):
         headers = {
             "Content-type": "application/json",
             "Accept": "application/json",
@@ -64,6 +73,12 @@ class PRGitHandler(GitHandler):
         self.create_or_update_comment(comment)
 
     def create_progress_bar(self, percentage, status=""):
+        # Concurrent stages report different ranges, never let the bar go back
+        with self._comment_lock:
+            if self._last_percentage is not None and percentage < self._last_percentage:
+                return
+            self._last_percentage = percentage
+
         # Define the length of the progress bar
         bar_length = 20
 
@@ -44,4 +44,34 @@ You are an agent tasked with creating a title for a GitHub pull request (PR).
 The entire body of the pull request follows, for which you should create a \
 meaningful title.
 {prev_responses}
-"""
\ No newline at end of file
+"""
+
+pr_file_prompt = """\
+Summarise the following change to a single file of a pull request in 1-3 \
+sentences. Describe what was changed and why, based on the explanation of the \
+agent and the diff. Start with the file path followed by a colon.
+
+{changes}
+"""
+
+pr_reduce_prompt = """\
+The following lines summarise changes to files of a pull request, one file \
+per line. Combine them into a shorter list that keeps every file path and \
+groups related changes. Reply only with the list.
+
+{changes}
+"""
+
+pr_summary_prompt = pr_system_prompt + """
+Output json with the 2 keys 'summary' and 'title'. The value of 'summary' is \
+the summary of the pull request, the value of 'title' a meaningful title for \
+it. It is very important that you mention every file that has been changed.
+The changes were made by a merge agent and a code quality agent. If there are \
+no changes of an agent, don't mention it.
+
+Commit messages:
+{commit_messages}
+
+Changes:
+{changes}
+"""
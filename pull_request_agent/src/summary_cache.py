@@ -0,0 +1,126 @@
+"""
+This module provides a persistent cache of the file summaries of the Pull
+Request Agent.
+
+A summary is stored under a hash of everything that determines it (the model
+and the prompt), one file per entry, so concurrent runs never write the same
+file and a change to a file's diff is always a cache miss.
+
+The cache keeps the PR_SUMMARY_CACHE_SIZE most recently used summaries. Older
+ones are removed when a run writes its first summary (see SummaryCache.prune).
+"""
+import os
+import hashlib
+import tempfile
+from typing import List, Optional
+
+PR_SUMMARY_CACHE_DIR = os.environ.get(
+    "PR_SUMMARY_CACHE_DIR",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        ".pr_summary_cache"
+        )
+    )
+# Maximum number of summaries kept between runs
+PR_SUMMARY_CACHE_SIZE = int(os.environ.get("PR_SUMMARY_CACHE_SIZE", 5000))
+
+
+class SummaryCache:
+    """
+    Summaries by key.
+
+    Args:
+        directory (str, optional): The cache directory. Defaults to
+            PR_SUMMARY_CACHE_DIR.
+        max_entries (int, optional): The number of summaries kept by prune.
+            Defaults to PR_SUMMARY_CACHE_SIZE.
+    """
+    def __init__(self, directory: str = None, max_entries: int = None) -> None:
+        self.directory = directory or PR_SUMMARY_CACHE_DIR
+        self.max_entries = PR_SUMMARY_CACHE_SIZE if max_entries is None else max_entries
+        self._pruned = False
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        """
+        Returns the key of the summary of the given inputs.
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".txt")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                summary = file.read()
+        except OSError:
+            return None
+        try:
+            # The modification time is the time of the last use
+            os.utime(path)
+        except OSError:
+            pass
+        return summary
+
+    def put(self, key: str, summary: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write and rename, so concurrent runs never read a partial file
+        with tempfile.NamedTemporaryFile(
+                "w",
+                dir=os.path.dirname(path),
+                suffix=".tmp",
+                delete=False,
+                encoding="utf-8"
+                ) as file:
+            file.write(summary)
+        os.replace(file.name, path)
+        # Scanning the cache once per run is enough to bound it
+        if not self._pruned:
+            self._pruned = True
+            self.prune()
+
+    def _entries(self) -> List[os.DirEntry]:
+        entries = []
+        try:
+            folders = [entry.path for entry in os.scandir(self.directory) if entry.is_dir()]
+        except OSError:
+            return entries
+        for folder in folders:
+            try:
+                entries += [entry for entry in os.scandir(folder) if entry.name.endswith(".txt")]
+            except OSError:
+                continue
+        return entries
+
+    def prune(self) -> int:
+        """
+        Removes the least recently used summaries beyond max_entries.
+
+        Returns:
+            int: The number of removed summaries.
+        """
+        entries = self._entries()
+        if len(entries) <= self.max_entries:
+            return 0
+        times = {}
+        for entry in entries:
+            try:
+                times[entry.path] = entry.stat().st_mtime
+            except OSError:
+                # Removed by a concurrent run
+                continue
+        removed = 0
+        for path in sorted(times, key=times.get)[:max(len(times) - self.max_entries, 0)]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
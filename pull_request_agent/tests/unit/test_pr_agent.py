@@ -0,0 +1,67 @@
+import os
+import threading
+import pytest
+from unittest.mock import patch
+
+# The OpenAI client of the module is created at import, the variables are only
+# set for the import, so they don't leak into other tests
+with patch.dict(os.environ, {
+        "HTTPS_PROXY": os.environ.get("HTTPS_PROXY", "http://localhost:3128"),
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "test"),
+        "AZURE_OPENAI_ENDPOINT": os.environ.get("AZURE_OPENAI_ENDPOINT", "https://example.invalid")
+        }):
+    from pull_request_agent.src import pr_agent
+    from pull_request_agent.src.pr_agent import PRAgent
+from pull_request_agent.src.summary_cache import SummaryCache
+from controller.src.result_store import ResultStore, estimate_tokens
+
+@pytest.fixture
+def agent(tmp_path):
+    return PRAgent(summary_cache=SummaryCache(str(tmp_path / "cache")))
+
+def file_lines(count):
+    return [f"file_{i}.py: Renamed the variables of function {i}." for i in range(count)]
+
+def test_reduce_stops_after_the_maximum_number_of_rounds(agent, monkeypatch):
+    monkeypatch.setattr(pr_agent, "PR_REDUCE_MAX_TOKENS", 100)
+    monkeypatch.setattr(pr_agent, "PR_REDUCE_MAX_ROUNDS", 1)
+    prompts = []
+    def get_completion(prompt, **kwargs):
+        prompts.append(prompt)
+        return "\n".join(["x" * 30] * 3)
+    monkeypatch.setattr(pr_agent, "get_completion", get_completion)
+
+    lines = agent._reduce(file_lines(40))
+    # Only the original lines were combined, the combined ones weren't
+    assert len(prompts) > 1
+    assert all("file_" in prompt for prompt in prompts)
+    assert lines[-1].startswith("... and ")
+
+def test_reduce_fits_into_the_token_budget(agent, monkeypatch):
+    monkeypatch.setattr(pr_agent, "PR_REDUCE_MAX_TOKENS", 100)
+    # The AI model answers with more text than it got
+    monkeypatch.setattr(pr_agent, "get_completion", lambda prompt, **kwargs: "y" * 5000)
+
+    lines = agent._reduce(file_lines(40) + ["z" * 2000])
+    assert estimate_tokens("\n".join(lines)) <= 100
+    assert agent._reduce(file_lines(2)) == file_lines(2)
+
+def test_file_summaries_keep_the_order_of_the_files(agent, tmp_path, monkeypatch):
+    store = ResultStore(str(tmp_path / "store"))
+    paths = [f"file_{i}.py" for i in range(4)]
+    results = [store.put(path, f"x = {i}\n", original="x = 0\n") for i, path in enumerate(paths)]
+    finished = {path: threading.Event() for path in paths}
+    def get_completion(prompt, **kwargs):
+        index = next(i for i, path in enumerate(paths) if path in prompt)
+        # The files finish in reverse order
+        if index + 1 < len(paths):
+            assert finished[paths[index + 1]].wait(5)
+        finished[paths[index]].set()
+        return f"Changed x in {paths[index]}."
+    monkeypatch.setattr(pr_agent, "get_completion", get_completion)
+
+    lines = agent._summarise_files({
+        "code_changes": results,
+        "formatted_files": ["file_1.py", "other.py"]
+    })
+    assert lines == [f"{path}: Changed x in {path}." for path in paths] + ["other.py: Formatted."]
@@ -0,0 +1,30 @@
+import os
+import time
+from pull_request_agent.src.summary_cache import SummaryCache
+
+def test_put_and_get(tmp_path):
+    cache = SummaryCache(str(tmp_path))
+    key = SummaryCache.key("model", "prompt")
+    assert cache.get(key) is None
+    cache.put(key, "a.py: Renamed x.")
+    assert cache.get(key) == "a.py: Renamed x."
+    assert os.listdir(os.path.join(str(tmp_path), key[:2])) == [key + ".txt"]
+
+def test_key_depends_on_every_part():
+    assert SummaryCache.key("model", "prompt") != SummaryCache.key("other", "prompt")
+    assert SummaryCache.key("ab", "c") != SummaryCache.key("a", "bc")
+
+def test_prune_keeps_the_most_recently_used_summaries(tmp_path):
+    old = SummaryCache(str(tmp_path))
+    keys = [SummaryCache.key("model", str(i)) for i in range(3)]
+    for age, key in zip([300, 200, 100], keys):
+        old.put(key, key)
+        os.utime(old._path(key), (time.time() - age, time.time() - age))
+    # Using the oldest summary makes it the most recent one
+    assert old.get(keys[0]) == keys[0]
+
+    cache = SummaryCache(str(tmp_path), max_entries=2)
+    new_key = SummaryCache.key("model", "new")
+    cache.put(new_key, "new")
+    assert [cache.get(key) is not None for key in keys] == [True, False, False]
+    assert cache.get(new_key) == "new"